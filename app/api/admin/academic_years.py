@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
 from app.core.database import SessionLocal
 from app.services.academic_year_service import (
     get_academic_years,
@@ -9,6 +10,9 @@ from app.services.academic_year_service import (
     toggle_academic_year_status,
     set_current_academic_year,
     delete_academic_year,
+    rollover_academic_year,
+    get_current_academic_year,
+    get_academic_year_for_date,
 )
 from app.schemas.academic_year_schema import (
     AcademicYearCreate,
@@ -32,6 +36,18 @@ def list_academic_years(college_id: int, db: Session = Depends(get_db)):
     return get_academic_years(db, college_id)
 
 
+@router.get("/current", response_model=AcademicYearResponse)
+def current_academic_year(college_id: int, on_date: Optional[date] = None, db: Session = Depends(get_db)):
+    """Current academic year of a college, or the one covering `on_date` when given"""
+    if on_date is not None:
+        res = get_academic_year_for_date(db, college_id, on_date)
+    else:
+        res = get_current_academic_year(db, college_id)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Academic year not found")
+    return res
+
+
 @router.post("/", status_code=201)
 def create_academic_year_endpoint(data: AcademicYearCreate, db: Session = Depends(get_db)):
     res = create_academic_year(db, data)
@@ -64,6 +80,19 @@ def set_current(academic_year_id: int, db: Session = Depends(get_db)):
     return res
 
 
+@router.post("/{academic_year_id}/rollover")
+def rollover(academic_year_id: int, dry_run: bool = False, db: Session = Depends(get_db)):
+    """
+    Clone the college's active courses, semesters and subjects for this
+    year, retire the previous rows and make this year current.
+    Use `dry_run=true` to only see what would be cloned.
+    """
+    res = rollover_academic_year(db, academic_year_id, dry_run)
+    if isinstance(res, dict) and res.get("error"):
+        raise HTTPException(status_code=400, detail=res.get("error"))
+    return res
+
+
 @router.delete("/{academic_year_id}")
 def remove_academic_year(academic_year_id: int, db: Session = Depends(get_db)):
     ok = delete_academic_year(db, academic_year_id)
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
 from app.models.college import College
 from app.schemas.college import CollegeCreate
+from app.services.college_service import invalidate_college
+from app.services.curriculum_service import get_curriculum_tree
 
 router = APIRouter(prefix="/admin/colleges", tags=["Admin - Colleges"])
 
@@ -62,10 +64,20 @@ def create_college(data: dict, db: Session = Depends(get_db)):
     db.add(college)
     db.commit()
     db.refresh(college)
+    invalidate_college(college.college_id)
 
     return {"message": "College created successfully"}
 
 
+@router.get("/{college_id}/curriculum")
+def get_college_curriculum(college_id: int, db: Session = Depends(get_db)):
+    """Whole education type -> course -> semester -> subject tree for one college"""
+    tree = get_curriculum_tree(db, college_id)
+    if tree is None:
+        raise HTTPException(404, "College not found")
+    return tree
+
+
 @router.put("/{college_id}")
 def update_college(college_id: int, data: CollegeCreate, db: Session = Depends(get_db)):
     college = db.query(College).filter(College.college_id == college_id).first()
@@ -81,6 +93,7 @@ def update_college(college_id: int, data: CollegeCreate, db: Session = Depends(g
     college.status = 1 if data.status == "active" else 0
 
     db.commit()
+    invalidate_college(college_id)
     return {"message": "College updated"}
 
 @router.patch("/{college_id}/status")
@@ -91,6 +104,7 @@ def toggle_status(college_id: int, db: Session = Depends(get_db)):
 
     college.status = 0 if college.status == 1 else 1
     db.commit()
+    invalidate_college(college_id)
     return {"message": "Status updated"}
 
 
@@ -103,4 +117,5 @@ def delete_college(college_id: int, db: Session = Depends(get_db)):
     # perform a soft delete (set status to 0) to avoid accidental data loss
     college.status = 0
     db.commit()
+    invalidate_college(college_id)
     return {"message": "College deleted (status set to inactive)"}
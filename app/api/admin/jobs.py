@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core.database import SessionLocal
+from app.core.jobs import registered_job_types
+from app.services.job_service import submit_job, get_job, get_jobs, cancel_job
+from app.schemas.job_schema import JobSubmit, JobResponse
+
+router = APIRouter(prefix="/admin/jobs", tags=["Admin - Jobs"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/", response_model=List[JobResponse])
+def list_jobs(status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50, db: Session = Depends(get_db)):
+    return get_jobs(db, status, job_type, min(limit, 500))
+
+
+@router.get("/types")
+def list_job_types():
+    return registered_job_types()
+
+
+@router.post("/", status_code=202, response_model=JobResponse)
+def submit_job_endpoint(data: JobSubmit, db: Session = Depends(get_db)):
+    res = submit_job(db, data.job_type, data.params)
+    if isinstance(res, dict) and res.get("error"):
+        raise HTTPException(status_code=400, detail=res.get("error"))
+    return res
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job_endpoint(job_id: int, db: Session = Depends(get_db)):
+    res = get_job(db, job_id)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return res
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+def cancel_job_endpoint(job_id: int, db: Session = Depends(get_db)):
+    res = cancel_job(db, job_id)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if isinstance(res, dict) and res.get("error"):
+        raise HTTPException(status_code=409, detail=res.get("error"))
+    return res
@@ -0,0 +1,27 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.api.auth import require_super_admin
+from app.core.profiling import list_profiles, get_profile_file
+
+router = APIRouter(
+    prefix="/admin/profiles",
+    tags=["Admin - Profiles"],
+    dependencies=[Depends(require_super_admin)],
+)
+
+
+@router.get("/", response_model=List[dict])
+def list_profiles_endpoint(request: Request):
+    """Stored request profiles, newest first"""
+    return list_profiles(request.app.state.settings.profile_dir)
+
+
+@router.get("/{profile_id}")
+def download_profile(profile_id: str, request: Request):
+    """Folded stacks of one profile, ready for flamegraph.pl or speedscope"""
+    path = get_profile_file(request.app.state.settings.profile_dir, profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
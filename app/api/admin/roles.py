@@ -2,10 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from app.core.database import SessionLocal
-from app.services.role_service import get_roles_with_permissions, create_role
+from app.services.role_service import get_roles_with_permissions, create_role, invalidate_roles, set_role_permissions
 from app.services.permission_service import get_permission_by_code
 from app.models.role_permission import RolePermission
-from app.schemas.role import RoleCreate, RoleResponse
+from app.schemas.role import RoleCreate, RoleResponse, RolePermissionsUpdate
 
 
 router = APIRouter(prefix="/admin/roles", tags=["Admin - Roles"])
@@ -51,4 +51,15 @@ def toggle_role_permission(
         ).delete()
 
     db.commit()
+    invalidate_roles()
     return {"message": "Permission updated"}
+
+
+@router.put("/{role_id}/permissions")
+def replace_role_permissions(role_id: int, data: RolePermissionsUpdate, db: Session = Depends(get_db)):
+    res = set_role_permissions(db, role_id, data.permissions)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Role not found")
+    if isinstance(res, dict) and res.get("error"):
+        raise HTTPException(status_code=400, detail=res.get("error"))
+    return res
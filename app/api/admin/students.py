@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from uuid import uuid4
+from app.core.database import SessionLocal
+from app.services.job_service import submit_job
+from app.services.student_service import (
+    get_students,
+    create_student,
+    update_student,
+    toggle_student_status,
+    delete_student,
+    validate_admission_target,
+    start_admission_progress,
+    get_admission_progress,
+    import_admissions,
+)
+from app.schemas.student_schema import (
+    StudentCreate,
+    StudentUpdate,
+    StudentResponse,
+)
+
+router = APIRouter(prefix="/admin/students", tags=["Admin - Students"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/", response_model=List[StudentResponse])
+def list_students(college_id: int, admission_year: Optional[int] = None, db: Session = Depends(get_db)):
+    return get_students(db, college_id, admission_year)
+
+
+@router.post("/", status_code=201)
+def create_student_endpoint(data: StudentCreate, db: Session = Depends(get_db)):
+    res = create_student(db, data)
+    if isinstance(res, dict) and res.get("error"):
+        raise HTTPException(status_code=400, detail=res.get("error"))
+    return res
+
+
+@router.post("/bulk-admission")
+async def bulk_admission(
+    request: Request,
+    college_id: int,
+    role_id: Optional[int] = None,
+    upload_id: Optional[str] = None,
+    background: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Stream a CSV of admissions (header row: name, email, phone,
+    admission_number, admission_year, status) into the given college.
+    Rows are committed in batches while the upload is still arriving;
+    pass an `upload_id` to poll progress from another request, or
+    `background=true` to get a 202 and run the import as a job.
+    """
+    err = await run_in_threadpool(validate_admission_target, db, college_id, role_id)
+    if err:
+        raise HTTPException(status_code=400, detail=err.get("error"))
+
+    if background:
+        raw = await request.body()
+        try:
+            text = raw.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+        params = {"college_id": college_id, "role_id": role_id, "csv": text}
+        job = await run_in_threadpool(submit_job, db, "students.bulk_admission", params)
+        return JSONResponse(status_code=202, content=job)
+
+    progress = start_admission_progress(upload_id or uuid4().hex)
+    try:
+        return await import_admissions(db, request.stream(), college_id, role_id, progress)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+
+
+@router.get("/bulk-admission/{upload_id}")
+def bulk_admission_progress(upload_id: str):
+    progress = get_admission_progress(upload_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return progress
+
+
+@router.put("/{student_id}")
+def update_student_endpoint(student_id: int, data: StudentUpdate, db: Session = Depends(get_db)):
+    res = update_student(db, student_id, data)
+    if isinstance(res, dict) and res.get("error"):
+        raise HTTPException(status_code=400, detail=res.get("error"))
+    return res
+
+
+@router.patch("/{student_id}/toggle-status")
+def toggle_status(student_id: int, db: Session = Depends(get_db)):
+    res = toggle_student_status(db, student_id)
+    if res is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return res
+
+
+@router.delete("/{student_id}")
+def remove_student(student_id: int, db: Session = Depends(get_db)):
+    ok = delete_student(db, student_id)
+    if not ok:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return {"message": "Student deleted (status set to inactive)"}
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
 from app.schemas.user_schema import UserCreate, UserUpdate, UserResponse
+from app.services.job_service import submit_job
 from app.services.user_service import (
     get_users,
     create_user,
     update_user,
     toggle_user_status,
     delete_user,
+    parse_bulk_user_payload,
+    bulk_create_users,
 )
 
 router = APIRouter(prefix="/admin/users", tags=["Admin - Users"])
@@ -32,6 +37,24 @@ def create_new_user(data: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=res.get("error"))
     return res
 
+@router.post("/bulk")
+async def bulk_import_users(request: Request, background: bool = False, db: Session = Depends(get_db)):
+    """
+    Import many users at once from a CSV file (Content-Type: text/csv) or a
+    JSON array. Columns: name, email, phone, role_id, college_id, status.
+    Returns a per-row error report and the import throughput, or with
+    `background=true` a 202 with the job to poll under /admin/jobs.
+    """
+    raw = await request.body()
+    try:
+        rows = parse_bulk_user_payload(raw, request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+    if background:
+        job = await run_in_threadpool(submit_job, db, "users.bulk_import", {"rows": rows})
+        return JSONResponse(status_code=202, content=job)
+    return await run_in_threadpool(bulk_create_users, db, rows)
+
 @router.put("/{user_id}", response_model=UserResponse)
 def update_existing_user(user_id: int, data: UserUpdate, db: Session = Depends(get_db)):
     res = update_user(db, user_id, data)
@@ -3,50 +3,75 @@ from pydantic import BaseModel, EmailStr, field_validator
 from typing import List, Optional
 from sqlalchemy.orm import Session
 import hashlib
-import os
 from datetime import datetime, timedelta
 
-try:
-    from jose import jwt, JWTError
-    _JOSE_AVAILABLE = True
-    _USING_PYJWT = False
-except Exception:
-    try:
-        import jwt
-        from jwt.exceptions import PyJWTError as JWTError
-        _JOSE_AVAILABLE = True
-        _USING_PYJWT = True
-    except Exception:
-        jwt = None
-        JWTError = Exception
-        _JOSE_AVAILABLE = False
-        _USING_PYJWT = False
-
-from passlib.context import CryptContext
 from passlib.exc import UnknownHashError
+from starlette.datastructures import Headers
 
+from app.core.config import Settings, get_settings
 from app.core.database import SessionLocal
+from app.core.login_index import enabled as logins_indexed, login_college
+from app.core.sharding import college_route
+from app.core.tracing import start_span, traced
 from app.models.user import User
 from app.models.user_role import UserRole
 from app.models.role import Role
 from app.models.role_permission import RolePermission
-from app.models.permission import Permission
 from app.models.college import College
+from app.services.permission_service import get_permission_catalog
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-if not SECRET_KEY:
-    raise RuntimeError("SECRET_KEY environment variable not set")
+def _load_jwt_library():
+    """Return (jwt module, its error class), preferring python-jose over PyJWT"""
+    try:
+        from jose import jwt, JWTError
+        return jwt, JWTError
+    except Exception:
+        try:
+            import jwt
+            from jwt.exceptions import PyJWTError as JWTError
+            return jwt, JWTError
+        except Exception:
+            return None, Exception
+
+
+class AuthBackend:
+    """
+    Signing key, JWT library and bcrypt context. Built once by init_auth()
+    from the app lifespan, so importing this module stays cheap and does not
+    require SECRET_KEY to be set.
+    """
+
+    def __init__(self, settings: Settings):
+        if not settings.secret_key:
+            raise RuntimeError("SECRET_KEY environment variable not set")
+
+        from passlib.context import CryptContext
+
+        self.secret_key = settings.secret_key
+        self.algorithm = settings.jwt_algorithm
+        self.access_token_expire_minutes = settings.access_token_expire_minutes
+        self.refresh_token_expire_days = settings.refresh_token_expire_days
+        self.jwt, self.jwt_error = _load_jwt_library()
+        # Bcrypt password context
+        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+_backend: Optional[AuthBackend] = None
+
+
+def init_auth(settings: Optional[Settings] = None) -> AuthBackend:
+    global _backend
+    _backend = AuthBackend(settings or get_settings())
+    return _backend
+
 
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
-REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+def get_auth_backend() -> AuthBackend:
+    return _backend if _backend is not None else init_auth()
 
-# Bcrypt password context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Router setup
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -123,7 +148,8 @@ def hash_password(password: str) -> str:
     Use this when creating or updating user passwords.
     """
     processed = preprocess_password(password)
-    return pwd_context.hash(processed)
+    with start_span("bcrypt.hash"):
+        return get_auth_backend().pwd_context.hash(processed)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -134,7 +160,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         # Preprocess password (handles > 72 bytes)
         processed = preprocess_password(plain_password)
-        return pwd_context.verify(processed, hashed_password)
+        with start_span("bcrypt.verify"):
+            return get_auth_backend().pwd_context.verify(processed, hashed_password)
     except UnknownHashError:
         # Invalid hash format
         return False
@@ -152,57 +179,45 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 # JWT TOKEN UTILITIES
 # ============================================================================
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token"""
-    if not _JOSE_AVAILABLE:
+def _jwt_backend() -> AuthBackend:
+    backend = get_auth_backend()
+    if backend.jwt is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="JWT library not available. Install python-jose[cryptography] or PyJWT"
         )
+    return backend
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """Create a JWT access token"""
+    backend = _jwt_backend()
     
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=backend.access_token_expire_minutes))
     to_encode.update({"exp": expire, "type": "access"})
     
-    if _USING_PYJWT:
-        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    else:
-        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return backend.jwt.encode(to_encode, backend.secret_key, algorithm=backend.algorithm)
 
 
 def create_refresh_token(data: dict) -> str:
     """Create a JWT refresh token"""
-    if not _JOSE_AVAILABLE:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="JWT library not available. Install python-jose[cryptography] or PyJWT"
-        )
+    backend = _jwt_backend()
     
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    expire = datetime.utcnow() + timedelta(days=backend.refresh_token_expire_days)
     to_encode.update({"exp": expire, "type": "refresh"})
     
-    if _USING_PYJWT:
-        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    else:
-        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return backend.jwt.encode(to_encode, backend.secret_key, algorithm=backend.algorithm)
 
 
 def decode_token(token: str) -> dict:
     """Decode and verify a JWT token"""
-    if not _JOSE_AVAILABLE:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="JWT library not available. Install python-jose[cryptography] or PyJWT"
-        )
+    backend = _jwt_backend()
     
     try:
-        if _USING_PYJWT:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        else:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+        return backend.jwt.decode(token, backend.secret_key, algorithms=[backend.algorithm])
+    except backend.jwt_error:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
@@ -213,6 +228,7 @@ def decode_token(token: str) -> dict:
 # USER & ROLE UTILITIES
 # ============================================================================
 
+@traced
 def load_user_role(db: Session, user_id: int) -> Optional[Role]:
     """Load the primary active role for a user"""
     user_role = (
@@ -234,6 +250,7 @@ def load_user_role(db: Session, user_id: int) -> Optional[Role]:
     return role
 
 
+@traced
 def load_permissions_for_user(db: Session, user_id: int) -> List[str]:
     """Load all permissions for a user based on their roles"""
     # Get all active role IDs for the user
@@ -247,29 +264,34 @@ def load_permissions_for_user(db: Session, user_id: int) -> List[str]:
     if not role_ids:
         return []
     
-    # Get all permissions for those roles
-    permissions = (
-        db.query(Permission.permission_code)
-        .join(RolePermission, RolePermission.permission_id == Permission.permission_id)
+    # Get all permissions for those roles; codes of active permissions come
+    # from the in-memory catalog
+    permission_ids = (
+        db.query(RolePermission.permission_id)
         .filter(
             RolePermission.role_id.in_(role_ids),
-            RolePermission.status == 1,
-            Permission.status == 1
+            RolePermission.status == 1
         )
         .all()
     )
+    catalog = get_permission_catalog(db)
     
     # Return unique permission codes
-    return list({p[0] for p in permissions})
+    return list({code for (pid,) in permission_ids if (code := catalog.active_code(pid))})
+
+
+def _is_super_admin_role(role: Optional[Role]) -> bool:
+    return bool(role and role.role_name and role.role_name.lower() == "super admin")
 
 
+@traced
 def is_super_admin(db: Session, role_id: Optional[int]) -> bool:
     """Check if a role is Super Admin"""
     if not role_id:
         return False
     
     role = db.query(Role).filter(Role.role_id == role_id, Role.status == 1).first()
-    return role and role.role_name and role.role_name.lower() == "super admin"
+    return _is_super_admin_role(role)
 
 
 # ============================================================================
@@ -285,12 +307,17 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
     - **password**: User's password (max 72 bytes for bcrypt)
     """
     
-    # Find user by email
-    user = (
-        db.query(User)
-        .filter(User.email == data.email, User.status == 1)
-        .first()
-    )
+    # Find user by email; with shards the login index gives the college
+    # whose shard holds the user, so only that shard is asked
+    user = None
+    found, college_id = login_college(db, data.email) if logins_indexed() else (True, None)
+    if found:
+        with college_route(college_id):
+            user = (
+                db.query(User)
+                .filter(User.email == data.email, User.status == 1)
+                .first()
+            )
     
     if not user:
         raise HTTPException(
@@ -306,14 +333,16 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
         )
     
     # Load user's role and permissions
-    role = load_user_role(db, user.user_id)
-    permissions = load_permissions_for_user(db, user.user_id)
+    with college_route(user.college_id):
+        role = load_user_role(db, user.user_id)
+        permissions = load_permissions_for_user(db, user.user_id)
     
-    # Create token payload
+    # Create token payload; super_admin tokens are not scoped to their college
     token_payload = {
         "user_id": user.user_id,
         "role_id": role.role_id if role else None,
         "college_id": user.college_id,
+        "super_admin": _is_super_admin_role(role),
         "permissions": permissions,
     }
     
@@ -369,7 +398,8 @@ def refresh_access_token(data: RefreshRequest, db: Session = Depends(get_db)):
     # Optionally: Reload permissions from database for fresh data
     user_id = payload.get("user_id")
     if user_id:
-        permissions = load_permissions_for_user(db, user_id)
+        with college_route(payload.get("college_id")):
+            permissions = load_permissions_for_user(db, user_id)
         payload["permissions"] = permissions
     
     # Create new access token
@@ -377,6 +407,7 @@ def refresh_access_token(data: RefreshRequest, db: Session = Depends(get_db)):
         "user_id": payload.get("user_id"),
         "role_id": payload.get("role_id"),
         "college_id": payload.get("college_id"),
+        "super_admin": payload.get("super_admin", False),
         "permissions": payload.get("permissions", []),
     }
     
@@ -398,6 +429,39 @@ def logout():
 # AUTHORIZATION DEPENDENCY
 # ============================================================================
 
+def get_token_payload(request: Request) -> dict:
+    """
+    Return the verified access token payload for a request.
+    Sub-requests dispatched by /batch carry the payload already verified
+    by the outer request in `request.state.token_payload`.
+    """
+    payload = getattr(request.state, "token_payload", None)
+    if payload is not None:
+        return payload
+    
+    # Extract token from Authorization header
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    
+    token = auth_header.split(" ", 1)[1]
+    
+    # Decode token
+    payload = decode_token(token)
+    
+    # Verify it's an access token
+    if payload.get("type") != "access":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+    
+    return payload
+
+
 def require_permissions(permission_codes: List[str]):
     """
     Dependency factory to check if user has required permissions.
@@ -408,30 +472,21 @@ def require_permissions(permission_codes: List[str]):
     """
     
     def permission_checker(request: Request, db: Session = Depends(get_db)):
-        # Extract token from Authorization header
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Not authenticated"
-            )
-        
-        token = auth_header.split(" ", 1)[1]
-        
-        # Decode token
-        payload = decode_token(token)
-        
-        # Verify it's an access token
-        if payload.get("type") != "access":
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token type"
-            )
+        payload = get_token_payload(request)
         
         role_id = payload.get("role_id")
         
+        try:
+            # the role is on the shard of the token's college, not the one addressed
+            with college_route(payload.get("college_id")):
+                super_admin = is_super_admin(db, role_id)
+        finally:
+            # Hand the connection back before the endpoint checks out its own;
+            # holding both is a nested checkout that deadlocks a busy pool
+            db.close()
+        
         # Super Admin bypass
-        if is_super_admin(db, role_id):
+        if super_admin:
             return payload
         
         # Check permissions
@@ -448,6 +503,74 @@ def require_permissions(permission_codes: List[str]):
     return permission_checker
 
 
+def require_super_admin(request: Request, db: Session = Depends(get_db)) -> dict:
+    """Dependency that only lets Super Admin tokens through"""
+    payload = get_token_payload(request)
+    
+    try:
+        with college_route(payload.get("college_id")):
+            super_admin = is_super_admin(db, payload.get("role_id"))
+    finally:
+        # Same as permission_checker: release before the endpoint's session
+        db.close()
+    
+    if not super_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Super Admin access required"
+        )
+    
+    return payload
+
+
+def is_super_admin_request(headers) -> bool:
+    """
+    True if the request headers carry a valid Super Admin access token.
+    Used outside the dependency system, e.g. to gate the profiling header.
+    """
+    auth_header = headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return False
+    
+    try:
+        payload = decode_token(auth_header.split(" ", 1)[1])
+    except HTTPException:
+        return False
+    
+    if payload.get("type") != "access":
+        return False
+    
+    db = SessionLocal()
+    try:
+        with college_route(payload.get("college_id")):
+            return bool(is_super_admin(db, payload.get("role_id")))
+    finally:
+        db.close()
+
+
+def request_tenant(scope) -> Optional[int]:
+    """
+    College an HTTP request is scoped to (see app/core/tenant.py): the
+    college_id claim of its access token. None, i.e. unscoped, for Super
+    Admin tokens and for requests without a valid access token, which the
+    routes' own auth dependencies accept or reject as before.
+    """
+    payload = scope.get("state", {}).get("token_payload")
+    if payload is None:
+        auth_header = Headers(scope=scope).get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return None
+        try:
+            payload = decode_token(auth_header.split(" ", 1)[1])
+        except HTTPException:
+            return None
+        if payload.get("type") != "access":
+            return None
+    if payload.get("super_admin"):
+        return None
+    return payload.get("college_id")
+
+
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> dict:
     """
     Dependency to get current authenticated user from token.
@@ -458,27 +581,7 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> dict:
             return current_user
     """
     
-    # Extract token
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    token = auth_header.split(" ", 1)[1]
-    
-    # Decode and return payload
-    payload = decode_token(token)
-    
-    # Verify it's an access token
-    if payload.get("type") != "access":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token type"
-        )
-    
-    return payload
+    return get_token_payload(request)
 
 
 # ============================================================================
@@ -494,14 +597,16 @@ def get_current_user_info(current_user: dict = Depends(get_current_user), db: Se
     
     user_id = current_user.get("user_id")
     
-    user = db.query(User).filter(User.user_id == user_id, User.status == 1).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    role = load_user_role(db, user_id)
+    with college_route(current_user.get("college_id")):
+        user = db.query(User).filter(User.user_id == user_id, User.status == 1).first()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        role = load_user_role(db, user_id)
+        super_admin = is_super_admin(db, current_user.get("role_id"))
     college = None
     if user.college_id:
         college = db.query(College).filter(College.college_id == user.college_id).first()
@@ -515,5 +620,5 @@ def get_current_user_info(current_user: dict = Depends(get_current_user), db: Se
         "college_id": user.college_id,
         "college_name": college.college_name if college else None,
         "permissions": current_user.get("permissions", []),
-        "is_super_admin": is_super_admin(db, current_user.get("role_id"))
+        "is_super_admin": super_admin
     }
\ No newline at end of file
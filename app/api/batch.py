@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import time
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from app.api.auth import get_current_user
+from app.core.asgi import asgi_call
+from app.schemas.batch_schema import BatchRequest, BatchResponse
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Batch"])
+
+# Only reads are run concurrently; writes keep the order the client sent them in
+SAFE_METHODS = {"GET", "HEAD"}
+
+# the only client headers passed on to sub-requests; proxy, hop-by-hop and
+# control headers such as X-Forwarded-For or X-Profile are dropped
+FORWARDED_SUB_HEADERS = {"accept", "accept-language", "if-none-match", "if-modified-since"}
+
+# taken from the batch request itself, so sub-requests have its client address
+OUTER_HEADERS = ("authorization", "x-forwarded-for")
+
+
+async def _dispatch(app, request: Request, method: str, path: str, body, headers: dict) -> tuple:
+    """Run one sub-request through the ASGI app in-process and collect its response"""
+    return await asgi_call(
+        app, method, path, body, headers,
+        scheme=request.url.scheme,
+        client=request.scope.get("client"),
+        server=request.scope.get("server"),
+        # share the verified auth context instead of decoding the token again
+        state={**request.scope.get("state", {}), "token_payload": request.state.token_payload},
+    )
+
+
+async def _run_sub_request(app, request: Request, sub, headers: dict) -> dict:
+    start = time.perf_counter()
+    method = sub.method.upper()
+    path = sub.path
+
+    try:
+        status_code, response_headers, raw = await _dispatch(app, request, method, path, sub.body, headers)
+        # routes are declared with a trailing slash, follow the redirect once
+        if status_code in (307, 308) and response_headers.get("location"):
+            location = response_headers["location"]
+            if "://" in location:
+                location = "/" + location.split("://", 1)[1].split("/", 1)[-1]
+            status_code, response_headers, raw = await _dispatch(app, request, method, location, sub.body, headers)
+    except Exception:
+        # only this entry fails; the others, and writes already committed, are still reported
+        logger.exception("Batch sub-request %s %s failed", method, path)
+        return {
+            "status": 500,
+            "body": {"detail": "Internal Server Error"},
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    body = None
+    if raw:
+        if response_headers.get("content-type", "").startswith("application/json"):
+            body = json.loads(raw)
+        else:
+            body = raw.decode("utf-8", errors="replace")
+
+    return {
+        "status": status_code,
+        "body": body,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def run_batch(data: BatchRequest, request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Run several API calls in one HTTP round trip.
+
+    Reads run concurrently, writes run sequentially in request order.
+    Every sub-request reuses the caller's already verified token and is
+    authorized by its own route exactly as a direct call would be.
+    Results are keyed by sub-request id.
+    """
+    max_requests = request.app.state.settings.batch_max_requests
+    if len(data.requests) > max_requests:
+        raise HTTPException(status_code=400, detail=f"A batch cannot contain more than {max_requests} requests")
+
+    ids = [sub.id for sub in data.requests]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Sub-request ids must be unique")
+
+    for sub in data.requests:
+        # the query is split off first, as asgi_call does, so "/batch/?x=1"
+        # cannot reach /batch through the trailing-slash redirect
+        if not sub.path.startswith("/") or sub.path.partition("?")[0].rstrip("/") == "/batch":
+            raise HTTPException(status_code=400, detail=f"Invalid path for sub-request '{sub.id}'")
+
+    request.state.token_payload = current_user
+    app = request.app
+    start = time.perf_counter()
+
+    def headers_for(sub) -> dict:
+        headers = {k: v for k, v in (sub.headers or {}).items() if k.lower() in FORWARDED_SUB_HEADERS}
+        for name in OUTER_HEADERS:
+            if request.headers.get(name):
+                headers[name] = request.headers[name]
+        return headers
+
+    reads = [sub for sub in data.requests if sub.method.upper() in SAFE_METHODS]
+    writes = [sub for sub in data.requests if sub.method.upper() not in SAFE_METHODS]
+
+    results = {}
+    read_results = await asyncio.gather(*(_run_sub_request(app, request, sub, headers_for(sub)) for sub in reads))
+    for sub, res in zip(reads, read_results):
+        results[sub.id] = res
+    for sub in writes:
+        results[sub.id] = await _run_sub_request(app, request, sub, headers_for(sub))
+
+    return {
+        "results": {i: results[i] for i in ids},
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.warmup import readiness
+
+router = APIRouter(prefix="/health", tags=["Monitoring"])
+
+
+@router.get("/live", include_in_schema=False)
+async def live():
+    """The process is up and serving; says nothing about warm-up. Async, so it never waits for a thread"""
+    return {"status": "ok"}
+
+
+@router.get("/ready", include_in_schema=False)
+async def ready():
+    """200 once warm-up has finished, 503 before that and during shutdown"""
+    state = readiness.snapshot()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
@@ -0,0 +1,179 @@
+import logging
+import math
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.pool import QueuePool
+from starlette.responses import JSONResponse
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Load level at which each priority starts being rejected, so under
+# overload bulk writes go first and logins last
+SHED_AT_LOAD = {"critical": 1.25, "read": 1.0, "write": 0.9, "bulk": 0.75}
+
+REJECTED = registry.counter("admission_rejected_total", "Requests rejected with 503 by admission control", ("class", "priority", "reason"))
+ADMITTED_IN_FLIGHT = registry.gauge("admission_in_flight", "Admitted requests queued or running in a concurrency class")
+LOAD = registry.gauge("admission_load", "Load level used for shedding; 1.0 is the configured capacity")
+POOL_WAIT = registry.histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection")
+POOL_PRESSURE = registry.gauge("db_pool_pressure_seconds", "Pool wait as seen by admission control, zero while no checkout waits")
+
+# ============================================================================
+# POOL WAIT
+# ============================================================================
+
+
+class PoolWaitTracker:
+    """
+    Pool pressure as seen by admission control: while checkouts are
+    waiting, the larger of the average wait of recent checkouts and the
+    age of the oldest one still waiting (so a stalled pool shows up before
+    any checkout completes); zero as soon as nothing waits, so shedding
+    stops the moment the pool has a free connection again.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._average = 0.0
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def begin(self) -> object:
+        token = object()
+        with self._lock:
+            self._waiting[token] = time.monotonic()
+        return token
+
+    def end(self, token: object):
+        with self._lock:
+            seconds = time.monotonic() - self._waiting.pop(token)
+            self._average = self._average * (1 - self.alpha) + seconds * self.alpha
+        POOL_WAIT.observe(value=seconds)
+
+    def current(self) -> float:
+        with self._lock:
+            if not self._waiting:
+                return 0.0
+            return max(self._average, time.monotonic() - min(self._waiting.values()))
+
+
+pool_wait = PoolWaitTracker()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited (SQLAlchemy has no event before a checkout)"""
+
+    def _do_get(self):
+        token = pool_wait.begin()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.end(token)
+
+# ============================================================================
+# ADMISSION CONTROL
+# ============================================================================
+
+
+def request_priority(class_name: str, method: str, path: str) -> str:
+    if class_name == "auth" or path.startswith("/auth/"):
+        return "critical"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "bulk" if class_name == "heavy" else "write"
+
+
+class AdmissionController:
+    """
+    Decides, before a request queues for its concurrency class, whether to
+    take it or reject it with 503 + Retry-After. The load level is the
+    larger of in-flight requests over ADMISSION_MAX_IN_FLIGHT and the pool
+    wait estimate over ADMISSION_MAX_POOL_WAIT_MS; each priority has its
+    own level at which it is shed. A class whose queue is already
+    ADMISSION_MAX_QUEUE deep rejects regardless of priority.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.max_in_flight = 0
+        self.max_queue = 0
+        self.max_pool_wait = 0.0
+        self.retry_after = 1
+        self.in_flight = 0
+
+    def configure(self, settings: Optional[Settings] = None):
+        settings = settings or get_settings()
+        self.enabled = settings.admission_enabled
+        self.max_in_flight = settings.admission_max_in_flight or 4 * (settings.db_pool_size + settings.db_max_overflow)
+        self.max_queue = settings.admission_max_queue
+        self.max_pool_wait = settings.admission_max_pool_wait_ms / 1000
+        self.retry_after = settings.admission_retry_after
+
+    def load(self) -> float:
+        level = self.in_flight / self.max_in_flight if self.max_in_flight else 0.0
+        if self.max_pool_wait:
+            level = max(level, pool_wait.current() / self.max_pool_wait)
+        return level
+
+    def check(self, priority: str, waiting: int) -> Optional[str]:
+        """The reason to reject, or None to admit"""
+        if not self.enabled:
+            return None
+        if self.max_queue and waiting >= self.max_queue:
+            return "queue_full"
+        if self.load() >= SHED_AT_LOAD[priority]:
+            return "overloaded"
+        return None
+
+    def retry_after_seconds(self) -> int:
+        return max(1, math.ceil(self.retry_after * max(self.load(), 1.0)))
+
+    async def reject(self, scope, receive, send, class_name: str, priority: str, reason: str):
+        REJECTED.inc(class_name, priority, reason)
+        response = JSONResponse(
+            {"detail": "Server is busy, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(self.retry_after_seconds())},
+        )
+        await response(scope, receive, send)
+
+    def enter(self):
+        self.in_flight += 1
+        ADMITTED_IN_FLIGHT.set(value=self.in_flight)
+
+    def leave(self):
+        self.in_flight -= 1
+        ADMITTED_IN_FLIGHT.set(value=self.in_flight)
+
+
+admission = AdmissionController()
+
+
+def _collect():
+    LOAD.set(value=admission.load())
+    POOL_PRESSURE.set(value=pool_wait.current())
+
+
+registry.add_collector(_collect)
+
+
+async def pool_timeout_handler(request, exc):
+    """
+    A checkout that timed out (DB_POOL_TIMEOUT) is overload, not a server
+    bug: answer 503 + Retry-After instead of 500
+    """
+    REJECTED.inc("-", "-", "pool_timeout")
+    logger.warning("Connection pool timeout on %s %s", request.method, request.url.path)
+    return JSONResponse(
+        {"detail": "Server is busy, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(admission.retry_after_seconds())},
+    )
@@ -0,0 +1,68 @@
+import json
+from typing import Optional
+
+
+async def asgi_call(
+    app,
+    method: str,
+    path: str,
+    body=None,
+    headers: Optional[dict] = None,
+    scheme: str = "http",
+    client: Optional[tuple] = ("127.0.0.1", 50000),
+    server: Optional[tuple] = ("localhost", 80),
+    state: Optional[dict] = None,
+) -> tuple:
+    """
+    Send one request through an ASGI app in-process, without a server, and
+    return (status, lowercased response headers, raw body). Used by /batch
+    and the load tools.
+    """
+    path, _, query = path.partition("?")
+    raw_body = json.dumps(body).encode() if body is not None else b""
+
+    header_list = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()]
+    if raw_body:
+        header_list.append((b"content-type", b"application/json"))
+        header_list.append((b"content-length", str(len(raw_body)).encode()))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": header_list,
+        "client": client,
+        "server": server,
+    }
+    if state is not None:
+        scope["state"] = state
+
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": raw_body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    status_code = 500
+    response_headers = {}
+    chunks = []
+
+    async def send(message):
+        nonlocal status_code, response_headers
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            response_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status_code, response_headers, b"".join(chunks)
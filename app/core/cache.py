@@ -0,0 +1,241 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import registry
+from app.core.tenant import get_tenant
+
+FLIGHTS = registry.counter("singleflight_calls_total", "Coalesced calls, by whether they computed the result, waited for another call's or gave up waiting and computed it too", ("name", "role"))
+CACHE_TENANTS = registry.gauge("cache_tenants", "Tenant partitions held by the in-process cache")
+CACHE_ENTRIES = registry.gauge("cache_entries", "Entries held by the in-process cache, over all tenants")
+CACHE_EVICTIONS = registry.counter("cache_evictions_total", "Cache entries evicted to stay within CACHE_MAX_ENTRIES_PER_TENANT and CACHE_MAX_TENANTS")
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key runs
+    the computation, callers arriving while it runs wait for it and get the
+    same result (or exception). Nothing is kept once the call returns.
+
+    Waiters give up after `timeout` seconds and compute the result
+    themselves, so a stuck computation (e.g. one waiting for a pooled
+    connection) does not hold every caller of its key.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], name: str = "") -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                FLIGHTS.inc(name, "timeout")
+                return fn()
+            FLIGHTS.inc(name, "follower")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        FLIGHTS.inc(name, "leader")
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+
+class VersionedCache:
+    """
+    Small in-process LRU cache with version-based invalidation.
+
+    Every entry is stored together with the version of its namespace at the
+    time it was written. Write paths call `bump(namespace)` after committing,
+    which makes every entry of that namespace stale without having to find
+    and delete them one by one.
+
+    Entries are partitioned by the current tenant (app/core/tenant.py), since
+    what a query returns depends on the college it is scoped to. Each
+    partition is an LRU of at most max_entries_per_tenant entries and only
+    the max_tenants most recently used partitions are kept, so one large
+    college evicts its own entries, not everyone else's.
+    """
+
+    def __init__(self, max_entries_per_tenant: int = 256, max_tenants: int = 1024, ttl: Optional[float] = 300):
+        self.max_entries_per_tenant = max_entries_per_tenant
+        self.max_tenants = max_tenants
+        self.ttl = ttl
+        self._partitions: "OrderedDict[Optional[int], OrderedDict[tuple, tuple]]" = OrderedDict()
+        self._versions: dict = {}
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._publishers = []
+
+    def configure(self, settings: Optional[Settings] = None):
+        """
+        Take the limits from CACHE_MAX_ENTRIES_PER_TENANT and CACHE_MAX_TENANTS.
+        Coalesced callers wait at most DB_POOL_TIMEOUT for another's result:
+        past that the computation is likely stuck waiting for a connection.
+        """
+        settings = settings or get_settings()
+        self.max_entries_per_tenant = settings.cache_max_entries_per_tenant
+        self.max_tenants = settings.cache_max_tenants
+        self._flights.timeout = _coalesced.timeout = settings.db_pool_timeout
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str, publish: bool = True) -> int:
+        """
+        Invalidate every entry of a namespace, for every tenant. With publish,
+        the publishers (see app/core/cache_sync.py) pass the bump on to the
+        other workers.
+        """
+        with self._lock:
+            v = self._versions.get(namespace, 0) + 1
+            self._versions[namespace] = v
+        if publish:
+            for publisher in self._publishers:
+                publisher(namespace)
+        return v
+
+    def on_bump(self, publisher: Callable[[str], None]) -> None:
+        """Call publisher(namespace) after every published bump"""
+        if publisher not in self._publishers:
+            self._publishers.append(publisher)
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        tenant = get_tenant()
+        with self._lock:
+            partition = self._partitions.get(tenant)
+            entry = partition.get((namespace, key)) if partition is not None else None
+            if entry is None:
+                return default
+            version, expires_at, value = entry
+            if version != self._versions.get(namespace, 0) or (expires_at is not None and expires_at < time.monotonic()):
+                del partition[(namespace, key)]
+                return default
+            partition.move_to_end((namespace, key))
+            self._partitions.move_to_end(tenant)
+            return value
+
+    def set(self, namespace: str, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        """
+        Store a value. Pass the `version` read before computing the value so
+        that a write committed in the meantime leaves the entry stale.
+        """
+        tenant = get_tenant()
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if version is None:
+                version = self._versions.get(namespace, 0)
+            partition = self._partitions.get(tenant)
+            if partition is None:
+                partition = self._partitions[tenant] = OrderedDict()
+            partition[(namespace, key)] = (version, expires_at, value)
+            partition.move_to_end((namespace, key))
+            self._partitions.move_to_end(tenant)
+            evicted = 0
+            while len(partition) > self.max_entries_per_tenant:
+                partition.popitem(last=False)
+                evicted += 1
+            while len(self._partitions) > self.max_tenants:
+                _, dropped = self._partitions.popitem(last=False)
+                evicted += len(dropped)
+        if evicted:
+            CACHE_EVICTIONS.inc(amount=evicted)
+
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value, computing and storing it on a miss. Misses
+        for the same entry are coalesced, so when a popular entry expires or
+        is invalidated only one caller recomputes it while the others wait
+        for its result instead of stampeding the database. A None result is
+        returned but not cached.
+        """
+        version = self.version(namespace)
+        value = self.get(namespace, key)
+        if value is not None:
+            return value
+
+        def load():
+            # a flight for this entry may have finished just before ours began
+            value = self.get(namespace, key)
+            if value is None:
+                value = compute()
+                if value is not None:
+                    self.set(namespace, key, value, version=version)
+            return value
+
+        return self._flights.do((get_tenant(), namespace, key, version), load, name=namespace)
+
+    def stats(self) -> tuple:
+        """(tenant partitions, entries)"""
+        with self._lock:
+            return len(self._partitions), sum(len(p) for p in self._partitions.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+
+# Shared cache instance used by the services; sized by configure() in create_app
+cache = VersionedCache()
+
+
+def _collect():
+    tenants, entries = cache.stats()
+    CACHE_TENANTS.set(value=tenants)
+    CACHE_ENTRIES.set(value=entries)
+
+
+registry.add_collector(_collect)
+
+_coalesced = SingleFlight()
+
+
+def coalesce(namespace: Optional[str] = None):
+    """
+    Decorator for read services called as fn(db, *args, **kwargs):
+    concurrent calls with the same arguments share one computation and its
+    result. The db session is left out of the key, the current tenant is
+    part of it since it scopes the queries. With a namespace its
+    cache version is part of the key, so a call made after a write has
+    bumped it starts a new computation instead of joining one that began
+    before the write. Callers must treat the shared result as read-only.
+    """
+
+    def decorator(fn):
+        name = fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(db, *args, **kwargs):
+            key = (name, get_tenant(), args, tuple(sorted(kwargs.items())), cache.version(namespace) if namespace else None)
+            return _coalesced.do(key, lambda: fn(db, *args, **kwargs), name=name)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.cache import cache
+from app.core.config import Settings, get_settings
+from app.core.database import get_engine
+from app.core.metrics import registry
+from app.models.cache_version import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+# Core table, not the mapped class, so using it never configures the other mappers
+versions = CacheVersion.__table__
+
+SYNC_INVALIDATIONS = registry.counter("cache_sync_invalidations_total", "Local cache namespaces invalidated because another worker bumped them", ("namespace",))
+SYNC_ERRORS = registry.counter("cache_sync_errors_total", "Failed reads or writes of tbl_cache_versions", ("op",))
+SYNC_STALE_CLEARS = registry.counter("cache_sync_stale_clears_total", "Local caches dropped because tbl_cache_versions could not be polled for CACHE_MAX_STALE seconds")
+SYNC_AGE = registry.gauge("cache_sync_age_seconds", "Time since tbl_cache_versions was last read successfully")
+
+
+class CacheVersionSync:
+    """
+    Keeps the in-process caches of several workers (on several hosts)
+    coherent without a broker. A published bump increments the namespace's
+    row in tbl_cache_versions, and a thread in every worker reads that small
+    table every CACHE_SYNC_INTERVAL seconds and bumps, locally, each
+    namespace whose version moved. Another worker's write is thus seen
+    within about one interval.
+
+    The increment is written by that same thread: publish() only queues the
+    namespace and wakes it. Bumps are published from write paths that may
+    still hold their session's connection, and a second checkout from the
+    pool there can deadlock a busy pool. If the table cannot be read for
+    CACHE_MAX_STALE seconds, the local caches are dropped on every tick
+    until it can, so staleness stays bounded even then.
+
+    Bumps are published once start() has run, i.e. in the app process;
+    scripts writing to a live database should call start() too.
+    """
+
+    def __init__(self):
+        self.interval = 0.0
+        self.max_stale = 0.0
+        self._seen: Dict[str, int] = {}
+        self._synced_at: Optional[float] = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, settings: Optional[Settings] = None):
+        settings = settings or get_settings()
+        self.interval = settings.cache_sync_interval
+        self.max_stale = settings.cache_max_stale
+        if self.interval <= 0 or self._thread is not None:
+            return
+        cache.on_bump(self.publish)
+        self._stop.clear()
+        try:
+            # caches are still empty: only record the versions
+            self.poll(baseline=True)
+        except Exception:
+            SYNC_ERRORS.inc("poll")
+            logger.exception("Could not read tbl_cache_versions")
+        self._thread = threading.Thread(target=self._run, name="cache-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        # bumps queued after the thread's last round
+        self.flush()
+
+    def publish(self, namespace: str):
+        """Queue an increment of the namespace's shared version; called after a committed write bumped it locally"""
+        if self._thread is None:
+            return
+        with self._lock:
+            self._pending.add(namespace)
+        self._wake.set()
+
+    def flush(self):
+        """Write the queued increments; several bumps of a namespace since the last flush make one"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for namespace in pending:
+            try:
+                try:
+                    version = self._increment(namespace)
+                except IntegrityError:
+                    # another worker inserted the first row for this namespace first
+                    version = self._increment(namespace)
+            except Exception:
+                SYNC_ERRORS.inc("publish")
+                logger.warning("Could not publish cache version of %s, retrying; other workers see it after CACHE_MAX_STALE at worst", namespace, exc_info=True)
+                with self._lock:
+                    self._pending.add(namespace)
+                continue
+            with self._lock:
+                # our own bump needs no second local invalidation, unless
+                # another worker's bump slipped in since the last poll
+                if self._seen.get(namespace, 0) == version - 1:
+                    self._seen[namespace] = version
+
+    def _increment(self, namespace: str) -> int:
+        now = datetime.utcnow()
+        with get_engine().begin() as conn:
+            updated = conn.execute(
+                update(versions)
+                .where(versions.c.namespace == namespace)
+                .values(version=versions.c.version + 1, updated_at=now)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(versions).values(namespace=namespace, version=1, updated_at=now))
+            return conn.execute(select(versions.c.version).where(versions.c.namespace == namespace)).scalar_one()
+
+    def poll(self, baseline: bool = False):
+        """Read every namespace's version and invalidate the ones that moved since the last poll"""
+        with get_engine().connect() as conn:
+            rows = conn.execute(select(versions.c.namespace, versions.c.version)).all()
+        changed = []
+        with self._lock:
+            for namespace, version in rows:
+                if not baseline and self._seen.get(namespace, 0) != version:
+                    changed.append(namespace)
+                self._seen[namespace] = version
+            self._synced_at = time.monotonic()
+        for namespace in changed:
+            cache.bump(namespace, publish=False)
+            SYNC_INVALIDATIONS.inc(namespace)
+
+    def _run(self):
+        next_poll = time.monotonic() + self.interval
+        while True:
+            # woken early by publish() and stop()
+            self._wake.wait(max(0.0, next_poll - time.monotonic()))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.flush()
+            if time.monotonic() < next_poll:
+                continue
+            next_poll = time.monotonic() + self.interval
+            try:
+                self.poll()
+            except Exception:
+                SYNC_ERRORS.inc("poll")
+                logger.warning("Could not poll tbl_cache_versions", exc_info=True)
+                if self._synced_at is None or time.monotonic() - self._synced_at > self.max_stale:
+                    cache.clear()
+                    SYNC_STALE_CLEARS.inc()
+
+
+cache_sync = CacheVersionSync()
+
+
+def _collect():
+    if cache_sync._synced_at is not None:
+        SYNC_AGE.set(value=time.monotonic() - cache_sync._synced_at)
+
+
+registry.add_collector(_collect)
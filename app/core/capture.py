@@ -0,0 +1,166 @@
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from app.core.config import get_settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# never recorded at all, not even as a shape
+_SECRET_KEYS = {"password", "password_hash", "token", "access_token", "refresh_token", "secret"}
+
+# ============================================================================
+# ANONYMIZATION
+# ============================================================================
+
+
+def _is_id(key: Optional[str]) -> bool:
+    return bool(key) and (key == "id" or key.endswith("_id") or key.endswith("_ids"))
+
+
+def _string_shape(value: str) -> dict:
+    shape = {"type": "str", "len": len(value)}
+    if "@" in value and "." in value.rsplit("@", 1)[-1]:
+        shape["format"] = "email"
+    elif value.isdigit():
+        shape["format"] = "digits"
+    elif len(value) == 10 and value[4:5] == "-" and value[7:8] == "-":
+        shape["format"] = "date"
+    return shape
+
+
+def anonymize(value, key: Optional[str] = None):
+    """
+    Replace a JSON value by its shape. Ids are kept as they are, so replayed
+    traffic hits the same colleges, courses and users; everything else is
+    reduced to its type, length and format.
+    """
+    if key in _SECRET_KEYS:
+        return {"type": "secret"}
+    if isinstance(value, dict):
+        return {"type": "object", "fields": {k: anonymize(v, k) for k, v in value.items()}}
+    if isinstance(value, list):
+        return {"type": "array", "len": len(value), "items": anonymize(value[0], key) if value else None}
+    if isinstance(value, bool):
+        return {"type": "bool"}
+    if isinstance(value, (int, float)):
+        return value if _is_id(key) else {"type": "int" if isinstance(value, int) else "float"}
+    if isinstance(value, str):
+        return value if _is_id(key) and value.isdigit() else _string_shape(value)
+    return {"type": "null"}
+
+
+def _anonymize_params(params: dict) -> dict:
+    out = {}
+    for k, v in params.items():
+        if _is_id(k) and str(v).isdigit():
+            out[k] = int(v)
+        elif k not in _SECRET_KEYS:
+            out[k] = _string_shape(str(v))
+    return out
+
+# ============================================================================
+# RECORDER
+# ============================================================================
+
+
+class TrafficRecorder:
+    """Appends records to a JSONL file from a background thread, off the event loop"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def record(self, entry: dict):
+        self._queue.put(entry)
+
+    def _run(self):
+        with open(self.path, "a") as f:
+            while True:
+                entry = self._queue.get()
+                try:
+                    f.write(json.dumps(entry) + "\n")
+                    if self._queue.empty():
+                        f.flush()
+                except Exception:
+                    logger.exception("Could not write traffic capture record")
+
+
+class TrafficCaptureMiddleware:
+    """
+    Records every request as an anonymized trace: arrival time, method,
+    route template, path and query parameters, the shape of the JSON body,
+    status and duration. No headers, tokens, passwords or free-text values
+    are written. Replay the file with `python -m app.tools.replay`.
+    """
+
+    def __init__(self, app, path: Optional[str] = None, max_body: Optional[int] = None):
+        self.app = app
+        settings = get_settings()
+        # capture is off unless a file is configured
+        path = path or settings.traffic_capture_file
+        self.max_body = max_body if max_body is not None else settings.traffic_capture_max_body
+        self.recorder = TrafficRecorder(path) if path else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.recorder is None:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        start = time.perf_counter()
+        body = bytearray()
+        truncated = False
+        status_code = 500
+
+        async def receive_wrapper():
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request" and not truncated:
+                body.extend(message.get("body", b""))
+                if len(body) > self.max_body:
+                    truncated = True
+                    body.clear()
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            entry = {
+                "ts": round(arrived, 6),
+                "method": scope["method"],
+                "route": route_template(scope),
+                "path_params": _anonymize_params(scope.get("path_params") or {}),
+                "query": _anonymize_params(dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))),
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
+            content_type = next((v for k, v in scope["headers"] if k == b"content-type"), b"").decode("latin-1")
+            if truncated:
+                entry["body"] = {"type": "truncated"}
+            elif body:
+                if content_type.startswith("application/json"):
+                    try:
+                        entry["body"] = anonymize(json.loads(body))
+                    except ValueError:
+                        entry["body"] = {"type": "bytes", "len": len(body)}
+                else:
+                    entry["body"] = {"type": "bytes", "len": len(body), "content_type": content_type}
+            self.recorder.record(entry)
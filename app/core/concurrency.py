@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import anyio
+import anyio.to_thread
+from fastapi.routing import APIRoute
+
+from app.core.admission import admission, request_priority
+from app.core.config import Settings, get_settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Sync routes not listed here (or in ROUTE_CONCURRENCY) are "light", async
+# ones unlimited; the bulk imports are async but do their work in threads
+DEFAULT_ROUTE_CLASSES = {
+    # bcrypt verify, ~100-300 ms of CPU each
+    "POST /auth/login": "auth",
+    # bulk writes and large reads
+    "POST /admin/users/bulk": "heavy",
+    "POST /admin/students/bulk-admission": "heavy",
+    "POST /admin/academic-years/{academic_year_id}/rollover": "heavy",
+    "GET /admin/colleges/{college_id}/curriculum": "heavy",
+    "GET /admin/users/": "heavy",
+    "GET /admin/students/": "heavy",
+}
+
+# "light" defaults to whatever auth and heavy leave of the threadpool
+DEFAULT_CAPACITIES = {"auth": 8, "heavy": 8}
+
+# a route assigned to this class only shares the global threadpool
+UNLIMITED = "none"
+
+QUEUE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+QUEUE_TIME = registry.histogram("concurrency_queue_seconds", "Time requests waited for a slot of their concurrency class", ("class",), QUEUE_BUCKETS)
+IN_USE = registry.gauge("concurrency_in_use", "Requests holding a slot of their concurrency class", ("class",))
+WAITING = registry.gauge("concurrency_waiting", "Requests queued for a slot of their concurrency class", ("class",))
+CAPACITY = registry.gauge("concurrency_capacity", "Slots of each concurrency class", ("class",))
+THREADPOOL_TOKENS = registry.gauge("threadpool_tokens", "Size of the threadpool running sync endpoints and dependencies")
+THREADPOOL_IN_USE = registry.gauge("threadpool_tokens_in_use", "Threadpool tokens currently borrowed")
+
+
+def _parse_mapping(raw: str) -> Dict[str, str]:
+    # "auth=4,heavy=6" / "POST /auth/login=auth,GET /admin/users/=heavy"
+    mapping = {}
+    for item in raw.split(","):
+        key, _, value = item.strip().rpartition("=")
+        if key and value:
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+# ============================================================================
+# CONCURRENCY CLASSES
+# ============================================================================
+
+
+class ConcurrencyClass:
+    """A named capacity limiter shared by every route assigned to it"""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.limiter = anyio.CapacityLimiter(capacity)
+        self.waiting = 0
+        CAPACITY.set(name, value=capacity)
+        IN_USE.set(name, value=0)
+        WAITING.set(name, value=0)
+
+    async def run(self, app, scope, receive, send):
+        queued = time.perf_counter()
+        self.waiting += 1
+        WAITING.inc(self.name)
+        try:
+            await self.limiter.acquire()
+        finally:
+            self.waiting -= 1
+            WAITING.dec(self.name)
+        QUEUE_TIME.observe(self.name, value=time.perf_counter() - queued)
+        IN_USE.inc(self.name)
+        try:
+            await app(scope, receive, send)
+        finally:
+            IN_USE.dec(self.name)
+            self.limiter.release()
+
+
+class _LimitedRoute:
+    """
+    Wraps a route's ASGI app so it runs inside a concurrency class, after
+    admission control has accepted it
+    """
+
+    def __init__(self, app, concurrency_class: ConcurrencyClass, priority: str):
+        self.app = app
+        self.concurrency_class = concurrency_class
+        self.priority = priority
+
+    async def __call__(self, scope, receive, send):
+        cls = self.concurrency_class
+        reason = admission.check(self.priority, cls.waiting)
+        if reason is not None:
+            await admission.reject(scope, receive, send, cls.name, self.priority, reason)
+            return
+        admission.enter()
+        try:
+            await cls.run(self.app, scope, receive, send)
+        finally:
+            admission.leave()
+
+
+classes: Dict[str, ConcurrencyClass] = {}
+
+
+def build_classes(settings: Optional[Settings] = None) -> Dict[str, ConcurrencyClass]:
+    settings = settings or get_settings()
+    capacities = {**DEFAULT_CAPACITIES, **{k: int(v) for k, v in _parse_mapping(settings.concurrency_limits).items()}}
+    if "light" not in capacities:
+        capacities["light"] = max(settings.threadpool_tokens - sum(capacities.values()), 1)
+    return {name: ConcurrencyClass(name, capacity) for name, capacity in capacities.items()}
+
+
+def route_class(route: APIRoute, route_classes: Dict[str, str]) -> Optional[str]:
+    """Class name of a route, or None when it is not limited"""
+    name = None
+    for method in route.methods:
+        name = route_classes.get(f"{method} {route.path}") or name
+    name = name or route_classes.get(route.path)
+    if name is None:
+        # unlisted async endpoints do not use the threadpool; /batch in
+        # particular must not hold a slot while its sub-requests wait for one
+        name = UNLIMITED if asyncio.iscoroutinefunction(route.endpoint) else "light"
+    return None if name == UNLIMITED else name
+
+
+def apply_concurrency_classes(app, settings: Optional[Settings] = None):
+    """
+    Put every sync API route of the app behind the capacity limiter of its
+    class. Call once the routers are included.
+    """
+    settings = settings or get_settings()
+    classes.clear()
+    classes.update(build_classes(settings))
+    route_classes = {**DEFAULT_ROUTE_CLASSES, **_parse_mapping(settings.route_concurrency)}
+
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        name = route_class(route, route_classes)
+        if name is None:
+            continue
+        if name not in classes:
+            logger.warning("Route %s %s assigned to unknown concurrency class %r, using light", ",".join(route.methods), route.path, name)
+            name = "light"
+        priority = request_priority(name, next(iter(route.methods)), route.path)
+        route.app = _LimitedRoute(route.app, classes[name], priority)
+
+# ============================================================================
+# THREADPOOL
+# ============================================================================
+
+_threadpool = None
+
+
+def configure_threadpool(settings: Optional[Settings] = None):
+    """Resize AnyIO's default thread limiter. Must run inside the event loop (lifespan)"""
+    global _threadpool
+    settings = settings or get_settings()
+    _threadpool = anyio.to_thread.current_default_thread_limiter()
+    _threadpool.total_tokens = settings.threadpool_tokens
+
+
+def _collect_threadpool():
+    if _threadpool is not None:
+        THREADPOOL_TOKENS.set(value=_threadpool.total_tokens)
+        THREADPOOL_IN_USE.set(value=_threadpool.borrowed_tokens)
+
+
+registry.add_collector(_collect_threadpool)
@@ -0,0 +1,157 @@
+import os
+from dataclasses import dataclass, field, fields
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+
+def _env(name: str, default=None, cast=str):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if cast is list:
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return cast(value)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Every setting the application reads, loaded from the environment (and
+    .env) once per process. Build one directly to configure an app in code:
+
+        create_app(Settings(database_url="sqlite:///dev.db", secret_key="dev"))
+    """
+
+    # database
+    database_url: str = ""
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 3600
+    # seconds to wait for a pooled connection before answering 503
+    db_pool_timeout: float = 5
+
+    # startup warm-up (app/core/warmup.py); connections default to db_pool_size
+    warmup_connections: Optional[int] = None
+    warmup_caches: bool = True
+    warmup_max_colleges: int = 200
+
+    # auth
+    secret_key: Optional[str] = None
+    jwt_algorithm: str = "HS256"
+    access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 7
+
+    # http
+    cors_origins: List[str] = field(default_factory=lambda: [
+        "http://localhost:8080",
+        "http://127.0.0.1:3000",
+        "http://localhost:5173",
+        "http://127.0.0.1:5173",
+    ])
+    batch_max_requests: int = 20
+
+    # threadpool and per-route concurrency classes (app/core/concurrency.py)
+    threadpool_tokens: int = 40
+    concurrency_limits: str = ""
+    route_concurrency: str = ""
+
+    # load shedding (app/core/admission.py)
+    admission_enabled: bool = True
+    # 0: four requests per pooled connection (db_pool_size + db_max_overflow)
+    admission_max_in_flight: int = 0
+    admission_max_queue: int = 100
+    admission_max_pool_wait_ms: float = 250
+    admission_retry_after: int = 1
+
+    # login rate limiting (app/core/ratelimit.py); backend "memory" or "redis"
+    login_rate_limit_enabled: bool = True
+    login_ip_per_minute: float = 30
+    login_ip_burst: int = 30
+    login_email_per_minute: float = 5
+    login_email_burst: int = 10
+    rate_limit_backend: str = "memory"
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_max_keys: int = 100000
+    rate_limit_trust_forwarded: bool = False
+
+    # in-process cache (app/core/cache.py), partitioned by tenant
+    cache_max_entries_per_tenant: int = 256
+    cache_max_tenants: int = 1024
+
+    # scope ORM queries and caches to the token's college (app/core/tenant.py)
+    tenant_scoping_enabled: bool = True
+
+    # cross-worker cache invalidation through tbl_cache_versions (app/core/cache_sync.py);
+    # 0 turns it off (single worker). Local caches are dropped while polling
+    # has failed for longer than cache_max_stale seconds
+    cache_sync_interval: float = 1
+    cache_max_stale: float = 10
+
+    # horizontal sharding (app/core/sharding.py): "name=url,name=url". The
+    # DATABASE_URL database is the directory and the "default" shard;
+    # tbl_college_shards maps colleges to shards, unlisted ones are on default
+    shards: str = ""
+    # seconds between full reconciliations of tbl_user_logins with the
+    # shards' users (app/core/login_index.py); 0 turns them off
+    login_index_sync_interval: float = 3600
+
+    # background jobs
+    job_workers: int = 2
+    job_poll_interval: float = 2
+    job_stale_seconds: int = 300
+
+    # observability
+    tracing_exporter: str = "none"
+    tracing_file: str = "traces.jsonl"
+    tracing_memory_spans: int = 10000
+    tracing_service_name: str = "college-cms-backend"
+    profile_dir: str = "profiles"
+    profile_sample_rate: float = 0
+    profile_interval_ms: float = 5
+    profile_max_samples: int = 200000
+    profile_keep: int = 200
+    profile_latency_budgets: str = ""
+    # while budgets are set, the stack sampler keeps running at this coarser
+    # interval between profiled requests so over-budget ones get stacks too;
+    # 0 leaves them timed only, without the background thread
+    profile_budget_interval_ms: float = 50
+    traffic_capture_file: Optional[str] = None
+    traffic_capture_max_body: int = 64 * 1024
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_dotenv()
+        values = {}
+        for f in fields(cls):
+            cast = {int: int, Optional[int]: int, float: float, bool: bool}.get(f.type, list if f.name == "cors_origins" else str)
+            value = _env(f.name.upper(), cast=cast)
+            if value is not None:
+                values[f.name] = value
+
+        # left empty when nothing is configured, so init_engine can say so
+        if "database_url" not in values and os.getenv("DB_HOST"):
+            values["database_url"] = (
+                f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+                f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+            )
+        return cls(**values)
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """The process-wide settings, read from the environment on first use"""
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
+
+
+def configure(settings: Settings):
+    """Install settings built in code instead of the environment ones"""
+    global _settings
+    _settings = settings
@@ -1,22 +1,151 @@
-import os
-from dotenv import load_dotenv
+import threading
+from contextlib import contextmanager
+from typing import Optional
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
 
-# Load .env file
-load_dotenv()
+from app.core.admission import TimedQueuePool
+from app.core.config import Settings, get_settings
 
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+Base = declarative_base()
 
-DATABASE_URL = (
-    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}"
-    f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+_engine_hooks = []
+_shard_engines = []
+_bind_router = None
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
+
+def on_engine_created(hook):
+    """Run hook(engine) for every engine, right away for the ones that already exist"""
+    if hook in _engine_hooks:
+        return
+    _engine_hooks.append(hook)
+    for engine in ([_engine] if _engine is not None else []) + _shard_engines:
+        hook(engine)
+
+
+def set_bind_router(router):
+    """
+    Install router(mapper, clause) -> Optional[Engine], consulted by every
+    session before its own bind (None falls back to the main engine)
+    """
+    global _bind_router
+    _bind_router = router
+
+
+def create_db_engine(url: str, settings: Optional[Settings] = None, shard_name: Optional[str] = None) -> Engine:
+    """
+    Engine for a database URL with the pool settings of the app, and the
+    on_engine_created hooks applied. Used for the main engine and for the
+    shard engines (shard_name set) of app/core/sharding.py.
+    """
+    settings = settings or get_settings()
+    # checkout wait is timed for admission control; a timeout answers 503
+    pool_kwargs = {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+    if url.startswith("sqlite"):
+        # SQLite connections are used from the threadpool, not only the thread that opened them
+        kwargs = {"connect_args": {"check_same_thread": False}}
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            kwargs["poolclass"] = StaticPool
+        else:
+            kwargs.update(pool_kwargs)
+    else:
+        kwargs = {
+            **pool_kwargs,
+            "pool_pre_ping": True,
+            "pool_recycle": settings.db_pool_recycle,
+        }
+
+    engine = create_engine(url, **kwargs)
+    engine.shard_name = shard_name
+    if shard_name is not None:
+        _shard_engines.append(engine)
+    for hook in _engine_hooks:
+        hook(engine)
+    return engine
+
+
+def init_engine(settings: Optional[Settings] = None) -> Engine:
+    """
+    Create the engine from settings (DATABASE_URL, or the DB_* variables)
+    and bind SessionLocal to it. Called from the app lifespan; code that
+    runs without one (tools, scripts) gets it lazily through get_engine().
+    """
+    global _engine
+    settings = settings or get_settings()
+    if not settings.database_url:
+        raise RuntimeError("Database is not configured: set DATABASE_URL or the DB_* variables")
+
+    with _engine_lock:
+        if _engine is not None:
+            return _engine
+        _engine = create_db_engine(settings.database_url, settings)
+        SessionLocal.configure(bind=_engine)
+        return _engine
+
+
+def get_engine() -> Engine:
+    return _engine if _engine is not None else init_engine()
+
+
+def dispose_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+            SessionLocal.configure(bind=None)
+
+
+class RoutingSession(Session):
+    """Session whose statements can be sent to another engine by the bind router (see set_bind_router)"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if _bind_router is not None:
+            engine = _bind_router(mapper, clause)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+class _LazySessionMaker(sessionmaker):
+    """sessionmaker that creates the engine on first use if the lifespan has not"""
+
+    def __call__(self, **local_kw) -> Session:
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionMaker(class_=RoutingSession, autoflush=False, autocommit=False)
+
+
+@contextmanager
+def unit_of_work(db: Session):
+    """
+    Flush and commit everything added inside the block as one transaction.
+
+    Loaded attributes are kept after the commit instead of being expired,
+    so building the response afterwards does not trigger a refresh SELECT.
+    Models with `eager_defaults` get their server defaults (created_at)
+    back from the INSERT itself via RETURNING where the backend supports it.
+    """
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        yield db
+        db.flush()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.expire_on_commit = expire_on_commit
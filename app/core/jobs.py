@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from app.core.config import Settings, get_settings
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import SessionLocal, get_engine
+from app.core.sharding import college_route
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# job_type -> handler(ctx, params) returning a JSON-serialisable result
+_handlers: Dict[str, Callable] = {}
+
+
+def job_handler(job_type: str):
+    """Register a function as the handler for a job type"""
+    def decorator(fn):
+        _handlers[job_type] = fn
+        return fn
+    return decorator
+
+
+def registered_job_types():
+    return sorted(_handlers)
+
+
+# job_id -> (current, total) for jobs running in this process
+_live_progress: Dict[int, tuple] = {}
+
+
+def live_progress(job_id: int) -> Optional[tuple]:
+    return _live_progress.get(job_id)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """
+    Handed to job handlers. Progress updates and cancellation checks use
+    their own short sessions so they are visible while the handler's own
+    transaction is still open.
+
+    SQLite allows a single writer, so a handler holding a write transaction
+    would block the progress UPDATE; there progress is only kept in memory
+    and served to polls from this process.
+    """
+
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._last_update = 0.0
+
+    def session(self):
+        return SessionLocal()
+
+    def progress(self, current: int, total: Optional[int] = None, force: bool = False):
+        """Record progress and raise JobCancelled if cancellation was requested"""
+        now = time.monotonic()
+        if not force and now - self._last_update < self.PROGRESS_INTERVAL:
+            return
+        self._last_update = now
+        previous = _live_progress.get(self.job_id)
+        _live_progress[self.job_id] = (current, total if total is not None else (previous[1] if previous else None))
+        db = SessionLocal()
+        try:
+            if db.get_bind().dialect.name != "sqlite":
+                values = {"progress_current": current, "heartbeat_at": datetime.utcnow()}
+                if total is not None:
+                    values["progress_total"] = total
+                db.query(Job).filter(Job.job_id == self.job_id).update(values)
+                db.commit()
+            cancel = db.query(Job.cancel_requested).filter(Job.job_id == self.job_id).scalar()
+        finally:
+            db.close()
+        if cancel:
+            raise JobCancelled()
+
+
+class JobWorkerPool:
+    """
+    Threads that take queued rows from tbl_jobs and run their handlers.
+    A job is claimed with a conditional UPDATE on its status, so several
+    processes can share the same table as their queue without a broker.
+    """
+
+    def __init__(self, workers: Optional[int] = None, poll_interval: Optional[float] = None):
+        # unset values are taken from the settings passed to start()
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_seconds = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        # jobs being run by this process, kept alive by the heartbeat thread
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+    def start(self, settings: Optional[Settings] = None):
+        """Start JOB_WORKERS threads polling every JOB_POLL_INTERVAL seconds"""
+        settings = settings or get_settings()
+        if self.workers is None:
+            self.workers = settings.job_workers
+        if self.poll_interval is None:
+            self.poll_interval = settings.job_poll_interval
+        self.stale_seconds = settings.job_stale_seconds
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        self._requeue_stale()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        # an in-memory database is one connection shared by every session and
+        # cannot be shared with other processes: nothing there can requeue our jobs
+        if not isinstance(get_engine().pool, StaticPool):
+            t = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake an idle worker after a job was submitted in this process"""
+        self._wake.set()
+
+    def _heartbeat(self):
+        # several beats per JOB_STALE_SECONDS, however rarely handlers report progress
+        interval = max(1.0, self.stale_seconds / 4)
+        last_requeue = time.monotonic()
+        while not self._stop.wait(interval):
+            # jobs of workers on other hosts that died are picked up without a restart here
+            if time.monotonic() - last_requeue >= self.stale_seconds:
+                last_requeue = time.monotonic()
+                self._requeue_stale()
+            with self._running_lock:
+                running = list(self._running)
+            if not running:
+                continue
+            db = SessionLocal()
+            try:
+                db.query(Job).filter(Job.job_id.in_(running), Job.worker_id == self.worker_id).update(
+                    {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+                )
+                db.commit()
+            except Exception:
+                # e.g. SQLite while a handler holds the write lock; the next beat retries
+                logger.warning("Could not record the heartbeat of jobs %s", running, exc_info=True)
+                db.rollback()
+            finally:
+                db.close()
+
+    def _requeue_stale(self):
+        # jobs left running by a worker that died: their heartbeat stopped, however long they run
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(Job.status == "running", Job.heartbeat_at < cutoff).update(
+                {"status": "queued", "worker_id": None}, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            logger.exception("Could not requeue stale jobs")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _claim_next(self) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            candidates = [
+                j for (j,) in db.query(Job.job_id)
+                .filter(Job.status == "queued")
+                .order_by(Job.job_id)
+                .limit(5)
+            ]
+            now = datetime.utcnow()
+            for job_id in candidates:
+                claimed = db.query(Job).filter(Job.job_id == job_id, Job.status == "queued").update(
+                    {"status": "running", "worker_id": self.worker_id, "started_at": now, "heartbeat_at": now},
+                    synchronize_session=False,
+                )
+                db.commit()
+                if claimed:
+                    return job_id
+            return None
+        finally:
+            db.close()
+
+    def _finish(self, job_id: int, **values):
+        db = SessionLocal()
+        try:
+            live = _live_progress.get(job_id)
+            if live:
+                values["progress_current"], values["progress_total"] = live
+                if values["status"] == "completed" and values["progress_total"]:
+                    values["progress_current"] = values["progress_total"]
+            values["finished_at"] = datetime.utcnow()
+            # a job requeued as stale and claimed by another worker is theirs to finish
+            finished = db.query(Job).filter(Job.job_id == job_id, Job.worker_id == self.worker_id).update(
+                values, synchronize_session=False
+            )
+            db.commit()
+            if not finished:
+                logger.warning("Job %s was taken over by another worker; its %s result is dropped", job_id, values["status"])
+        finally:
+            db.close()
+
+    def _execute(self, job_id: int):
+        db = SessionLocal()
+        try:
+            job_type, params = db.query(Job.job_type, Job.params).filter(Job.job_id == job_id).one()
+        finally:
+            db.close()
+
+        handler = _handlers.get(job_type)
+        if handler is None:
+            self._finish(job_id, status="failed", error=f"Unknown job type '{job_type}'")
+            return
+
+        ctx = JobContext(job_id)
+        with self._running_lock:
+            self._running.add(job_id)
+        try:
+            params = json.loads(params) if params else {}
+            # a college's job reads and writes its shard
+            with college_route(params.get("college_id")):
+                result = handler(ctx, params)
+        except JobCancelled:
+            self._finish(job_id, status="cancelled")
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, job_type)
+            self._finish(job_id, status="failed", error=str(e))
+        else:
+            self._finish(job_id, status="completed", result=json.dumps(result, default=str))
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+            _live_progress.pop(job_id, None)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim_next()
+            except Exception:
+                logger.exception("Could not poll tbl_jobs")
+                job_id = None
+            if job_id is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._execute(job_id)
+            except Exception:
+                # e.g. the database failed while recording the result; the job
+                # stops beating and is requeued as stale, the worker carries on
+                logger.exception("Could not run job %s", job_id)
+
+
+job_pool = JobWorkerPool()
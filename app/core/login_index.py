@@ -0,0 +1,248 @@
+"""
+Directory-wide index of user logins while colleges are sharded.
+
+tbl_users.email and username are unique per database, so with SHARDS the
+same email could be created for two colleges on different shards, and
+login would not know which shard to ask. tbl_user_logins, a directory
+table, maps every email and username to the (college_id, user_id) of its
+user, unique over all shards:
+
+- user writes add, update or remove their entry in the same session;
+- create paths check it up front to report "Email already exists";
+- login reads it to query only the shard of the user's college;
+- the move tool reconciles a college's entries before copying its rows.
+
+The session commits the shard and the directory one after the other, not
+atomically (there is no two-phase commit): a failure or crash between the
+two leaves a user without its entry, or an entry without its user, and a
+race between two writers on different shards can pass the up-front check
+on both. LoginIndexSync therefore reconciles the whole index every
+LOGIN_INDEX_SYNC_INTERVAL seconds, and reports users whose email or
+username another user holds in the log.
+
+Without SHARDS every function here is a no-op and the unique indexes of
+tbl_users are enough.
+"""
+import logging
+import threading
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core import sharding
+from app.core.config import Settings, get_settings
+from app.models.user import User
+from app.models.user_login import UserLogin
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+logins = UserLogin.__table__
+users = User.__table__
+
+
+def enabled() -> bool:
+    return sharding.router is not None
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# ============================================================================
+# REQUEST PATHS
+# ============================================================================
+
+
+def taken_logins(db: Session, emails: Iterable[str], usernames: Iterable[str], exclude: Optional[Tuple] = None) -> Tuple[Set[str], Set[str]]:
+    """
+    The given emails and usernames (lowercased) that the index holds for
+    a user on any shard, other than the (college_id, user_id) in exclude
+    """
+    taken_emails, taken_names = set(), set()
+    if not enabled():
+        return taken_emails, taken_names
+    others = []
+    if exclude is not None:
+        others.append(or_(UserLogin.college_id.is_distinct_from(exclude[0]), UserLogin.user_id != exclude[1]))
+    for chunk in _chunks({e.lower() for e in emails}):
+        taken_emails.update(e.lower() for (e,) in db.query(UserLogin.email).filter(UserLogin.email.in_(chunk), *others))
+    for chunk in _chunks({n.lower() for n in usernames}):
+        taken_names.update(n.lower() for (n,) in db.query(UserLogin.username).filter(UserLogin.username.in_(chunk), *others))
+    return taken_emails, taken_names
+
+
+def add_logins(db: Session, entries: List[dict]):
+    """Index new users ({user_id, college_id, email, username}) in the caller's transaction"""
+    if enabled() and entries:
+        db.execute(insert(UserLogin), entries)
+
+
+def update_login(db: Session, college_id: Optional[int], user_id: int, **values):
+    """Follow a user's new email, username or college_id, in the caller's transaction"""
+    if not enabled():
+        return
+    updated = db.query(UserLogin).filter(UserLogin.college_id == college_id, UserLogin.user_id == user_id).update(
+        values, synchronize_session=False
+    )
+    if not updated:
+        # a user from before the index
+        db.execute(insert(UserLogin), [{"college_id": college_id, "user_id": user_id, **values}])
+
+
+def remove_login(db: Session, college_id: Optional[int], user_id: int):
+    if enabled():
+        db.query(UserLogin).filter(UserLogin.college_id == college_id, UserLogin.user_id == user_id).delete(
+            synchronize_session=False
+        )
+
+
+def login_college(db: Session, email: str) -> Tuple[bool, Optional[int]]:
+    """(found, college_id) of the user with this email, from the index"""
+    row = db.query(UserLogin.college_id).filter(UserLogin.email == email).first()
+    return (row is not None, row.college_id if row is not None else None)
+
+# ============================================================================
+# RECONCILIATION
+# ============================================================================
+
+
+def _home_users(college_id: Optional[int] = None) -> dict:
+    """(college_id, user_id) -> (email, username) of the users on their college's shard"""
+    router = sharding.router
+    found = {}
+    for name, engine in router.engines.items():
+        if college_id is not None and name != router.shard_of(college_id):
+            continue
+        query = select(users.c.college_id, users.c.user_id, users.c.email, users.c.username)
+        if college_id is not None:
+            query = query.where(users.c.college_id == college_id)
+        with engine.connect() as conn:
+            for r in conn.execute(query):
+                # rows a move left on its source shard are not the live ones
+                home = sharding.DEFAULT_SHARD if r.college_id is None else router.shard_of(r.college_id)
+                if home == name:
+                    found[(r.college_id, r.user_id)] = (r.email, r.username)
+    return found
+
+
+def sync_login_index(college_id: Optional[int] = None) -> List[dict]:
+    """
+    Make the index match the users of every shard, or of one college:
+    missing entries are added, changed ones corrected and those whose user
+    is gone removed. Users whose email or username the index holds for
+    another user are left out and returned as conflicts.
+    """
+    if not enabled():
+        return []
+    directory = sharding.router.directory
+
+    # the index before the users: writes commit the user first, so an entry
+    # read here has its user in the read below, and a live write is never
+    # taken for an entry whose user is gone
+    query = select(logins.c.login_id, logins.c.college_id, logins.c.user_id, logins.c.email, logins.c.username)
+    if college_id is not None:
+        query = query.where(logins.c.college_id == college_id)
+    with directory.connect() as conn:
+        indexed = {(r.college_id, r.user_id): r for r in conn.execute(query)}
+    home = _home_users(college_id)
+
+    gone = [r.login_id for key, r in indexed.items() if key not in home]
+    pending = {
+        key: values for key, values in home.items()
+        if key not in indexed or (indexed[key].email, indexed[key].username) != values
+    }
+
+    # owners of the pending emails and usernames among the entries that stay
+    gone_ids = set(gone)
+    owners = {}
+    with directory.connect() as conn:
+        for column, position in ((logins.c.email, 0), (logins.c.username, 1)):
+            for chunk in _chunks({v[position].lower() for v in pending.values()}):
+                for r in conn.execute(select(logins.c.login_id, logins.c.college_id, logins.c.user_id, column).where(column.in_(chunk))):
+                    if r.login_id not in gone_ids:
+                        owners[(position, r[3].lower())] = (r.college_id, r.user_id)
+
+    conflicts, inserts, updates = [], [], []
+    for key, (email, username) in pending.items():
+        claims = [(0, email.lower()), (1, username.lower())]
+        if any(owners.get(claim, key) != key for claim in claims):
+            conflicts.append({"college_id": key[0], "user_id": key[1], "email": email, "username": username})
+            continue
+        owners.update((claim, key) for claim in claims)
+        if key in indexed:
+            updates.append({"_id": indexed[key].login_id, "email": email, "username": username})
+        else:
+            inserts.append({"college_id": key[0], "user_id": key[1], "email": email, "username": username})
+
+    with directory.begin() as conn:
+        for chunk in _chunks(gone):
+            conn.execute(delete(logins).where(logins.c.login_id.in_(chunk)))
+        if updates:
+            conn.execute(update(logins).where(logins.c.login_id == bindparam("_id")), updates)
+        for chunk in _chunks(inserts):
+            conn.execute(insert(logins), chunk)
+    for c in conflicts:
+        logger.warning("User %s of college %s: email %s or username %s belongs to another user", c["user_id"], c["college_id"], c["email"], c["username"])
+    return conflicts
+
+
+def reconcile_login_index():
+    """
+    Run sync_login_index if the index and the shards disagree on the number
+    of users, e.g. the first start with SHARDS or after users were written
+    outside the API. Call once the shards are initialised (lifespan).
+    """
+    if not enabled():
+        return
+    total = 0
+    for engine in sharding.router.engines.values():
+        with engine.connect() as conn:
+            total += conn.execute(select(func.count()).select_from(users)).scalar_one()
+    with sharding.router.directory.connect() as conn:
+        indexed = conn.execute(select(func.count()).select_from(logins)).scalar_one()
+    if indexed != total:
+        logger.info("Login index holds %s of %s users, reconciling", indexed, total)
+        sync_login_index()
+
+
+class LoginIndexSync:
+    """
+    Runs sync_login_index over every shard every LOGIN_INDEX_SYNC_INTERVAL
+    seconds in a daemon thread, catching up with user writes whose shard
+    and directory commits did not both succeed. A round that fails, e.g.
+    on an entry a live write added meanwhile, is retried the next one.
+    """
+
+    def __init__(self):
+        self.interval = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, settings: Optional[Settings] = None):
+        settings = settings or get_settings()
+        self.interval = settings.login_index_sync_interval
+        if not enabled() or self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="login-index-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                sync_login_index()
+            except Exception:
+                logger.warning("Could not reconcile the login index, retrying in %ss", self.interval, exc_info=True)
+
+
+login_index_sync = LoginIndexSync()
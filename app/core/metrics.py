@@ -0,0 +1,289 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# ============================================================================
+# METRIC TYPES
+# ============================================================================
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self._header()
+        # copied under the lock: inc() may add a label set while we format
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in sorted(items):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, *labels, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(labels)
+            if data is None:
+                data = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = [(labels, list(data)) for labels, data in self._values.items()]
+        for labels, data in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, inf)} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_number(data[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {data[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._metrics.get(name) or self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._metrics.get(name) or self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, fn, key=None):
+        """
+        fn() is called before every render, e.g. to refresh gauges read from
+        elsewhere. A collector added with the key of an earlier one replaces it.
+        """
+        self._collectors[fn if key is None else key] = fn
+
+    def render(self) -> str:
+        for fn in list(self._collectors.values()):
+            fn()
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ============================================================================
+# HTTP METRICS
+# ============================================================================
+
+REQUESTS = registry.counter("http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status"))
+LATENCY = registry.histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being served")
+REQUEST_BYTES = registry.histogram("http_request_size_bytes", "HTTP request body size", ("route",), SIZE_BUCKETS)
+RESPONSE_BYTES = registry.histogram("http_response_size_bytes", "HTTP response body size", ("route",), SIZE_BUCKETS)
+REQUEST_QUERIES = registry.histogram("db_queries_per_request", "SQL statements executed per HTTP request", ("route",), QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_TIME = registry.histogram("db_query_seconds_per_request", "Time spent in SQL per HTTP request", ("route",))
+QUERY_LATENCY = registry.histogram("db_query_duration_seconds", "SQL statement latency")
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Stats of the request being served; the threadpool runs sync endpoints in a
+# copy of the request's context, so they update the same object.
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status, sizes and SQL usage"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        request_bytes = 0
+        response_bytes = 0
+        status_code = 500
+
+        async def receive_wrapper():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal response_bytes, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            current_query_stats.reset(token)
+            route = route_template(scope)
+            method = scope["method"]
+            REQUESTS.inc(method, route, str(status_code))
+            LATENCY.observe(method, route, value=time.perf_counter() - start)
+            REQUEST_BYTES.observe(route, value=request_bytes)
+            RESPONSE_BYTES.observe(route, value=response_bytes)
+            REQUEST_QUERIES.observe(route, value=stats.count)
+            REQUEST_QUERY_TIME.observe(route, value=stats.seconds)
+
+
+# ============================================================================
+# DATABASE METRICS
+# ============================================================================
+
+def instrument_engine(engine):
+    """Time every SQL statement and export connection pool stats"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["_query_start"].pop()
+        QUERY_LATENCY.observe(value=elapsed)
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("_query_start"):
+            conn.info["_query_start"].pop()
+
+    # shard engines (app/core/sharding.py) report their pools by shard name
+    shard = getattr(engine, "shard_name", None)
+    prefix, labels, label_values = ("db_shard_pool", ("shard",), (shard,)) if shard else ("db_pool", (), ())
+    pool_size = registry.gauge(f"{prefix}_size", "Configured connection pool size", labels)
+    checked_out = registry.gauge(f"{prefix}_checked_out", "Connections currently in use", labels)
+    checked_in = registry.gauge(f"{prefix}_checked_in", "Idle connections in the pool", labels)
+    overflow = registry.gauge(f"{prefix}_overflow", "Connections opened beyond the pool size", labels)
+
+    # one collector per pool's labels, replaced when the engine is created
+    # again (tests, reconfigured shards); the weak reference lets a disposed
+    # engine be freed meanwhile
+    engine_ref = weakref.ref(engine)
+
+    def collect_pool():
+        engine = engine_ref()
+        if engine is None:
+            return
+        pool = engine.pool
+        for gauge, attr in ((pool_size, "size"), (checked_out, "checkedout"), (checked_in, "checkedin"), (overflow, "overflow")):
+            fn = getattr(pool, attr, None)
+            if fn is not None:
+                gauge.set(*label_values, value=fn())
+
+    registry.add_collector(collect_pool, key=(prefix,) + label_values)
@@ -0,0 +1,310 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import route_template
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_MAX_SAMPLES,
+# PROFILE_KEEP, PROFILE_LATENCY_BUDGETS and PROFILE_BUDGET_INTERVAL_MS are read
+# by ProfilingMiddleware
+PROFILE_HEADER = "x-profile"
+
+
+def _parse_budgets(raw: str) -> Dict[str, float]:
+    # "/admin/users/=300,/admin/subjects/=200,*=2000" -> route template -> ms
+    budgets = {}
+    for item in raw.split(","):
+        route, _, ms = item.strip().rpartition("=")
+        if route and ms:
+            budgets[route] = float(ms)
+    return budgets
+
+# ============================================================================
+# STACK SAMPLER
+# ============================================================================
+
+# Top frames of threads that are parked rather than working
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+
+class StackSampler:
+    """
+    Statistical profiler: while at least one request holds it, a daemon
+    thread snapshots the stack of every busy thread each interval into a
+    ring buffer. A request's profile is the slice of samples taken between
+    its start and end, so one sampler serves any number of concurrent
+    profiled requests. With a background interval the thread keeps going
+    at that coarser rate while nobody holds it.
+
+    Sync endpoints, dependencies and response validation run in the
+    threadpool, not on the thread that received the request, so all busy
+    threads are sampled. Requests served concurrently show up in the same
+    window; profiles record how many were in flight.
+    """
+
+    def __init__(self, interval: float = 0.005, max_samples: int = 200000):
+        self.interval = interval
+        self.background_interval: Optional[float] = None
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self._users = 0
+        self._thread: Optional[threading.Thread] = None
+        self._names: Dict[object, str] = {}
+
+    def configure(self, interval: float, max_samples: int):
+        with self._lock:
+            self.interval = interval
+            if self._samples.maxlen != max_samples:
+                self._samples = deque(self._samples, maxlen=max_samples)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+            self._thread.start()
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+            self._ensure_thread()
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+
+    def run_in_background(self, interval: Optional[float]):
+        """Keep sampling every `interval` seconds while nobody holds the sampler; None stops that"""
+        with self._lock:
+            self.background_interval = interval
+            if interval:
+                self._ensure_thread()
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            filename = code.co_filename
+            marker = filename.rfind(os.sep + "app" + os.sep)
+            short = filename[marker + 1:] if marker >= 0 else os.path.basename(filename)
+            name = self._names[code] = f"{code.co_name} ({short}:{code.co_firstlineno})"
+        return name
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if self._users > 0:
+                    interval = self.interval
+                elif self.background_interval:
+                    interval = self.background_interval
+                else:
+                    self._thread = None
+                    return
+            now = time.perf_counter()
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self._samples.append((now, thread_names.get(ident, str(ident)), tuple(reversed(stack))))
+            time.sleep(interval)
+
+    def collect(self, start: float, end: float) -> Counter:
+        """Folded stacks (root first, ';'-separated) sampled in [start, end] with their counts"""
+        folded = Counter()
+        for t, thread_name, stack in list(self._samples):
+            if start <= t <= end:
+                folded[";".join([thread_name] + [self._frame_name(c) for c in stack])] += 1
+        return folded
+
+
+# sized by ProfilingMiddleware from PROFILE_INTERVAL_MS and PROFILE_MAX_SAMPLES
+sampler = StackSampler()
+
+# ============================================================================
+# PROFILE STORAGE
+# ============================================================================
+
+_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+
+def _profile_path(directory: str, profile_id: str, ext: str) -> str:
+    return os.path.join(directory, f"{profile_id}.{ext}")
+
+
+def save_profile(directory: str, keep: int, profile_id: str, folded: Counter, meta: dict):
+    """Write the folded stacks (flamegraph.pl / speedscope input) and a JSON sidecar"""
+    os.makedirs(directory, exist_ok=True)
+    with open(_profile_path(directory, profile_id, "folded"), "w") as f:
+        for stack, count in folded.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(_profile_path(directory, profile_id, "json"), "w") as f:
+        json.dump({**meta, "profile_id": profile_id, "samples": sum(folded.values())}, f)
+
+    # keep only the most recent `keep` profiles
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".json"))
+    for old in ids[:-keep] if keep > 0 else []:
+        for ext in ("folded", "json"):
+            try:
+                os.remove(_profile_path(directory, old, ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory: str) -> List[dict]:
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                profiles.append(json.load(f))
+    return profiles
+
+
+def get_profile_file(directory: str, profile_id: str) -> Optional[str]:
+    """Path of a stored folded profile, or None if the id is unknown or malformed"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = _profile_path(directory, profile_id, "folded")
+    return path if os.path.exists(path) else None
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when
+      - it carries an `X-Profile: 1` header and `authorize(headers)` allows it,
+      - it is picked by PROFILE_SAMPLE_RATE, or
+      - it exceeds the latency budget of its route (PROFILE_LATENCY_BUDGETS,
+        with '*' as the default for routes not listed).
+
+    The first two are sampled every PROFILE_INTERVAL_MS. Budgets cost a
+    clock read per request, plus the sampler running in the background
+    every PROFILE_BUDGET_INTERVAL_MS (50 ms by default): an over-budget
+    request is stored with the stacks of that coarser sampling, enough to
+    see where a slow request spent its time, and can be profiled finely
+    next with the header. With PROFILE_BUDGET_INTERVAL_MS=0 there is no
+    background thread and over-budget requests are stored without stacks.
+
+    Profiled responses carry an `X-Profile-Id` header; the profile is written
+    before the last body chunk is sent so it can be fetched right away.
+    """
+
+    def __init__(self, app, authorize: Optional[Callable[[Headers], bool]] = None, settings: Optional[Settings] = None):
+        self.app = app
+        self.authorize = authorize
+        settings = settings or get_settings()
+        self.directory = settings.profile_dir
+        self.keep = settings.profile_keep
+        # fraction of all requests profiled regardless of the header, e.g. 0.001
+        self.sample_rate = settings.profile_sample_rate
+        self.budgets = _parse_budgets(settings.profile_latency_budgets)
+        sampler.configure(settings.profile_interval_ms / 1000, settings.profile_max_samples)
+        # started with the first request, not when the app is built
+        self.budget_interval = settings.profile_budget_interval_ms / 1000 if self.budgets else 0
+        self._background = False
+        self._in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self._in_flight += 1
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _profile(self, scope, receive, send):
+        reason = None
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) and self.authorize is not None:
+            if await run_in_threadpool(self.authorize, headers):
+                reason = "requested"
+        if reason is None and self.sample_rate and random.random() < self.sample_rate:
+            reason = "sampled"
+        if reason is None and not self.budgets:
+            await self.app(scope, receive, send)
+            return
+        if self.budget_interval and not self._background:
+            self._background = True
+            sampler.run_in_background(self.budget_interval)
+
+        sampling = reason is not None or bool(self.budget_interval)
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        start = time.perf_counter()
+        concurrent = self._in_flight
+        saved = False
+
+        async def finish():
+            nonlocal saved, reason
+            saved = True
+            end = time.perf_counter()
+            duration_ms = (end - start) * 1000
+            route = route_template(scope)
+            if reason is None:
+                budget = self.budgets.get(route, self.budgets.get("*"))
+                if budget is None or duration_ms <= budget:
+                    return
+                reason = "over_budget"
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "duration_ms": round(duration_ms, 3),
+                "reason": reason,
+                "concurrent_requests": max(concurrent, self._in_flight),
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            if sampling:
+                # at most; other profiled requests may have sampled it finer
+                meta["interval_ms"] = (sampler.interval if reason != "over_budget" else self.budget_interval) * 1000
+            folded = sampler.collect(start, end) if sampling else Counter()
+            await run_in_threadpool(save_profile, self.directory, self.keep, profile_id, folded, meta)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and reason is not None:
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            elif message["type"] == "http.response.body" and not message.get("more_body") and not saved:
+                await finish()
+            await send(message)
+
+        if reason is None:
+            # only timed, and sampled coarsely by the background sampler if on
+            await self.app(scope, receive, send_wrapper)
+            return
+        sampler.acquire()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.release()
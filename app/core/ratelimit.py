@@ -0,0 +1,232 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = registry.counter("login_rate_limited_total", "Login attempts rejected with 429 before any DB access or hashing", ("key",))
+RATE_LIMIT_KEYS = registry.gauge("ratelimit_keys", "Buckets held by the in-memory rate limiter")
+RATE_LIMIT_EVICTIONS = registry.counter("ratelimit_evictions_total", "Buckets evicted from the in-memory rate limiter to stay within RATE_LIMIT_MAX_KEYS")
+RATE_LIMIT_ERRORS = registry.counter("ratelimit_backend_errors_total", "Shared rate limit backend failures; the request is let through")
+
+# login bodies are tiny; anything bigger is read no further for the email
+MAX_LOGIN_BODY = 4096
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+
+class MemoryBackend:
+    """
+    Token buckets kept in-process, one (tokens, last refill) pair per key in
+    an LRU-ordered dict capped at max_keys. A bucket that has refilled
+    completely holds no information, so evicting the least recently used
+    keys first only forgets clients that have been quiet the longest.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> Tuple[bool, float]:
+        """Take cost tokens from the bucket; returns (allowed, seconds until enough tokens)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= cost:
+                allowed, retry_after = True, 0.0
+                tokens -= cost
+            else:
+                allowed, retry_after = False, (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            evicted = 0
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                evicted += 1
+            size = len(self._buckets)
+        if evicted:
+            RATE_LIMIT_EVICTIONS.inc(amount=evicted)
+        RATE_LIMIT_KEYS.set(value=size)
+        return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+        RATE_LIMIT_KEYS.set(value=0)
+
+
+# KEYS[1] bucket; ARGV rate, burst, cost, now (seconds)
+_REDIS_TAKE = """
+local data = redis.call('HMGET', KEYS[1], 't', 'ts')
+local rate, burst, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(data[1]) or burst
+local last = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local allowed, retry = 0, (cost - tokens) / rate
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed, retry = 1, 0
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(retry)}
+"""
+
+
+class RedisBackend:
+    """
+    Token buckets shared by every worker, one Redis hash per key updated
+    atomically by a Lua script and expiring once it would be full again.
+    Needs the `redis` package. If Redis is unreachable, requests are let
+    through rather than locking everyone out of login.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package (pip install redis)") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self._take = self._client.register_script(_REDIS_TAKE)
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> Tuple[bool, float]:
+        try:
+            allowed, retry_after = self._take(keys=[self.prefix + key], args=[rate, burst, cost, time.time()])
+        except Exception:
+            RATE_LIMIT_ERRORS.inc()
+            logger.warning("Rate limit backend unavailable, letting the request through", exc_info=True)
+            return True, 0.0
+        return bool(allowed), float(retry_after)
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+# ============================================================================
+# LOGIN LIMITER
+# ============================================================================
+
+
+class LoginRateLimiter:
+    """
+    Two token buckets per login attempt: one for the client IP and one for
+    the email. Both are charged; an attempt needs a token from each.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, backend=None):
+        settings = settings or get_settings()
+        self.ip_rate = settings.login_ip_per_minute / 60
+        self.ip_burst = settings.login_ip_burst
+        self.email_rate = settings.login_email_per_minute / 60
+        self.email_burst = settings.login_email_burst
+        self.trust_forwarded = settings.rate_limit_trust_forwarded
+        if backend is None:
+            if settings.rate_limit_backend == "redis":
+                backend = RedisBackend(settings.rate_limit_redis_url)
+            else:
+                backend = MemoryBackend(settings.rate_limit_max_keys)
+        self.backend = backend
+
+    def client_ip(self, scope) -> str:
+        if self.trust_forwarded:
+            for key, value in scope["headers"]:
+                if key == b"x-forwarded-for":
+                    # the address appended by our own proxy is the last one
+                    return value.decode("latin-1").rsplit(",", 1)[-1].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def check(self, ip: str, email: Optional[str]) -> Tuple[Optional[str], float]:
+        """(None, 0) to let the attempt through, else (limited key kind, retry after seconds)"""
+        allowed, retry_after = self.backend.take(f"login:ip:{ip}", self.ip_rate, self.ip_burst)
+        if not allowed:
+            return "ip", retry_after
+        if email:
+            allowed, retry_after = self.backend.take(f"login:email:{email.strip().lower()}", self.email_rate, self.email_burst)
+            if not allowed:
+                return "email", retry_after
+        return None, 0.0
+
+
+def _email_from_body(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    email = data.get("email") if isinstance(data, dict) else None
+    return email if isinstance(email, str) else None
+
+
+class _RateLimitedLogin:
+    """
+    Wraps the login route's ASGI app. The body is buffered and the email
+    read from it before the route's admission control, concurrency slot,
+    session or bcrypt, so a rejected attempt costs a dict lookup.
+    """
+
+    def __init__(self, app, limiter: LoginRateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        chunks = []
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] != "http.request":
+                # client went away before sending the body
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more = message.get("more_body", False) and size <= MAX_LOGIN_BODY
+        body = b"".join(chunks)
+
+        kind, retry_after = self.limiter.check(self.limiter.client_ip(scope), _email_from_body(body))
+        if kind is not None:
+            RATE_LIMITED.inc(kind)
+            response = JSONResponse(
+                {"detail": "Too many login attempts, retry later"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": more}
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+
+login_limiter: Optional[LoginRateLimiter] = None
+
+
+def protect_login(app, settings: Optional[Settings] = None, path: str = "/auth/login"):
+    """Put the login route behind the IP and email rate limits. Call after apply_concurrency_classes"""
+    global login_limiter
+    settings = settings or get_settings()
+    if not settings.login_rate_limit_enabled:
+        return
+    login_limiter = LoginRateLimiter(settings)
+    for route in app.routes:
+        if getattr(route, "path", None) == path and "POST" in getattr(route, "methods", ()):
+            route.app = _RateLimitedLogin(route.app, login_limiter)
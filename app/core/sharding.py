@@ -0,0 +1,493 @@
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+from sqlalchemy import bindparam, delete, event, insert, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.core.cache import cache
+from app.core.config import Settings, get_settings
+from app.core.database import Base, create_db_engine, get_engine, set_bind_router
+from app.core.metrics import registry
+from app.core.tenant import current_tenant
+from app.models.college_shard import CollegeShard
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# the DATABASE_URL database: directory of the global tables, and a shard
+DEFAULT_SHARD = "default"
+
+# bumped (and published to the other workers) when a college changes shard or status
+SHARDS_NAMESPACE = "shards"
+
+# tables that live in the directory database only
+GLOBAL_TABLES = {"tbl_colleges", "tbl_permissions", "tbl_jobs", "tbl_cache_versions", "tbl_college_shards", "tbl_user_logins"}
+
+# global tables copied to every shard, so shard queries can join them and
+# shard rows can reference them
+REFERENCE_TABLES = ("tbl_colleges", "tbl_permissions")
+
+# MySQL shards hand out auto-increment ids from shard index * SHARD_ID_BLOCK,
+# so rows created on different shards keep distinct ids when a college moves
+SHARD_ID_BLOCK = 100_000_000
+
+MOVING_RETRY_AFTER = 5
+
+# JSON request bodies up to this size are read for their college_id
+ROUTING_BODY_MAX = 64 * 1024
+
+ROUTED = registry.counter("shard_statements_total", "Statements by the database they were routed to", ("shard",))
+MOVING_REJECTED = registry.counter("shard_moving_rejected_total", "Writes rejected with 503 because their college is being moved between shards")
+UNROUTED_REJECTED = registry.counter("shard_unrouted_rejected_total", "Writes to college tables rejected with 400 because the request names no college")
+
+# college whose shard serves the request when no tenant is set (Super
+# Admin): the college_id path or query parameter, the college_id of the
+# JSON body, or the college of the row the path addresses
+routing_hint: ContextVar[Optional[int]] = ContextVar("shard_routing_hint", default=None)
+
+# set for API requests: their writes to college tables need a college
+route_required: ContextVar[bool] = ContextVar("shard_route_required", default=False)
+
+# set by tools working on one shard explicitly
+forced_shard: ContextVar[Optional[str]] = ContextVar("forced_shard", default=None)
+
+
+class CollegeMoving(Exception):
+    """A write for a college that is being copied to another shard"""
+
+    def __init__(self, college_id: int):
+        super().__init__(f"College {college_id} is being moved to another shard")
+        self.college_id = college_id
+
+
+class CollegeRequired(Exception):
+    """A request without tenant or college_id writing to college tables"""
+
+
+def _parse_shards(raw: str) -> List[Tuple[str, str]]:
+    # "s1=mysql+pymysql://...,s2=sqlite:///s2.db"; URLs may contain "=", names may not
+    shards = []
+    for item in raw.split(","):
+        name, _, url = item.strip().partition("=")
+        if not name or not url:
+            continue
+        if name.strip() == DEFAULT_SHARD:
+            raise RuntimeError(f"Shard name {DEFAULT_SHARD!r} is reserved for the DATABASE_URL database")
+        shards.append((name.strip(), url.strip()))
+    return shards
+
+
+def shard_tables():
+    """Tables partitioned by college, in dependency order"""
+    return [t for t in Base.metadata.sorted_tables if t.name not in GLOBAL_TABLES]
+
+
+def routing_college() -> Optional[int]:
+    tenant = current_tenant.get()
+    return tenant if tenant is not None else routing_hint.get()
+
+
+@contextmanager
+def college_route(college_id: Optional[int]):
+    """Send the block's shard statements to the shard of college_id (jobs, tools)"""
+    token = routing_hint.set(college_id)
+    try:
+        yield
+    finally:
+        routing_hint.reset(token)
+
+
+@contextmanager
+def on_shard(name: str):
+    """Send the block's shard statements to the named shard"""
+    token = forced_shard.set(name)
+    try:
+        yield
+    finally:
+        forced_shard.reset(token)
+
+# ============================================================================
+# ROUTING
+# ============================================================================
+
+
+def _primary_table(mapper, clause) -> Optional[str]:
+    if mapper is not None:
+        return getattr(mapper.persist_selectable, "name", None)
+    table = getattr(clause, "table", None)
+    if table is not None:
+        return getattr(table, "name", None)
+    froms = clause.get_final_froms() if hasattr(clause, "get_final_froms") else ()
+    return getattr(froms[0], "name", None) if froms else None
+
+
+def is_global(mapper, clause) -> bool:
+    """True if a statement only touches directory tables"""
+    if _primary_table(mapper, clause) not in GLOBAL_TABLES:
+        return False
+    if clause is None:
+        return True
+    # e.g. permissions joined to role permissions: a shard statement on the replica
+    return all(t.name in GLOBAL_TABLES for t in find_tables(clause, include_joins=True, include_selects=True) if hasattr(t, "name"))
+
+
+class ShardRouter:
+    """
+    Chooses the engine of each statement: the directory for statements on
+    global tables only, otherwise the shard of the request's college (its
+    tenant, else the routing hint), or the default shard without one. The
+    college -> shard map is read from tbl_college_shards and reloaded when
+    SHARDS_NAMESPACE is bumped, which other workers see through cache_sync.
+    """
+
+    def __init__(self, directory: Engine, shards: Dict[str, Engine]):
+        self.directory = directory
+        self.engines = {DEFAULT_SHARD: directory, **shards}
+        self._placements: Dict[int, Tuple[str, str]] = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        table = CollegeShard.__table__
+        version = cache.version(SHARDS_NAMESPACE)
+        with self.directory.connect() as conn:
+            rows = conn.execute(select(table.c.college_id, table.c.shard, table.c.status)).all()
+        self._placements = {r.college_id: (r.shard, r.status) for r in rows}
+        self._version = version
+
+    def placement(self, college_id: int) -> Tuple[str, str]:
+        """(shard name, status) of a college"""
+        if self._version != cache.version(SHARDS_NAMESPACE):
+            with self._lock:
+                if self._version != cache.version(SHARDS_NAMESPACE):
+                    self._load()
+        return self._placements.get(college_id, (DEFAULT_SHARD, "active"))
+
+    def shard_of(self, college_id: int) -> str:
+        name = self.placement(college_id)[0]
+        if name not in self.engines:
+            raise RuntimeError(f"College {college_id} is mapped to shard {name!r}, which is not in SHARDS")
+        return name
+
+    def route(self, mapper, clause) -> Engine:
+        if is_global(mapper, clause):
+            ROUTED.inc("directory")
+            return self.directory
+        name = forced_shard.get()
+        if name is None:
+            college_id = routing_college()
+            name = DEFAULT_SHARD if college_id is None else self.shard_of(college_id)
+        ROUTED.inc(name)
+        return self.engines[name]
+
+    def check_writable(self):
+        """
+        Raise CollegeMoving for a write while the routed college is being
+        moved, and CollegeRequired for an API request writing college rows
+        without a college to route them by
+        """
+        if forced_shard.get() is not None:
+            return
+        college_id = routing_college()
+        if college_id is None:
+            if route_required.get():
+                UNROUTED_REJECTED.inc()
+                raise CollegeRequired()
+        elif self.placement(college_id)[1] == "moving":
+            MOVING_REJECTED.inc()
+            raise CollegeMoving(college_id)
+
+
+router: Optional[ShardRouter] = None
+
+
+def shard_names() -> List[str]:
+    return list(router.engines) if router is not None else [DEFAULT_SHARD]
+
+
+def shard_engine(name: str) -> Engine:
+    return router.engines[name] if router is not None else get_engine()
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session, flush_context, instances):
+    if router is None:
+        return
+    changed = [*session.new, *session.dirty, *session.deleted]
+    if any(getattr(type(obj), "__tablename__", None) not in GLOBAL_TABLES for obj in changed):
+        router.check_writable()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _before_bulk_write(execute_state):
+    if router is not None and (execute_state.is_insert or execute_state.is_update or execute_state.is_delete):
+        if not is_global(None, execute_state.statement):
+            router.check_writable()
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+
+def prepare_shard(engine: Engine, index: int):
+    """Create the shard and reference tables, and move MySQL id counters into the shard's block"""
+    tables = shard_tables() + [Base.metadata.tables[name] for name in REFERENCE_TABLES]
+    Base.metadata.create_all(bind=engine, tables=tables)
+    if engine.dialect.name != "mysql":
+        # SQLite ids start after the largest one present; move_college refuses colliding ids
+        return
+    with engine.begin() as conn:
+        for table in shard_tables():
+            if table.autoincrement_column is not None:
+                # never lowers the counter below the largest id present
+                conn.execute(text(f"ALTER TABLE {table.name} AUTO_INCREMENT = {index * SHARD_ID_BLOCK}"))
+
+
+def replicate_reference_tables(names=REFERENCE_TABLES, ids: Optional[Iterable] = None):
+    """
+    Make the reference tables of every other shard match the directory,
+    only for the rows with the given primary keys if ids are passed.
+    Failures are logged; the next write or startup reconciles again.
+    """
+    if router is None:
+        return
+    ids = None if ids is None else list(ids)
+    for name in names:
+        table = Base.metadata.tables[name]
+        pk = list(table.primary_key.columns)[0]
+        query = select(table) if ids is None else select(table).where(pk.in_(ids))
+        with router.directory.connect() as conn:
+            rows = [dict(r._mapping) for r in conn.execute(query)]
+        stmt = (
+            update(table)
+            .where(pk == bindparam("_pk"))
+            .values({c.name: bindparam("_" + c.name) for c in table.c if c is not pk})
+        )
+        for shard, engine in router.engines.items():
+            if engine is router.directory:
+                continue
+            try:
+                with engine.begin() as conn:
+                    existing = set(conn.execute(select(pk) if ids is None else select(pk).where(pk.in_(ids))).scalars())
+                    new = [r for r in rows if r[pk.name] not in existing]
+                    if new:
+                        conn.execute(insert(table), new)
+                    changed = [{"_pk": r[pk.name], **{"_" + k: v for k, v in r.items()}} for r in rows if r[pk.name] in existing]
+                    if changed:
+                        conn.execute(stmt, changed)
+                    gone = existing - {r[pk.name] for r in rows}
+                    if gone:
+                        conn.execute(delete(table).where(pk.in_(gone)))
+            except Exception:
+                logger.warning("Could not replicate %s to shard %s", name, shard, exc_info=True)
+
+
+def init_shards(settings: Optional[Settings] = None) -> Optional[ShardRouter]:
+    """
+    Create the engines of SHARDS, prepare their tables and route sessions
+    through them. Call once the directory tables exist (lifespan).
+    """
+    global router
+    settings = settings or get_settings()
+    specs = _parse_shards(settings.shards)
+    if not specs or router is not None:
+        return router
+    shards = {}
+    for index, (name, url) in enumerate(specs, start=1):
+        engine = create_db_engine(url, settings, shard_name=name)
+        prepare_shard(engine, index)
+        shards[name] = engine
+    router = ShardRouter(get_engine(), shards)
+    replicate_reference_tables()
+    set_bind_router(router.route)
+    logger.info("Routing colleges over shards: %s", ", ".join(router.engines))
+    return router
+
+
+def close_shards():
+    global router
+    if router is None:
+        return
+    set_bind_router(None)
+    for name, engine in router.engines.items():
+        if engine is not router.directory:
+            engine.dispose()
+    router = None
+
+# ============================================================================
+# REQUESTS
+# ============================================================================
+
+
+def _as_id(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None and not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _college_param(scope) -> Optional[int]:
+    value = scope.get("path_params", {}).get("college_id")
+    if value is None:
+        values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("college_id")
+        value = values[0] if values else None
+    return _as_id(value)
+
+
+async def _read_json_body(scope, receive):
+    """
+    The parsed body of a small JSON request, or None, and a receive that
+    replays what was read for the endpoint
+    """
+    headers = Headers(scope=scope)
+    length = _as_id(headers.get("content-length"))
+    if (
+        scope.get("method") not in ("POST", "PUT", "PATCH")
+        or not headers.get("content-type", "").startswith("application/json")
+        or length is None
+        or length > ROUTING_BODY_MAX
+    ):
+        return None, receive
+
+    messages, chunks = [], []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+
+    async def replay():
+        return messages.pop(0) if messages else await receive()
+
+    try:
+        return json.loads(b"".join(chunks)), replay
+    except ValueError:
+        return None, replay
+
+
+def _entity_queries() -> Dict[str, object]:
+    """path parameter -> query of the college owning the row with that primary key"""
+    queries = {}
+    for table in shard_tables():
+        pks = list(table.primary_key.columns)
+        if len(pks) != 1:
+            continue
+        pk = pks[0]
+        if "college_id" in table.c:
+            queries[pk.name] = select(table.c.college_id).where(pk == bindparam("id"))
+            continue
+        # e.g. semesters: through the course they belong to
+        for fk in table.foreign_keys:
+            parent = fk.column.table
+            if "college_id" in parent.c:
+                queries[pk.name] = (
+                    select(parent.c.college_id)
+                    .select_from(table.join(parent, fk.parent == fk.column))
+                    .where(pk == bindparam("id"))
+                )
+                break
+    return queries
+
+
+_entity_query_cache: Dict[str, object] = {}
+
+
+def _find_entity_college(query, entity_id: int) -> Optional[int]:
+    found = set()
+    for engine in router.engines.values():
+        with engine.connect() as conn:
+            college_id = conn.execute(query, {"id": entity_id}).scalar()
+        if college_id is not None:
+            found.add(college_id)
+    return found.pop() if len(found) == 1 else None
+
+
+def _entity_college(path_params: dict) -> Optional[int]:
+    """
+    College of the row a path like /admin/courses/{course_id} addresses.
+    A row's college never changes, so it is looked up on every shard once
+    and cached; entries go with the shard map (SHARDS_NAMESPACE), unknown
+    ids are not cached. SQLite shards may reuse an id for different
+    colleges; an ambiguous id routes nowhere and the client must pass
+    college_id.
+    """
+    if not _entity_query_cache:
+        _entity_query_cache.update(_entity_queries())
+    for name, value in path_params.items():
+        query = _entity_query_cache.get(name)
+        entity_id = _as_id(value)
+        if query is None or entity_id is None:
+            continue
+        return cache.get_or_compute(SHARDS_NAMESPACE, ("entity", name, entity_id), lambda: _find_entity_college(query, entity_id))
+    return None
+
+
+class _ShardRouted:
+    """
+    Wraps a route's ASGI app so requests without a tenant are routed to
+    their college's shard: the college_id path or query parameter, else the
+    college_id of a JSON body, else the college of the addressed row
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        college_id = None
+        if current_tenant.get() is None and router is not None:
+            college_id = _college_param(scope)
+            if college_id is None:
+                body, receive = await _read_json_body(scope, receive)
+                if isinstance(body, dict):
+                    college_id = _as_id(body.get("college_id"))
+            if college_id is None and scope.get("path_params"):
+                college_id = await run_in_threadpool(_entity_college, scope["path_params"])
+        hint = routing_hint.set(college_id)
+        required = route_required.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_required.reset(required)
+            routing_hint.reset(hint)
+
+
+def apply_shard_routing(app, settings: Optional[Settings] = None):
+    """Give every API route its routing hint. Call after the other route wrappers"""
+    settings = settings or get_settings()
+    if not _parse_shards(settings.shards):
+        return
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            route.app = _ShardRouted(route.app)
+
+
+async def college_required_handler(request, exc: CollegeRequired):
+    return JSONResponse(
+        {"detail": "Pass college_id to write college data when colleges are sharded"},
+        status_code=400,
+    )
+
+
+async def college_moving_handler(request, exc: CollegeMoving):
+    return JSONResponse(
+        {"detail": "College is being moved, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(MOVING_RETRY_AFTER)},
+    )
@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+# College the current request is scoped to; None means unscoped (Super
+# Admin, unauthenticated routes, background jobs, startup)
+current_tenant: ContextVar[Optional[int]] = ContextVar("current_tenant", default=None)
+
+# execution option that lets one statement see every college
+ALL_TENANTS = "all_tenants"
+
+_enabled = True
+
+
+class TenantScoped:
+    """
+    Mixin for models with a college_id column. While a tenant is set, ORM
+    selects, updates and deletes of these models (as entities or through
+    their columns) only see that college's rows. Criteria are not added
+    for a model that is only joined to, whose rows are reached through a
+    scoped row's foreign key and so belong to the same college.
+    """
+
+
+def get_tenant() -> Optional[int]:
+    return current_tenant.get() if _enabled else None
+
+
+def in_tenant(college_id: Optional[int]) -> bool:
+    """
+    Whether the current tenant may write rows of this college. Colleges are
+    not scoped, and Core inserts are not rewritten, so write paths that take
+    a college_id from the caller check it here.
+    """
+    tenant = get_tenant()
+    return tenant is None or college_id == tenant
+
+
+@contextmanager
+def tenant_scope(college_id: Optional[int]):
+    """Run a block as the given college, e.g. to fill its caches outside a request"""
+    token = current_tenant.set(college_id)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+def configure_tenancy(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_tenant(execute_state):
+    tenant = get_tenant()
+    if (
+        tenant is None
+        or not (execute_state.is_select or execute_state.is_update or execute_state.is_delete)
+        or execute_state.is_column_load
+        or execute_state.is_relationship_load
+        or execute_state.execution_options.get(ALL_TENANTS, False)
+    ):
+        return
+    # only the entities the statement selects; the lambda form is cached
+    # once per model with the tenant as a bound parameter
+    execute_state.statement = execute_state.statement.options(*(
+        with_loader_criteria(mapper.class_, lambda cls: cls.college_id == tenant, include_aliases=True)
+        for mapper in execute_state.all_mappers
+        if issubclass(mapper.class_, TenantScoped)
+    ))
+
+
+class TenantMiddleware:
+    """
+    Sets current_tenant for the request from resolve(scope), which reads
+    the access token's college_id claim (see app.api.auth.request_tenant).
+    Invalid or missing tokens leave the request unscoped; the route's own
+    auth dependency decides whether that is allowed.
+    """
+
+    def __init__(self, app, resolve: Callable[[dict], Optional[int]]):
+        self.app = app
+        self.resolve = resolve
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+        token = current_tenant.set(self.resolve(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
@@ -0,0 +1,355 @@
+import functools
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# exporter, file and service name come from the settings, see configure_tracing()
+TRACING_MAX_STATEMENT = 2000
+
+# ============================================================================
+# SPANS
+# ============================================================================
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """A finished or in-progress unit of work, using the OpenTelemetry data model"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "kind", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], kind: int, attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1_000_000
+
+    def to_otlp(self) -> dict:
+        """The span as an OTLP/JSON `Span` object"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+# ============================================================================
+# EXPORTERS
+# ============================================================================
+
+
+class InMemorySpanExporter:
+    """Keeps the most recent finished spans, for benchmarks and ad-hoc inspection"""
+
+    def __init__(self, max_spans: Optional[int] = None):
+        self._spans = deque(maxlen=max_spans or get_settings().tracing_memory_spans)
+
+    def export(self, span: Span):
+        self._spans.append(span)
+
+    def get_finished_spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        spans = list(self._spans)
+        if trace_id is not None:
+            spans = [s for s in spans if s.trace_id == trace_id]
+        return spans
+
+    def clear(self):
+        self._spans.clear()
+
+
+class FileSpanExporter:
+    """
+    Appends one OTLP/JSON `ResourceSpans` document per line, so the file can
+    be replayed into an OpenTelemetry collector (otlpjsonfile receiver).
+    Spans are serialized and written by a background thread, off the event
+    loop, as in app/core/capture.py.
+    """
+
+    def __init__(self, path: Optional[str] = None, service_name: Optional[str] = None):
+        settings = get_settings()
+        self.path = path or settings.tracing_file
+        service_name = service_name or settings.tracing_service_name
+        self._resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-export", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def _run(self):
+        with open(self.path, "a") as f:
+            while True:
+                span = self._queue.get()
+                try:
+                    f.write(json.dumps({
+                        "resourceSpans": [{
+                            "resource": self._resource,
+                            "scopeSpans": [{"scope": {"name": "app"}, "spans": [span.to_otlp()]}],
+                        }]
+                    }) + "\n")
+                    if self._queue.empty():
+                        f.flush()
+                except Exception:
+                    logger.exception("Could not write span")
+
+
+_exporter = None
+
+
+def set_exporter(exporter):
+    """Install a span exporter; None turns tracing off"""
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter():
+    return _exporter
+
+
+def configure_tracing(settings: Optional[Settings] = None):
+    """Set up the exporter selected by TRACING_EXPORTER: "none" (default), "memory" or "file" """
+    settings = settings or get_settings()
+    exporter = settings.tracing_exporter.lower()
+    if exporter == "memory":
+        set_exporter(InMemorySpanExporter(settings.tracing_memory_spans))
+    elif exporter == "file":
+        set_exporter(FileSpanExporter(settings.tracing_file, settings.tracing_service_name))
+    else:
+        set_exporter(None)
+
+# ============================================================================
+# TRACER
+# ============================================================================
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _new_span(name: str, kind: int, attributes: Optional[dict], parent: Optional[Span] = None, trace_id: Optional[str] = None, parent_span_id: Optional[str] = None) -> Span:
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    return Span(name, trace_id or f"{random.getrandbits(128):032x}", parent_span_id, kind, attributes)
+
+
+def _end_span(span: Span):
+    span.end_ns = time.time_ns()
+    exporter = _exporter
+    if exporter is not None:
+        exporter.export(span)
+
+
+@contextmanager
+def start_span(name: str, kind: int = KIND_INTERNAL, attributes: Optional[dict] = None):
+    """
+    Run the block in a child span of the current one. Yields None without
+    doing anything when tracing is off.
+    """
+    if _exporter is None:
+        yield None
+        return
+
+    span = _new_span(name, kind, attributes, parent=current_span.get())
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        current_span.reset(token)
+        _end_span(span)
+
+
+def traced(fn):
+    """Decorator wrapping every call of a service function in a span named after it"""
+    name = fn.__qualname__
+    attributes = {"code.namespace": fn.__module__, "code.function": fn.__name__}
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _exporter is None:
+            return fn(*args, **kwargs)
+        with start_span(name, attributes=attributes):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+
+def _parse_traceparent(value: str):
+    # W3C trace context: version-traceid-parentid-flags
+    parts = value.strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+class TracingMiddleware:
+    """
+    Opens the server span of every request, continuing the caller's trace
+    when a W3C `traceparent` header is sent. The span is named after the
+    route template and the trace id is returned in `X-Trace-Id`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = parent_span_id = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                trace_id, parent_span_id = _parse_traceparent(value.decode("latin-1"))
+                break
+
+        span = _new_span(scope["method"], KIND_SERVER, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        }, trace_id=trace_id, parent_span_id=parent_span_id)
+        token = current_span.set(span)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = STATUS_ERROR
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-trace-id", span.trace_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            current_span.reset(token)
+            route = route_template(scope)
+            span.name = f"{scope['method']} {route}"
+            span.set_attribute("http.route", route)
+            _end_span(span)
+
+# ============================================================================
+# SQL SPANS
+# ============================================================================
+
+
+def instrument_engine_tracing(engine):
+    """Open a client span per SQL statement executed inside a trace"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        parent = current_span.get() if _exporter is not None else None
+        if parent is None:
+            conn.info.setdefault("_trace_spans", []).append(None)
+            return
+        span = _new_span(statement.split(None, 1)[0].upper() if statement else "SQL", KIND_CLIENT, {
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:TRACING_MAX_STATEMENT],
+        }, parent=parent)
+        if executemany:
+            span.set_attribute("db.executemany", True)
+        conn.info.setdefault("_trace_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span = conn.info["_trace_spans"].pop()
+        if span is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            _end_span(span)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("_trace_spans"):
+            span = conn.info["_trace_spans"].pop()
+            if span is not None:
+                span.record_exception(context.original_exception)
+                _end_span(span)
+
+
+def summarize_trace(spans: List[Span]) -> List[Dict]:
+    """Flatten a trace into rows of (depth, name, duration_ms), parents before children"""
+    children = {}
+    for s in spans:
+        children.setdefault(s.parent_span_id, []).append(s)
+    ids = {s.span_id for s in spans}
+    roots = [s for s in spans if s.parent_span_id not in ids]
+
+    rows = []
+
+    def walk(span, depth):
+        rows.append({"depth": depth, "name": span.name, "duration_ms": round(span.duration_ms, 3)})
+        for child in sorted(children.get(span.span_id, []), key=lambda c: c.start_ns):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda r: r.start_ns):
+        walk(root, 0)
+    return rows
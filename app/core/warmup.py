@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = registry.gauge("app_warmup_step_seconds", "Duration of each startup warm-up step", ("step",))
+READY = registry.gauge("app_ready", "1 once warm-up has finished and the worker accepts traffic")
+
+# ============================================================================
+# READINESS
+# ============================================================================
+
+
+class Readiness:
+    """
+    Whether this worker should receive traffic. Set by the lifespan once
+    warm-up has finished, cleared again when shutdown starts so the load
+    balancer drains the worker before connections are closed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.report: dict = {}
+
+    def set(self, ready: bool, report: Optional[dict] = None):
+        with self._lock:
+            self.ready = ready
+            if report is not None:
+                self.report = report
+        READY.set(value=1 if ready else 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"ready": self.ready, **self.report}
+
+
+readiness = Readiness()
+
+# ============================================================================
+# STEPS
+# ============================================================================
+
+
+def _warm_pool(settings: Settings) -> dict:
+    """Open N pooled connections at once so the first requests do not pay for the handshakes"""
+    from app.core.database import get_engine
+
+    engine = get_engine()
+    n = settings.warmup_connections if settings.warmup_connections is not None else settings.db_pool_size
+    if engine.url.get_backend_name() == "sqlite":
+        n = min(n, 1)
+    conns = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conns.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in conns:
+            conn.close()
+    return {"connections": len(conns)}
+
+
+def _warm_auth(settings: Settings) -> dict:
+    """Load the bcrypt backend and do a JWT round trip"""
+    from app.api.auth import LoginRequest, create_access_token, decode_token, get_auth_backend
+
+    # the minimum cost is enough to load and self-test the backend
+    pwd_context = get_auth_backend().pwd_context
+    if not pwd_context.verify("warm-up", pwd_context.hash("warm-up", rounds=4)):
+        raise RuntimeError("bcrypt round trip failed")
+    payload = decode_token(create_access_token({"user_id": 0, "type": "warmup"}))
+    if payload.get("user_id") != 0:
+        raise RuntimeError("JWT round trip failed")
+    # EmailStr pulls in email-validator on first validation
+    LoginRequest(email="warm-up@example.com", password="warm-up")
+    return {}
+
+
+def _warm_caches(settings: Settings) -> dict:
+    """Prefill the reference-data caches of the active colleges"""
+    from app.core.database import SessionLocal
+    from app.core.tenant import tenant_scope
+    from app.models.college import College
+    from app.services.academic_year_service import get_current_academic_year
+    from app.services.curriculum_service import get_curriculum_tree
+    from app.services.permission_service import load_permission_catalog
+
+    db = SessionLocal()
+    try:
+        # permission lookups and listings are served from it without queries
+        load_permission_catalog(db)
+        college_ids = [
+            c for (c,) in db.query(College.college_id)
+            .filter(College.status == 1)
+            .order_by(College.college_id)
+            .limit(settings.warmup_max_colleges)
+        ]
+        for college_id in college_ids:
+            # into the partition the college's own requests read from
+            with tenant_scope(college_id):
+                get_curriculum_tree(db, college_id)
+                get_current_academic_year(db, college_id)
+    finally:
+        db.close()
+    return {"colleges": len(college_ids)}
+
+
+# name, function, whether a failure keeps the worker out of rotation
+STEPS: List[tuple] = [
+    ("pool", _warm_pool, True),
+    ("auth", _warm_auth, True),
+    ("caches", _warm_caches, False),
+]
+
+
+def warm_up(settings: Optional[Settings] = None, steps: Optional[List[tuple]] = None) -> dict:
+    """
+    Run the warm-up steps in order and return a report of what each did
+    and how long it took. Blocking: call it from a thread.
+    """
+    settings = settings or get_settings()
+    report = {"steps": {}, "ok": True}
+    started = time.perf_counter()
+    for name, fn, required in steps or STEPS:
+        if name == "caches" and not settings.warmup_caches:
+            continue
+        step_start = time.perf_counter()
+        try:
+            result = fn(settings)
+            status = "ok"
+        except Exception as e:
+            logger.exception("Warm-up step %s failed", name)
+            result = {"error": f"{type(e).__name__}: {e}"}
+            status = "failed"
+            if required:
+                report["ok"] = False
+        elapsed = time.perf_counter() - step_start
+        WARMUP_SECONDS.set(name, value=elapsed)
+        report["steps"][name] = {"status": status, "duration_ms": round(elapsed * 1000, 3), **result}
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    logger.info("Warm-up finished in %.0f ms: %s", report["duration_ms"], report["steps"])
+    return report
+
+
+def run_warm_up(settings: Optional[Settings] = None) -> dict:
+    """Warm up and mark the worker ready, unless a required step failed"""
+    report = warm_up(settings)
+    readiness.set(report["ok"], report)
+    return report
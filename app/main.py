@@ -1,53 +1,193 @@
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.admin.colleges import router as colleges_router
-from app.api.admin.roles import router as roles_router
-from app.api.admin.permissions import router as permissions_router
-from app.api.admin.users import router as users_router
-from app.api.admin.academic_years import router as academic_years_router
-from app.api.admin.education_types import router as education_types_router
-from app.api.admin.courses import router as courses_router
-from app.api.admin.semesters import router as semesters_router
-from app.api.admin.subjects import router as subjects_router
-from app.api.auth import router as auth_router
-from app.api.admin.faculty import router as faculty
-from app.core.database import Base, engine
-
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="College CMS Backend")
-
-# =========================
-# CORS CONFIGURATION
-# =========================
-origins = [
-    "http://localhost:8080",
-    "http://127.0.0.1:3000",
-    "http://localhost:5173",
-    "http://127.0.0.1:5173",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# =========================
-# ROUTES
-# =========================
-app.include_router(colleges_router)
-app.include_router(roles_router)
-app.include_router(permissions_router)
-app.include_router(users_router)
-app.include_router(academic_years_router)
-app.include_router(education_types_router)
-app.include_router(courses_router)
-app.include_router(semesters_router)
-app.include_router(subjects_router)
-app.include_router(auth_router)
-app.include_router(faculty)
+from app.core.config import Settings, configure, get_settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.api.auth import init_auth
+    from app.core.cache_sync import cache_sync
+    from app.core.concurrency import configure_threadpool
+    from app.core.database import Base, init_engine, dispose_engine
+    from app.core.jobs import job_pool
+    from app.core.login_index import login_index_sync, reconcile_login_index
+    from app.core.sharding import close_shards, init_shards
+    from app.core.warmup import readiness, run_warm_up
+
+    settings = app.state.settings
+    # threads for sync endpoints and dependencies (THREADPOOL_TOKENS)
+    configure_threadpool(settings)
+
+    # JWT backend and bcrypt context; fails here, not at import, without SECRET_KEY
+    init_auth(settings)
+
+    # Create tables
+    engine = init_engine(settings)
+    Base.metadata.create_all(bind=engine)
+
+    # other workers' writes invalidate our caches through tbl_cache_versions
+    cache_sync.start(settings)
+
+    # shard engines and the college -> shard routing of sessions (SHARDS)
+    init_shards(settings)
+    # emails and usernames over all shards (tbl_user_logins), for login
+    await run_in_threadpool(reconcile_login_index)
+    login_index_sync.start(settings)
+
+    # background job workers (tbl_jobs is the queue)
+    job_pool.start(settings)
+
+    # Pool connections, bcrypt, JWT and reference-data caches; /health/ready
+    # reports 503 until this has finished
+    await run_in_threadpool(run_warm_up, settings)
+    yield
+    readiness.set(False)
+    job_pool.stop()
+    cache_sync.stop()
+    login_index_sync.stop()
+    close_shards()
+    dispose_engine()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the application. Settings default to the environment; passing
+    them in installs them for the whole process before any module that
+    reads them is imported. The engine, JWT backend and bcrypt context are
+    created in the lifespan, not at import.
+    """
+    if settings is not None:
+        configure(settings)
+    settings = get_settings()
+
+    from app.api.admin.colleges import router as colleges_router
+    from app.api.admin.roles import router as roles_router
+    from app.api.admin.permissions import router as permissions_router
+    from app.api.admin.users import router as users_router
+    from app.api.admin.academic_years import router as academic_years_router
+    from app.api.admin.education_types import router as education_types_router
+    from app.api.admin.courses import router as courses_router
+    from app.api.admin.semesters import router as semesters_router
+    from app.api.admin.subjects import router as subjects_router
+    from app.api.auth import router as auth_router
+    from app.api.admin.faculty import router as faculty
+    from app.api.admin.students import router as students_router
+    from app.api.admin.jobs import router as jobs_router
+    from app.api.admin.profiles import router as profiles_router
+    from app.api.auth import is_super_admin_request, request_tenant
+    from app.api.batch import router as batch_router
+    from app.api.health import router as health_router
+    from app.api.metrics import router as metrics_router
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from app.core.admission import admission, pool_timeout_handler
+    from app.core.cache import cache
+    from app.core.capture import TrafficCaptureMiddleware
+    from app.core.concurrency import apply_concurrency_classes
+    from app.core.database import on_engine_created
+    from app.core.metrics import MetricsMiddleware, instrument_engine
+    from app.core.ratelimit import protect_login
+    from app.core.sharding import (
+        CollegeMoving,
+        CollegeRequired,
+        apply_shard_routing,
+        college_moving_handler,
+        college_required_handler,
+    )
+    from app.core.profiling import ProfilingMiddleware
+    from app.core.tenant import TenantMiddleware, configure_tenancy
+    from app.core.tracing import TracingMiddleware, configure_tracing, instrument_engine_tracing
+
+    # Per-statement SQL timing and pool stats for /metrics
+    on_engine_created(instrument_engine)
+
+    # Request / service / SQL spans, exported as selected by TRACING_EXPORTER
+    configure_tracing(settings)
+    on_engine_created(instrument_engine_tracing)
+
+    # Per-tenant entry and tenant limits of the shared cache
+    cache.configure(settings)
+
+    app = FastAPI(title="College CMS Backend", lifespan=lifespan)
+    app.state.settings = settings
+
+    # =========================
+    # CORS CONFIGURATION
+    # =========================
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # On-demand / sampled / over-budget request profiles (see app/core/profiling.py)
+    app.add_middleware(ProfilingMiddleware, authorize=is_super_admin_request, settings=settings)
+
+    # College from the access token: scopes ORM queries of tenant models
+    # and partitions the caches (TENANT_SCOPING_ENABLED)
+    configure_tenancy(settings.tenant_scoping_enabled)
+    app.add_middleware(TenantMiddleware, resolve=request_tenant)
+
+    # Server span per request, parent of the service and SQL spans
+    app.add_middleware(TracingMiddleware)
+
+    # Anonymized request traces for app.tools.replay, when TRAFFIC_CAPTURE_FILE is set
+    app.add_middleware(
+        TrafficCaptureMiddleware,
+        path=settings.traffic_capture_file,
+        max_body=settings.traffic_capture_max_body,
+    )
+
+    # Added last so it wraps CORS and sees every request
+    app.add_middleware(MetricsMiddleware)
+
+    # =========================
+    # ROUTES
+    # =========================
+    app.include_router(colleges_router)
+    app.include_router(roles_router)
+    app.include_router(permissions_router)
+    app.include_router(users_router)
+    app.include_router(academic_years_router)
+    app.include_router(education_types_router)
+    app.include_router(courses_router)
+    app.include_router(semesters_router)
+    app.include_router(subjects_router)
+    app.include_router(auth_router)
+    app.include_router(faculty)
+    app.include_router(students_router)
+    app.include_router(jobs_router)
+    app.include_router(profiles_router)
+    app.include_router(batch_router)
+    app.include_router(metrics_router)
+    app.include_router(health_router)
+
+    # Login hashing, heavy reads/writes and light reads get separate capacity
+    # limiters so a burst of one cannot starve the others
+    apply_concurrency_classes(app, settings)
+
+    # Shed load with 503 + Retry-After, bulk writes first, before the pool
+    # is exhausted; a pool checkout timeout is answered the same way
+    admission.configure(settings)
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
+    # Per-IP and per-email token buckets on /auth/login, checked before any
+    # DB access or bcrypt work
+    protect_login(app, settings)
+
+    # Super Admin requests are routed to the shard of their college_id
+    # (parameter, JSON body or addressed row); writes to a college being
+    # moved answer 503 + Retry-After, college writes without one 400
+    apply_shard_routing(app, settings)
+    app.add_exception_handler(CollegeMoving, college_moving_handler)
+    app.add_exception_handler(CollegeRequired, college_required_handler)
+
+    return app
+
+
+app = create_app()
@@ -2,9 +2,10 @@ from sqlalchemy import Column, Integer, String, Date, TIMESTAMP, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 
 
-class AcademicYear(Base):
+class AcademicYear(TenantScoped, Base):
     __tablename__ = "tbl_academic_years"
 
     academic_year_id = Column(Integer, primary_key=True, index=True)
@@ -17,3 +18,5 @@ class AcademicYear(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     college = relationship("College")
+
+    __mapper_args__ = {"eager_defaults": True}
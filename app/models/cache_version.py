@@ -0,0 +1,10 @@
+from sqlalchemy import Column, BigInteger, String, DateTime
+from app.core.database import Base
+
+
+class CacheVersion(Base):
+    __tablename__ = "tbl_cache_versions"
+
+    namespace = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime)
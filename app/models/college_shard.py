@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from app.core.database import Base
+
+
+class CollegeShard(Base):
+    __tablename__ = "tbl_college_shards"
+
+    college_id = Column(Integer, ForeignKey("tbl_colleges.college_id"), primary_key=True)
+    shard = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="active")
+    updated_at = Column(DateTime)
@@ -2,9 +2,10 @@ from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 
 
-class Course(Base):
+class Course(TenantScoped, Base):
     __tablename__ = "tbl_courses"
 
     course_id = Column(Integer, primary_key=True, index=True)
@@ -20,3 +21,5 @@ class Course(Base):
 
     college = relationship("College")
     education_type = relationship("EducationType")
+
+    __mapper_args__ = {"eager_defaults": True}
@@ -2,9 +2,10 @@ from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 
 
-class EducationType(Base):
+class EducationType(TenantScoped, Base):
     __tablename__ = "tbl_education_types"
 
     education_type_id = Column(Integer, primary_key=True, index=True)
@@ -16,3 +17,5 @@ class EducationType(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     college = relationship("College")
+
+    __mapper_args__ = {"eager_defaults": True}
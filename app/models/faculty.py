@@ -1,9 +1,10 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 from datetime import datetime
 
-class Faculty(Base):
+class Faculty(TenantScoped, Base):
     __tablename__ = "tbl_faculty"
 
     faculty_id = Column(Integer, primary_key=True, index=True)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, DateTime
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Job(Base):
+    __tablename__ = "tbl_jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    params = Column(Text().with_variant(LONGTEXT, "mysql"))
+    result = Column(Text().with_variant(LONGTEXT, "mysql"))
+    error = Column(Text)
+    progress_current = Column(Integer, default=0)
+    progress_total = Column(Integer)
+    cancel_requested = Column(Integer, default=0)
+    worker_id = Column(String(100))
+    created_by = Column(Integer)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __mapper_args__ = {"eager_defaults": True}
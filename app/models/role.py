@@ -1,9 +1,10 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 
 
-class Role(Base):
+class Role(TenantScoped, Base):
     __tablename__ = "tbl_roles"
 
     role_id = Column(Integer, primary_key=True, index=True)
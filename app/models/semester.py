@@ -15,3 +15,5 @@ class Semester(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     course = relationship("Course")
+
+    __mapper_args__ = {"eager_defaults": True}
@@ -1,14 +1,22 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Year, TIMESTAMP
+from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP
+from sqlalchemy.dialects.mysql import YEAR
 from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 
-class Student(Base):
+class Student(TenantScoped, Base):
     __tablename__ = "tbl_students"
 
     student_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("tbl_users.user_id"), unique=True)
     college_id = Column(Integer, ForeignKey("tbl_colleges.college_id"))
     admission_number = Column(String(50), unique=True, nullable=False)
-    admission_year = Column(Year, nullable=False)
+    admission_year = Column(Integer().with_variant(YEAR, "mysql"), nullable=False)
     status = Column(Integer, default=1)
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+    user = relationship("User")
+    college = relationship("College")
+
+    __mapper_args__ = {"eager_defaults": True}
@@ -2,9 +2,10 @@ from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Numeric
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 
 
-class Subject(Base):
+class Subject(TenantScoped, Base):
     __tablename__ = "tbl_subjects"
 
     subject_id = Column(Integer, primary_key=True, index=True)
@@ -20,3 +21,5 @@ class Subject(Base):
 
     course = relationship("Course")
     semester = relationship("Semester")
+
+    __mapper_args__ = {"eager_defaults": True}
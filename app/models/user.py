@@ -1,20 +1,25 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.tenant import TenantScoped
 
-class User(Base):
+class User(TenantScoped, Base):
     __tablename__ = "tbl_users"
 
     user_id = Column(Integer, primary_key=True, index=True)
     college_id = Column(Integer, ForeignKey("tbl_colleges.college_id"))
-    username = Column(String(100), unique=True, nullable=False)
-    email = Column(String(255), unique=True, nullable=False)
+    # case-insensitive like MySQL's default collation, so plain = and IN
+    # compare them that way and use the unique indexes on every backend
+    username = Column(String(100).with_variant(String(100, collation="NOCASE"), "sqlite"), unique=True, nullable=False)
+    email = Column(String(255).with_variant(String(255, collation="NOCASE"), "sqlite"), unique=True, nullable=False)
     phone = Column(String(20))
     password_hash = Column(String(255), nullable=False)
     status = Column(Integer, default=1)
-    created_at = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP, server_default=func.now())
 
     # relationships
     user_roles = relationship("UserRole", back_populates="user", cascade="all, delete-orphan")
     faculty = relationship("Faculty", back_populates="user", uselist=False)
     college = relationship("College")
+
+    __mapper_args__ = {"eager_defaults": True}
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Index, Integer, String
+from app.core.database import Base
+
+
+class UserLogin(Base):
+    """
+    Directory-wide index of user emails and usernames while colleges are
+    sharded (app/core/login_index.py): tbl_users is unique per shard only
+    """
+
+    __tablename__ = "tbl_user_logins"
+
+    login_id = Column(Integer, primary_key=True)
+    # case-insensitive like tbl_users
+    email = Column(String(255).with_variant(String(255, collation="NOCASE"), "sqlite"), unique=True, nullable=False)
+    username = Column(String(100).with_variant(String(100, collation="NOCASE"), "sqlite"), unique=True, nullable=False)
+    # the user is tbl_users.user_id on the shard of this college
+    college_id = Column(Integer)
+    user_id = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_user_logins_college_user", "college_id", "user_id"),)
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+
+class BatchSubRequest(BaseModel):
+    id: str
+    method: str = "GET"
+    path: str
+    body: Optional[Any] = None
+    headers: Optional[Dict[str, str]] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1)
+
+
+class BatchSubResponse(BaseModel):
+    status: int
+    body: Optional[Any]
+    duration_ms: float
+
+
+class BatchResponse(BaseModel):
+    results: Dict[str, BatchSubResponse]
+    duration_ms: float
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+
+class JobSubmit(BaseModel):
+    job_type: str
+    params: Dict[str, Any] = {}
+
+
+class JobResponse(BaseModel):
+    job_id: int
+    job_type: str
+    status: str
+    progress_current: int
+    progress_total: Optional[int]
+    percent: Optional[float]
+    cancel_requested: bool
+    result: Optional[Any]
+    error: Optional[str]
+    created_at: Optional[str]
+    started_at: Optional[str]
+    finished_at: Optional[str]
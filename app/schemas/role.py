@@ -8,6 +8,10 @@ class RoleCreate(BaseModel):
     description: Optional[str]
 
 
+class RolePermissionsUpdate(BaseModel):
+    permissions: List[str]
+
+
 class RoleResponse(BaseModel):
     id: int
     name: str
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, EmailStr
+from typing import Optional
+
+
+class StudentCreate(BaseModel):
+    college_id: int
+    admission_number: str
+    admission_year: int
+    email: EmailStr
+    name: Optional[str] = None
+    phone: Optional[str] = None
+    role_id: Optional[int] = None
+    status: str = "active"
+
+
+class StudentUpdate(BaseModel):
+    admission_number: str
+    admission_year: int
+    email: EmailStr
+    name: str
+    phone: Optional[str] = None
+    status: str
+
+
+class StudentResponse(BaseModel):
+    student_id: int
+    user_id: int
+    name: str
+    email: EmailStr
+    phone: Optional[str]
+    college_id: int
+    college_name: Optional[str]
+    admission_number: str
+    admission_year: int
+    status: str
+    created_at: Optional[str]
+
+    class Config:
+        from_attributes = True
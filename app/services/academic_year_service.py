@@ -1,10 +1,27 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from bisect import bisect_right
+from datetime import date, datetime
+
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, select, insert, update, and_, or_, literal
+from app.core.cache import cache
+from app.core.database import unit_of_work
+from app.core.tracing import traced
 from app.models.academic_year import AcademicYear
 from app.models.college import College
-from datetime import datetime
+from app.models.course import Course
+from app.models.semester import Semester
+from app.models.subject import Subject
+from app.core.jobs import job_handler
+from app.services.curriculum_service import invalidate_curriculum
+
+ACADEMIC_YEARS_NAMESPACE = "academic_years"
+
+
+def invalidate_academic_years():
+    cache.bump(ACADEMIC_YEARS_NAMESPACE)
 
 
+@traced
 def get_academic_years(db: Session, college_id: int):
     q = db.query(AcademicYear).filter(AcademicYear.college_id == college_id, AcademicYear.status == 1).all()
     result = []
@@ -23,9 +40,86 @@ def get_academic_years(db: Session, college_id: int):
     return result
 
 
+def _year_index(db: Session, college_id: int):
+    """
+    Cached per-college lookup structure: the current year plus the active
+    years sorted by start_date, with a running max of end_date so a date
+    lookup can bisect and only walk back over overlapping ranges.
+    """
+    return cache.get_or_compute(ACADEMIC_YEARS_NAMESPACE, college_id, lambda: _build_year_index(db, college_id))
+
+
+def _build_year_index(db: Session, college_id: int):
+    rows = (
+        db.query(
+            AcademicYear.academic_year_id,
+            AcademicYear.college_id,
+            AcademicYear.year_code,
+            AcademicYear.start_date,
+            AcademicYear.end_date,
+            AcademicYear.is_current,
+            AcademicYear.status,
+            AcademicYear.created_at,
+            College.college_name,
+        )
+        .outerjoin(College, College.college_id == AcademicYear.college_id)
+        .filter(AcademicYear.college_id == college_id, AcademicYear.status == 1)
+        .all()
+    )
+    years = []
+    current = None
+    for a in rows:
+        item = {
+            "academic_year_id": a.academic_year_id,
+            "college_id": a.college_id,
+            "college_name": a.college_name,
+            "year_code": a.year_code,
+            "start_date": a.start_date.isoformat() if a.start_date else None,
+            "end_date": a.end_date.isoformat() if a.end_date else None,
+            "is_current": int(a.is_current),
+            "status": "active" if a.status == 1 else "inactive",
+            "created_at": a.created_at.isoformat() if a.created_at else None,
+        }
+        if a.is_current == 1:
+            current = item
+        if a.start_date and a.end_date:
+            years.append((a.start_date, a.end_date, item))
+
+    years.sort(key=lambda y: y[0])
+    max_ends = []
+    for _, end, _ in years:
+        max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+    return {
+        "current": current,
+        "starts": [y[0] for y in years],
+        "ends": [y[1] for y in years],
+        "max_ends": max_ends,
+        "years": [y[2] for y in years],
+    }
+
+
+@traced
+def get_current_academic_year(db: Session, college_id: int):
+    return _year_index(db, college_id)["current"]
+
+
+@traced
+def get_academic_year_for_date(db: Session, college_id: int, on_date: date):
+    """Active academic year whose start_date..end_date range contains on_date (latest start wins)"""
+    index = _year_index(db, college_id)
+    i = bisect_right(index["starts"], on_date) - 1
+    while i >= 0 and index["max_ends"][i] >= on_date:
+        if index["ends"][i] >= on_date:
+            return index["years"][i]
+        i -= 1
+    return None
+
+
+@traced
 def create_academic_year(db: Session, data):
     # prevent duplicate year_code per college
-    exists = db.query(AcademicYear).filter(AcademicYear.college_id == data.college_id, func.lower(AcademicYear.year_code) == data.year_code.lower(), AcademicYear.status == 1).first()
+    exists = db.query(AcademicYear.academic_year_id).filter(AcademicYear.college_id == data.college_id, func.lower(AcademicYear.year_code) == data.year_code.lower(), AcademicYear.status == 1).first()
     if exists:
         return {"error": "Academic year code already exists for this college"}
 
@@ -45,9 +139,9 @@ def create_academic_year(db: Session, data):
         status=1 if data.status == "active" else 0,
         is_current=0,
     )
-    db.add(ay)
-    db.commit()
-    db.refresh(ay)
+    with unit_of_work(db):
+        db.add(ay)
+    invalidate_academic_years()
 
     return {
         "academic_year_id": ay.academic_year_id,
@@ -61,6 +155,7 @@ def create_academic_year(db: Session, data):
     }
 
 
+@traced
 def update_academic_year(db: Session, academic_year_id: int, data):
     ay = db.query(AcademicYear).filter(AcademicYear.academic_year_id == academic_year_id).first()
     if not ay:
@@ -80,6 +175,7 @@ def update_academic_year(db: Session, academic_year_id: int, data):
         ay.end_date = data.end_date
     ay.status = 1 if data.status == "active" else 0
     db.commit()
+    invalidate_academic_years()
 
     return {
         "academic_year_id": ay.academic_year_id,
@@ -93,27 +189,36 @@ def update_academic_year(db: Session, academic_year_id: int, data):
     }
 
 
+@traced
 def toggle_academic_year_status(db: Session, academic_year_id: int):
     ay = db.query(AcademicYear).filter(AcademicYear.academic_year_id == academic_year_id).first()
     if not ay:
         return None
     ay.status = 0 if ay.status == 1 else 1
     db.commit()
+    invalidate_academic_years()
     return {"message": "Status updated", "status": "active" if ay.status == 1 else "inactive"}
 
 
+def _mark_current(db: Session, ay: AcademicYear):
+    # set other years of same college to is_current = 0
+    db.query(AcademicYear).filter(AcademicYear.college_id == ay.college_id).update({"is_current": 0})
+    ay.is_current = 1
+
+
+@traced
 def set_current_academic_year(db: Session, academic_year_id: int):
     ay = db.query(AcademicYear).filter(AcademicYear.academic_year_id == academic_year_id).first()
     if not ay:
         return {"error": "Academic year not found"}
 
-    # set other years of same college to is_current = 0
-    db.query(AcademicYear).filter(AcademicYear.college_id == ay.college_id).update({"is_current": 0})
-    ay.is_current = 1
+    _mark_current(db, ay)
     db.commit()
+    invalidate_academic_years()
     return {"message": "Set as current"}
 
 
+@traced
 def delete_academic_year(db: Session, academic_year_id: int):
     ay = db.query(AcademicYear).filter(AcademicYear.academic_year_id == academic_year_id).first()
     if not ay:
@@ -121,4 +226,197 @@ def delete_academic_year(db: Session, academic_year_id: int):
     # soft delete
     ay.status = 0
     db.commit()
+    invalidate_academic_years()
     return True
+
+
+# ======================
+# ROLLOVER
+# ======================
+def _clone_map(db: Session, name: str, inserted: int, sources, clones):
+    """
+    old_id -> new_id of the `inserted` rows one INSERT ... SELECT cloned:
+    sources and clones, both selecting (id, key), are paired by their rank
+    in id order. Raises, so the rollover rolls back, if the clones are not
+    exactly the inserted rows with their sources' keys, e.g. someone else
+    inserted above the watermark meanwhile.
+    """
+    old = sources.add_columns(func.row_number().over(order_by=sources.selected_columns[0]).label("rank")).subquery()
+    new = clones.add_columns(func.row_number().over(order_by=clones.selected_columns[0]).label("rank")).subquery()
+    (old_id, old_key), (new_id, new_key) = list(old.c)[:2], list(new.c)[:2]
+    pairs = old.outerjoin(new, new.c.rank == old.c.rank)
+    mismatched, cloned = db.execute(select(
+        select(func.count()).select_from(pairs).where(or_(new_id.is_(None), new_key != old_key)).scalar_subquery(),
+        select(func.count()).select_from(new).scalar_subquery(),
+    )).one()
+    if mismatched or cloned != inserted:
+        raise RuntimeError(f"Cloned {name} do not match their source rows, were {name} added during the rollover?")
+    return select(old_id.label("old_id"), new_id.label("new_id")).join(new, new.c.rank == old.c.rank).subquery()
+
+
+@traced
+def rollover_academic_year(db: Session, academic_year_id: int, dry_run: bool = False):
+    """
+    Start a new academic year for its college: clone the active curriculum
+    (courses -> semesters -> subjects) as fresh rows, retire the previous
+    rows (status = 0) and make the year current, all in one transaction.
+
+    Each level is cloned with a single INSERT ... SELECT in id order, and
+    the clones are told apart from the source rows by the largest id before
+    the rollover (the watermark). A clone is matched to its source row by
+    rank, the n-th source row to the n-th row inserted above the watermark,
+    so two courses sharing a code are cloned once each. With `dry_run`
+    nothing is written and only the diff is returned.
+    """
+    ay = db.query(AcademicYear).filter(AcademicYear.academic_year_id == academic_year_id).first()
+    if not ay:
+        return {"error": "Academic year not found"}
+    if ay.status != 1:
+        return {"error": "Academic year is inactive"}
+    college_id = ay.college_id
+
+    current = (
+        db.query(AcademicYear.academic_year_id, AcademicYear.year_code)
+        .filter(AcademicYear.college_id == college_id, AcademicYear.is_current == 1)
+        .first()
+    )
+    if current and current.academic_year_id == ay.academic_year_id:
+        return {"error": "Academic year is already current"}
+
+    # source rows: the active curriculum of the college
+    old_course = aliased(Course)
+    old_semester = aliased(Semester)
+    source_courses = select(old_course.course_id).where(old_course.college_id == college_id, old_course.status == 1)
+    source_semesters = (
+        select(old_semester.semester_id)
+        .join(old_course, old_course.course_id == old_semester.course_id)
+        .where(old_course.college_id == college_id, old_course.status == 1, old_semester.status == 1)
+    )
+    source_subjects = (
+        select(Subject.subject_id)
+        .join(old_semester, old_semester.semester_id == Subject.semester_id)
+        .join(old_course, old_course.course_id == old_semester.course_id)
+        .where(
+            Subject.college_id == college_id, Subject.status == 1,
+            old_course.status == 1, old_semester.status == 1,
+        )
+    )
+
+    count = lambda q: db.execute(select(func.count()).select_from(q.subquery())).scalar()
+    diff = {
+        "academic_year_id": ay.academic_year_id,
+        "college_id": college_id,
+        "current_year": {
+            "from": current.year_code if current else None,
+            "to": ay.year_code,
+        },
+        "courses": count(source_courses),
+        "semesters": count(source_semesters),
+        "subjects": count(source_subjects),
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        return diff
+
+    try:
+        max_course = db.query(func.coalesce(func.max(Course.course_id), 0)).scalar()
+        max_semester = db.query(func.coalesce(func.max(Semester.semester_id), 0)).scalar()
+        max_subject = db.query(func.coalesce(func.max(Subject.subject_id), 0)).scalar()
+
+        # 1. courses
+        cloned_courses = and_(old_course.college_id == college_id, old_course.status == 1, old_course.course_id <= max_course)
+        inserted = db.execute(
+            insert(Course).from_select(
+                ["college_id", "education_type_id", "course_code", "course_name", "duration_years", "total_semesters", "intake_capacity", "status"],
+                select(
+                    old_course.college_id, old_course.education_type_id, old_course.course_code, old_course.course_name,
+                    old_course.duration_years, old_course.total_semesters, old_course.intake_capacity, literal(1),
+                ).where(cloned_courses).order_by(old_course.course_id)
+            )
+        ).rowcount
+        course_map = _clone_map(
+            db, "courses", inserted,
+            select(old_course.course_id, old_course.course_code).where(cloned_courses),
+            select(Course.course_id, Course.course_code).where(Course.college_id == college_id, Course.course_id > max_course),
+        )
+
+        # 2. semesters, re-parented to their course's clone
+        cloned_semesters = and_(
+            cloned_courses, old_semester.status == 1, old_semester.semester_id <= max_semester,
+        )
+        inserted = db.execute(
+            insert(Semester).from_select(
+                ["course_id", "semester_number", "semester_name", "status"],
+                select(course_map.c.new_id, old_semester.semester_number, old_semester.semester_name, literal(1))
+                .join(old_course, old_course.course_id == old_semester.course_id)
+                .join(course_map, course_map.c.old_id == old_course.course_id)
+                .where(cloned_semesters)
+                .order_by(old_semester.semester_id)
+            )
+        ).rowcount
+        semester_map = _clone_map(
+            db, "semesters", inserted,
+            select(old_semester.semester_id, old_semester.semester_number)
+            .join(old_course, old_course.course_id == old_semester.course_id)
+            .where(cloned_semesters),
+            select(Semester.semester_id, Semester.semester_number)
+            .join(Course, Course.course_id == Semester.course_id)
+            .where(Course.college_id == college_id, Course.course_id > max_course, Semester.semester_id > max_semester),
+        )
+
+        # 3. subjects, re-parented to the clones of their course and semester
+        db.execute(
+            insert(Subject).from_select(
+                ["college_id", "course_id", "semester_id", "subject_code", "subject_name", "subject_type", "credits", "status"],
+                select(
+                    Subject.college_id, course_map.c.new_id, semester_map.c.new_id, Subject.subject_code,
+                    Subject.subject_name, Subject.subject_type, Subject.credits, literal(1),
+                )
+                .join(old_semester, old_semester.semester_id == Subject.semester_id)
+                .join(old_course, old_course.course_id == old_semester.course_id)
+                .join(course_map, course_map.c.old_id == old_course.course_id)
+                .join(semester_map, semester_map.c.old_id == old_semester.semester_id)
+                .where(cloned_semesters, Subject.college_id == college_id, Subject.status == 1, Subject.subject_id <= max_subject)
+                .order_by(Subject.subject_id)
+            )
+        )
+
+        # 4. retire last year's rows
+        db.execute(
+            update(Subject)
+            .where(Subject.college_id == college_id, Subject.status == 1, Subject.subject_id <= max_subject)
+            .values(status=0)
+        )
+        db.execute(
+            update(Semester)
+            .where(Semester.course_id.in_(select(Course.course_id).where(Course.college_id == college_id, Course.course_id <= max_course)),
+                   Semester.status == 1, Semester.semester_id <= max_semester)
+            .values(status=0)
+        )
+        db.execute(
+            update(Course)
+            .where(Course.college_id == college_id, Course.status == 1, Course.course_id <= max_course)
+            .values(status=0)
+        )
+
+        _mark_current(db, ay)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    invalidate_curriculum()
+    invalidate_academic_years()
+    return {**diff, "message": "Rollover completed"}
+
+
+@job_handler("academic_years.rollover")
+def run_rollover(ctx, params):
+    db = ctx.session()
+    try:
+        res = rollover_academic_year(db, params["academic_year_id"], params.get("dry_run", False))
+    finally:
+        db.close()
+    if res.get("error"):
+        raise ValueError(res["error"])
+    return res
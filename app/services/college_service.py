@@ -1,7 +1,22 @@
 from sqlalchemy.orm import Session
+from app.core.sharding import replicate_reference_tables
+from app.core.tracing import traced
 from app.models.college import College
 from app.schemas.college import CollegeCreate
+from app.services.academic_year_service import invalidate_academic_years
+from app.services.curriculum_service import invalidate_curriculum
+from app.services.faculty_service import invalidate_faculty
 
+
+def invalidate_college(college_id: int):
+    """Call after any committed write to a college; its name and status are part of other cached data"""
+    invalidate_curriculum()
+    invalidate_academic_years()
+    invalidate_faculty()
+    # shards keep a copy of tbl_colleges for their joins
+    replicate_reference_tables(("tbl_colleges",), ids=[college_id])
+
+@traced
 def create_college(db: Session, data: CollegeCreate):
     exists = db.query(College).filter(
         College.college_code == data.college_code
@@ -14,15 +29,19 @@ def create_college(db: Session, data: CollegeCreate):
     db.add(college)
     db.commit()
     db.refresh(college)
+    invalidate_college(college.college_id)
     return college
 
+@traced
 def get_colleges(db: Session):
     return db.query(College).filter(College.status == 1).all()
 
+@traced
 def update_college_status(db: Session, college_id: int, status: int):
     college = db.query(College).filter(College.college_id == college_id).first()
     if not college:
         return None
     college.status = status
     db.commit()
+    invalidate_college(college_id)
     return college
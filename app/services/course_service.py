@@ -1,8 +1,16 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from app.core.cache import coalesce
+from app.core.database import unit_of_work
+from app.core.tracing import traced
+from app.models.college import College
 from app.models.course import Course
+from app.models.education_type import EducationType
+from app.services.curriculum_service import CURRICULUM_NAMESPACE, invalidate_curriculum
 
 
+@traced
+@coalesce(CURRICULUM_NAMESPACE)
 def get_courses(db: Session, college_id: int):
     q = db.query(Course).filter(Course.college_id == college_id).all()
     result = []
@@ -24,9 +32,19 @@ def get_courses(db: Session, college_id: int):
     return result
 
 
+@traced
 def create_course(db: Session, data):
-    # prevent duplicate course_code per college (case-insensitive)
-    exists = db.query(Course).filter(Course.college_id == data.college_id, func.lower(Course.course_code) == data.course_code.lower(), Course.status == 1).first()
+    # parent names for the response and the duplicate check (case-insensitive) in one query
+    duplicate = db.query(Course.course_id).filter(Course.college_id == data.college_id, func.lower(Course.course_code) == data.course_code.lower(), Course.status == 1).exists()
+    college_name, education_type_name, exists = db.query(
+        db.query(College.college_name).filter(College.college_id == data.college_id).scalar_subquery(),
+        db.query(EducationType.type_name).filter(EducationType.education_type_id == data.education_type_id).scalar_subquery(),
+        duplicate,
+    ).one()
+    if college_name is None:
+        return {"error": "College not found"}
+    if education_type_name is None:
+        return {"error": "Education type not found"}
     if exists:
         return {"error": "Course code already exists for this college"}
 
@@ -40,9 +58,9 @@ def create_course(db: Session, data):
         intake_capacity=data.intake_capacity,
         status=1 if data.status == "active" else 0,
     )
-    db.add(c)
-    db.commit()
-    db.refresh(c)
+    with unit_of_work(db):
+        db.add(c)
+    invalidate_curriculum()
 
     return {
         "course_id": c.course_id,
@@ -53,13 +71,14 @@ def create_course(db: Session, data):
         "intake_capacity": c.intake_capacity,
         "status": "active" if c.status == 1 else "inactive",
         "college_id": c.college_id,
-        "college_name": c.college.college_name if getattr(c, "college", None) else None,
+        "college_name": college_name,
         "education_type_id": c.education_type_id,
-        "education_type_name": c.education_type.type_name if getattr(c, "education_type", None) else None,
+        "education_type_name": education_type_name,
         "created_at": c.created_at.isoformat() if c.created_at else None,
     }
 
 
+@traced
 def update_course(db: Session, course_id: int, data):
     c = db.query(Course).filter(Course.course_id == course_id).first()
     if not c:
@@ -77,6 +96,7 @@ def update_course(db: Session, course_id: int, data):
     c.intake_capacity = data.intake_capacity
     c.status = 1 if data.status == "active" else 0
     db.commit()
+    invalidate_curriculum()
 
     return {
         "course_id": c.course_id,
@@ -94,19 +114,23 @@ def update_course(db: Session, course_id: int, data):
     }
 
 
+@traced
 def toggle_course_status(db: Session, course_id: int):
     c = db.query(Course).filter(Course.course_id == course_id).first()
     if not c:
         return None
     c.status = 0 if c.status == 1 else 1
     db.commit()
+    invalidate_curriculum()
     return {"message": "Status updated", "status": "active" if c.status == 1 else "inactive"}
 
 
+@traced
 def delete_course(db: Session, course_id: int):
     c = db.query(Course).filter(Course.course_id == course_id).first()
     if not c:
         return False
     c.status = 0
     db.commit()
+    invalidate_curriculum()
     return True
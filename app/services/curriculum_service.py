@@ -0,0 +1,175 @@
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from app.core.cache import cache
+from app.core.jobs import job_handler
+from app.core.tenant import tenant_scope
+from app.core.tracing import traced
+from app.models.college import College
+from app.models.education_type import EducationType
+from app.models.course import Course
+from app.models.semester import Semester
+from app.models.subject import Subject
+
+CURRICULUM_NAMESPACE = "curriculum"
+
+
+def invalidate_curriculum():
+    """Call after any committed write to education types, courses, semesters or subjects"""
+    cache.bump(CURRICULUM_NAMESPACE)
+
+
+@traced
+def get_curriculum_tree(db: Session, college_id: int):
+    """
+    Return the nested education type -> course -> semester -> subject tree
+    for a college. Each level is loaded with a single query batched by the
+    parent ids of the level above and grouped into its parent in one pass.
+    Concurrent misses for the same college build the tree once.
+    """
+    return cache.get_or_compute(CURRICULUM_NAMESPACE, college_id, lambda: _build_curriculum_tree(db, college_id))
+
+
+def _build_curriculum_tree(db: Session, college_id: int):
+    college = (
+        db.query(College.college_id, College.college_name)
+        .filter(College.college_id == college_id)
+        .first()
+    )
+    if not college:
+        return None
+
+    education_types = (
+        db.query(
+            EducationType.education_type_id,
+            EducationType.type_code,
+            EducationType.type_name,
+            EducationType.duration_years,
+            EducationType.status,
+        )
+        .filter(EducationType.college_id == college_id, EducationType.status == 1)
+        .order_by(EducationType.education_type_id)
+        .all()
+    )
+    et_ids = [e.education_type_id for e in education_types]
+
+    courses = []
+    if et_ids:
+        courses = (
+            db.query(
+                Course.course_id,
+                Course.education_type_id,
+                Course.course_code,
+                Course.course_name,
+                Course.duration_years,
+                Course.total_semesters,
+                Course.intake_capacity,
+                Course.status,
+            )
+            .filter(Course.college_id == college_id, Course.education_type_id.in_(et_ids), Course.status == 1)
+            .order_by(Course.course_id)
+            .all()
+        )
+    course_ids = [c.course_id for c in courses]
+
+    semesters = []
+    if course_ids:
+        semesters = (
+            db.query(
+                Semester.semester_id,
+                Semester.course_id,
+                Semester.semester_number,
+                Semester.semester_name,
+                Semester.status,
+            )
+            .filter(Semester.course_id.in_(course_ids), Semester.status == 1)
+            .order_by(Semester.course_id, Semester.semester_number)
+            .all()
+        )
+    semester_ids = [s.semester_id for s in semesters]
+
+    subjects = []
+    if semester_ids:
+        subjects = (
+            db.query(
+                Subject.subject_id,
+                Subject.semester_id,
+                Subject.subject_code,
+                Subject.subject_name,
+                Subject.subject_type,
+                Subject.credits,
+                Subject.status,
+            )
+            .filter(Subject.semester_id.in_(semester_ids), Subject.status == 1)
+            .order_by(Subject.subject_id)
+            .all()
+        )
+
+    # group children by parent id, then attach bottom-up
+    subjects_by_semester = defaultdict(list)
+    for s in subjects:
+        subjects_by_semester[s.semester_id].append({
+            "subject_id": s.subject_id,
+            "subject_code": s.subject_code,
+            "subject_name": s.subject_name,
+            "subject_type": s.subject_type,
+            "credits": float(s.credits) if s.credits is not None else None,
+            "status": "active" if s.status == 1 else "inactive",
+        })
+
+    semesters_by_course = defaultdict(list)
+    for s in semesters:
+        semesters_by_course[s.course_id].append({
+            "semester_id": s.semester_id,
+            "semester_number": int(s.semester_number) if s.semester_number is not None else 0,
+            "semester_name": s.semester_name,
+            "status": "active" if s.status == 1 else "inactive",
+            "subjects": subjects_by_semester.get(s.semester_id, []),
+        })
+
+    courses_by_type = defaultdict(list)
+    for c in courses:
+        courses_by_type[c.education_type_id].append({
+            "course_id": c.course_id,
+            "course_code": c.course_code,
+            "course_name": c.course_name,
+            "duration_years": int(c.duration_years) if c.duration_years is not None else 0,
+            "total_semesters": int(c.total_semesters) if c.total_semesters is not None else 0,
+            "intake_capacity": int(c.intake_capacity) if c.intake_capacity is not None else None,
+            "status": "active" if c.status == 1 else "inactive",
+            "semesters": semesters_by_course.get(c.course_id, []),
+        })
+
+    result = {
+        "college_id": college.college_id,
+        "college_name": college.college_name,
+        "education_types": [
+            {
+                "education_type_id": e.education_type_id,
+                "type_code": e.type_code,
+                "type_name": e.type_name,
+                "duration_years": int(e.duration_years) if e.duration_years is not None else 0,
+                "status": "active" if e.status == 1 else "inactive",
+                "courses": courses_by_type.get(e.education_type_id, []),
+            }
+            for e in education_types
+        ],
+    }
+    return result
+
+
+@job_handler("curriculum.rebuild")
+def run_curriculum_rebuild(ctx, params):
+    """Drop and rebuild the cached curriculum trees, for the given colleges or all active ones"""
+    db = ctx.session()
+    try:
+        college_ids = params.get("college_ids") or [
+            c for (c,) in db.query(College.college_id).filter(College.status == 1).order_by(College.college_id)
+        ]
+        invalidate_curriculum()
+        for i, college_id in enumerate(college_ids, start=1):
+            with tenant_scope(college_id):
+                get_curriculum_tree(db, college_id)
+            ctx.progress(i, len(college_ids))
+    finally:
+        db.close()
+    return {"colleges": len(college_ids)}
@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from app.core.database import unit_of_work
+from app.core.tracing import traced
 from app.models.education_type import EducationType
+from app.services.curriculum_service import invalidate_curriculum
 
 
+@traced
 def get_education_types(db: Session, college_id: int):
     q = db.query(EducationType).filter(EducationType.college_id == college_id, EducationType.status == 1).all()
     result = []
@@ -20,6 +24,7 @@ def get_education_types(db: Session, college_id: int):
     return result
 
 
+@traced
 def create_education_type(db: Session, data):
     exists = db.query(EducationType).filter(EducationType.college_id == data.college_id, func.lower(EducationType.type_code) == data.type_code.lower(), EducationType.status == 1).first()
     if exists:
@@ -32,9 +37,9 @@ def create_education_type(db: Session, data):
         duration_years=data.duration_years,
         status=1 if data.status == "active" else 0,
     )
-    db.add(et)
-    db.commit()
-    db.refresh(et)
+    with unit_of_work(db):
+        db.add(et)
+    invalidate_curriculum()
 
     return {
         "education_type_id": et.education_type_id,
@@ -47,6 +52,7 @@ def create_education_type(db: Session, data):
     }
 
 
+@traced
 def update_education_type(db: Session, education_type_id: int, data):
     et = db.query(EducationType).filter(EducationType.education_type_id == education_type_id).first()
     if not et:
@@ -61,6 +67,7 @@ def update_education_type(db: Session, education_type_id: int, data):
     et.duration_years = data.duration_years
     et.status = 1 if data.status == "active" else 0
     db.commit()
+    invalidate_curriculum()
 
     return {
         "education_type_id": et.education_type_id,
@@ -73,19 +80,23 @@ def update_education_type(db: Session, education_type_id: int, data):
     }
 
 
+@traced
 def toggle_education_type_status(db: Session, education_type_id: int):
     et = db.query(EducationType).filter(EducationType.education_type_id == education_type_id).first()
     if not et:
         return None
     et.status = 0 if et.status == 1 else 1
     db.commit()
+    invalidate_curriculum()
     return {"message": "Status updated", "status": "active" if et.status == 1 else "inactive"}
 
 
+@traced
 def delete_education_type(db: Session, education_type_id: int):
     et = db.query(EducationType).filter(EducationType.education_type_id == education_type_id).first()
     if not et:
         return False
     et.status = 0
     db.commit()
+    invalidate_curriculum()
     return True
@@ -3,6 +3,9 @@ from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from typing import Optional, List
 
+from app.core.cache import cache, coalesce
+from app.core.database import unit_of_work
+from app.core.tracing import traced
 from app.models.faculty import Faculty
 from app.models.user import User
 from app.models.college import College
@@ -10,9 +13,19 @@ from app.models.user_role import UserRole
 from app.models.role import Role
 from app.schemas.faculty_schema import FacultyCreate, FacultyUpdate
 
+FACULTY_NAMESPACE = "faculty"
+
+
+def invalidate_faculty():
+    """Call after any committed write to faculty or to the users they list"""
+    cache.bump(FACULTY_NAMESPACE)
+
+
 class FacultyService:
 
     @staticmethod
+    @traced
+    @coalesce(FACULTY_NAMESPACE)
     def get_all_faculty(db: Session, college_id: Optional[int] = None):
         query = db.query(Faculty).options(
             joinedload(Faculty.user),
@@ -43,6 +56,7 @@ class FacultyService:
         ]
 
     @staticmethod
+    @traced
     def get_faculty(db: Session, faculty_id: int):
         faculty = db.query(Faculty).options(
             joinedload(Faculty.user),
@@ -55,7 +69,7 @@ class FacultyService:
         return {
             "faculty_id": faculty.faculty_id,
             "user_id": faculty.user_id,
-            "full_name": faculty.user.full_name,
+            "full_name": faculty.user.username,
             "email": faculty.user.email,
             "phone": faculty.user.phone,
             "employee_code": faculty.employee_code,
@@ -68,41 +82,68 @@ class FacultyService:
         }
 
     @staticmethod
+    @traced
     def create_faculty(db: Session, data: FacultyCreate):
-        user = db.query(User).filter(User.user_id == data.user_id).first()
-        if not user:
+        # user, primary role, college and both duplicate checks in one query
+        primary_role_id = (
+            db.query(UserRole.role_id)
+            .filter(UserRole.user_id == data.user_id, UserRole.status == 1)
+            .order_by(UserRole.role_id)
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        row = db.query(
+            User.username,
+            User.email,
+            User.phone,
+            primary_role_id.label("role_id"),
+            db.query(Role.role_name).filter(Role.role_id == primary_role_id).scalar_subquery().label("role_name"),
+            db.query(College.college_name).filter(College.college_id == data.college_id).scalar_subquery().label("college_name"),
+            db.query(Faculty.faculty_id).filter(Faculty.user_id == data.user_id).exists().label("user_taken"),
+            db.query(Faculty.faculty_id).filter(Faculty.employee_code == data.employee_code).exists().label("code_taken"),
+        ).filter(User.user_id == data.user_id).first()
+        if row is None:
             raise HTTPException(400, "Invalid user")
         # Ensure user has role Teacher or HOD
-        ur = db.query(UserRole).filter(UserRole.user_id == user.user_id, UserRole.status == 1).order_by(UserRole.role_id).first()
-        if not ur:
+        if row.role_id is None:
             raise HTTPException(400, "User has no active role")
-        role = db.query(Role).filter(Role.role_id == ur.role_id).first()
-        if not role or role.role_name not in ("Teacher", "HOD"):
+        if row.role_name not in ("Teacher", "HOD"):
             raise HTTPException(400, "User must have role Teacher or HOD")
-
-        college = db.query(College).filter(College.college_id == data.college_id).first()
-        if not college:
+        if row.college_name is None:
             raise HTTPException(404, "College not found")
-
-        if db.query(Faculty).filter(Faculty.user_id == data.user_id).first():
+        if row.user_taken:
             raise HTTPException(400, "User already assigned as faculty")
-
-        if db.query(Faculty).filter(Faculty.employee_code == data.employee_code).first():
+        if row.code_taken:
             raise HTTPException(400, "Employee code already exists")
 
         faculty = Faculty(**data.dict())
 
         try:
-            db.add(faculty)
-            db.commit()
-            db.refresh(faculty)
+            with unit_of_work(db):
+                db.add(faculty)
         except IntegrityError:
-            db.rollback()
             raise HTTPException(400, "Database error")
+        invalidate_faculty()
 
-        return FacultyService.get_faculty(db, faculty.faculty_id)
+        # user and college were loaded by the checks above, no need to re-query
+        return {
+            "faculty_id": faculty.faculty_id,
+            "user_id": faculty.user_id,
+            "full_name": row.username,
+            "email": row.email,
+            "phone": row.phone,
+            "employee_code": faculty.employee_code,
+            "designation": faculty.designation,
+            "college_id": faculty.college_id,
+            "college_name": row.college_name,
+            "status": faculty.status,
+            "created_at": faculty.created_at.isoformat() if faculty.created_at else None,
+            "id": faculty.faculty_id
+        }
 
     @staticmethod
+    @traced
     def update_faculty(db: Session, faculty_id: int, data: FacultyUpdate):
         faculty = db.query(Faculty).filter(Faculty.faculty_id == faculty_id).first()
         if not faculty:
@@ -130,10 +171,12 @@ class FacultyService:
         except IntegrityError:
             db.rollback()
             raise HTTPException(400, "Database error")
+        invalidate_faculty()
 
         return FacultyService.get_faculty(db, faculty_id)
 
     @staticmethod
+    @traced
     def delete_faculty(db: Session, faculty_id: int):
         faculty = db.query(Faculty).filter(Faculty.faculty_id == faculty_id).first()
         if not faculty:
@@ -141,4 +184,5 @@ class FacultyService:
 
         faculty.status = 0
         db.commit()
+        invalidate_faculty()
         return {"message": "Faculty deactivated successfully"}
@@ -0,0 +1,94 @@
+import json
+from sqlalchemy.orm import Session
+from app.core.database import unit_of_work
+from app.core.jobs import job_pool, registered_job_types, live_progress
+from app.core.tracing import traced
+from app.models.job import Job
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _to_dict(job: Job):
+    total = job.progress_total
+    current = job.progress_current or 0
+    live = live_progress(job.job_id) if job.status == "running" else None
+    if live:
+        current, total = live
+    return {
+        "job_id": job.job_id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "progress_current": current,
+        "progress_total": total,
+        "percent": round(current * 100 / total, 1) if total else None,
+        "cancel_requested": bool(job.cancel_requested),
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+@traced
+def submit_job(db: Session, job_type: str, params: dict, created_by: int = None):
+    if job_type not in registered_job_types():
+        return {"error": f"Unknown job type '{job_type}'"}
+
+    job = Job(
+        job_type=job_type,
+        status="queued",
+        params=json.dumps(params, default=str),
+        progress_current=0,
+        cancel_requested=0,
+        created_by=created_by,
+    )
+    with unit_of_work(db):
+        db.add(job)
+    job_pool.notify()
+    return _to_dict(job)
+
+
+@traced
+def get_job(db: Session, job_id: int):
+    job = db.query(Job).filter(Job.job_id == job_id).first()
+    return _to_dict(job) if job else None
+
+
+@traced
+def get_jobs(db: Session, status: str = None, job_type: str = None, limit: int = 50):
+    q = db.query(Job)
+    if status:
+        q = q.filter(Job.status == status)
+    if job_type:
+        q = q.filter(Job.job_type == job_type)
+    # list without the potentially large params/result payloads
+    return [
+        {**_to_dict(j), "result": None}
+        for j in q.order_by(Job.job_id.desc()).limit(limit).all()
+    ]
+
+
+@traced
+def cancel_job(db: Session, job_id: int):
+    job = db.query(Job).filter(Job.job_id == job_id).first()
+    if not job:
+        return None
+    if job.status in FINISHED_STATUSES:
+        return {"error": f"Job already {job.status}"}
+
+    # the status may change between the read above and these updates (a
+    # worker claims the job), so neither filters on the status read: the
+    # request is recorded for any unfinished job, running ones stop at their
+    # next progress update, and a job still queued is cancelled right away
+    requested = db.query(Job).filter(Job.job_id == job_id, Job.status.notin_(FINISHED_STATUSES)).update(
+        {"cancel_requested": 1}, synchronize_session=False
+    )
+    db.query(Job).filter(Job.job_id == job_id, Job.status == "queued").update(
+        {"status": "cancelled"}, synchronize_session=False
+    )
+    db.commit()
+    if not requested:
+        job = db.query(Job.status).filter(Job.job_id == job_id).first()
+        return {"error": f"Job already {job.status}"} if job else None
+    return get_job(db, job_id)
@@ -1,11 +1,107 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
 from sqlalchemy.orm import Session
+from app.core.cache import cache
+from app.core.tracing import traced
 from app.models.permission import Permission
 
+PERMISSIONS_NAMESPACE = "permissions"
+
+
+@dataclass(frozen=True)
+class PermissionEntry:
+	permission_id: int
+	permission_code: str
+	module: Optional[str]
+	status: int
+
+
+@dataclass(frozen=True)
+class PermissionCatalog:
+	"""
+	Immutable snapshot of tbl_permissions. A refresh builds a new catalog
+	and swaps it in, so readers never see a half-built one and need no lock.
+	"""
+	version: int
+	entries: Tuple[PermissionEntry, ...]
+	active: Tuple[PermissionEntry, ...]
+	# permission_code -> PermissionEntry, every status
+	by_code: Mapping[str, PermissionEntry]
+	# permission_code -> permission_id, every status
+	ids: Mapping[str, int]
+	# permission_id -> permission_code, None for unused ids
+	codes: Tuple[Optional[str], ...]
+
+	def code(self, permission_id: int) -> Optional[str]:
+		return self.codes[permission_id] if 0 <= permission_id < len(self.codes) else None
+
+	def active_code(self, permission_id: int) -> Optional[str]:
+		code = self.code(permission_id)
+		return code if code is not None and self.by_code[code].status == 1 else None
+
+
+_catalog: Optional[PermissionCatalog] = None
+_catalog_lock = threading.Lock()
 
+
+def invalidate_permissions():
+	"""Call after a committed write to tbl_permissions; the catalog is rebuilt on next use"""
+	cache.bump(PERMISSIONS_NAMESPACE)
+
+
+def load_permission_catalog(db: Session) -> PermissionCatalog:
+	"""Read tbl_permissions into a new catalog and make it current (startup, refresh)"""
+	global _catalog
+	# read first, so a write committed during the query leaves the catalog stale
+	version = cache.version(PERMISSIONS_NAMESPACE)
+	entries = tuple(
+		PermissionEntry(p.permission_id, p.permission_code, p.module, p.status)
+		for p in db.query(
+			Permission.permission_id, Permission.permission_code, Permission.module, Permission.status
+		).order_by(Permission.permission_id)
+	)
+	codes = [None] * (max((e.permission_id for e in entries), default=-1) + 1)
+	for e in entries:
+		codes[e.permission_id] = e.permission_code
+	catalog = PermissionCatalog(
+		version=version,
+		entries=entries,
+		active=tuple(e for e in entries if e.status == 1),
+		by_code=MappingProxyType({e.permission_code: e for e in entries}),
+		ids=MappingProxyType({e.permission_code: e.permission_id for e in entries}),
+		codes=tuple(codes),
+	)
+	_catalog = catalog
+	return catalog
+
+
+def get_permission_catalog(db: Session) -> PermissionCatalog:
+	"""The current catalog; only loaded when missing or its namespace was bumped (here or by another worker)"""
+	catalog = _catalog
+	if catalog is not None and catalog.version == cache.version(PERMISSIONS_NAMESPACE):
+		return catalog
+	with _catalog_lock:
+		catalog = _catalog
+		if catalog is None or catalog.version != cache.version(PERMISSIONS_NAMESPACE):
+			catalog = load_permission_catalog(db)
+	return catalog
+
+
+@traced
 def get_permissions(db: Session):
-	"""Return active permissions as a list of Permission ORM objects."""
-	return db.query(Permission).filter(Permission.status == 1).all()
+	"""Return active permissions, from the catalog."""
+	return list(get_permission_catalog(db).active)
 
 
+@traced
 def get_permission_by_code(db: Session, code: str):
-	return db.query(Permission).filter(Permission.permission_code == code).first()
+	return get_permission_catalog(db).by_code.get(code)
+
+
+@traced
+def get_permission_code_map(db: Session):
+	"""Return the read-only {permission_code: permission_id} map of all permissions."""
+	return get_permission_catalog(db).ids
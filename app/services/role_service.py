@@ -1,41 +1,57 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, update
+from app.core.cache import cache, coalesce
+from app.core.database import unit_of_work
+from app.core.tracing import traced
 from app.models.role import Role
-from app.models.permission import Permission
 from app.models.role_permission import RolePermission
 from app.models.user_role import UserRole
+from app.services.permission_service import get_permission_catalog
 
+ROLES_NAMESPACE = "roles"
+
+
+def invalidate_roles():
+    """Call after any committed write to roles, their permissions or user role assignments"""
+    cache.bump(ROLES_NAMESPACE)
+
+
+@traced
+@coalesce(ROLES_NAMESPACE)
 def get_roles_with_permissions(db: Session, college_id: int):
     roles = db.query(Role).filter(Role.college_id == college_id).all()
-    result = []
-
-    for role in roles:
-        permissions = (
-            db.query(Permission.permission_code)
-            .join(RolePermission, Permission.permission_id == RolePermission.permission_id)
-            .filter(
-                RolePermission.role_id == role.role_id,
-                RolePermission.status == 1
-            )
-            .all()
-        )
+    catalog = get_permission_catalog(db)
+    role_ids = [role.role_id for role in roles]
 
-        users_count = (
-            db.query(UserRole)
-            .filter(UserRole.role_id == role.role_id, UserRole.status == 1)
-            .count()
+    # permissions and user counts of all listed roles, one query each
+    permission_ids = {role_id: [] for role_id in role_ids}
+    users_count = {}
+    if role_ids:
+        for role_id, pid in (
+            db.query(RolePermission.role_id, RolePermission.permission_id)
+            .filter(RolePermission.role_id.in_(role_ids), RolePermission.status == 1)
+        ):
+            permission_ids[role_id].append(pid)
+        users_count = dict(
+            db.query(UserRole.role_id, func.count())
+            .filter(UserRole.role_id.in_(role_ids), UserRole.status == 1)
+            .group_by(UserRole.role_id)
+            .all()
         )
 
-        result.append({
+    return [
+        {
             "id": role.role_id,
             "name": role.role_name,
             "description": role.description,
-            "usersCount": users_count,
-            "permissions": [p[0] for p in permissions]
-        })
-
-    return result
+            "usersCount": users_count.get(role.role_id, 0),
+            "permissions": [code for pid in permission_ids[role.role_id] if (code := catalog.code(pid))],
+        }
+        for role in roles
+    ]
 
 
+@traced
 def create_role(db: Session, college_id: int, name: str, description: str = None):
     role = Role(
         college_id=college_id,
@@ -43,7 +59,68 @@ def create_role(db: Session, college_id: int, name: str, description: str = None
         role_name=name,
         description=description
     )
-    db.add(role)
-    db.commit()
-    db.refresh(role)
+    with unit_of_work(db):
+        db.add(role)
+    invalidate_roles()
     return role
+
+
+@traced
+def set_role_permissions(db: Session, role_id: int, permission_codes):
+    """
+    Replace the permissions of a role with the given set of codes.
+    Only the difference against the current tbl_role_permissions rows is
+    written, with one bulk statement per kind of change in one transaction.
+    """
+    role = db.query(Role.role_id).filter(Role.role_id == role_id).first()
+    if not role:
+        return None
+
+    catalog = get_permission_catalog(db)
+    # inactive permissions cannot be granted, they are reported as unknown
+    unknown = sorted(
+        code for code in set(permission_codes)
+        if code not in catalog.by_code or catalog.by_code[code].status != 1
+    )
+    if unknown:
+        return {"error": f"Unknown permission codes: {', '.join(unknown)}"}
+
+    desired = {catalog.ids[code] for code in permission_codes}
+    current = dict(
+        db.query(RolePermission.permission_id, RolePermission.status)
+        .filter(RolePermission.role_id == role_id)
+        .all()
+    )
+
+    to_add = desired - current.keys()
+    to_enable = {pid for pid in desired & current.keys() if current[pid] != 1}
+    to_remove = current.keys() - desired
+
+    try:
+        if to_remove:
+            db.execute(
+                delete(RolePermission)
+                .where(RolePermission.role_id == role_id, RolePermission.permission_id.in_(to_remove))
+            )
+        if to_enable:
+            db.execute(
+                update(RolePermission)
+                .where(RolePermission.role_id == role_id, RolePermission.permission_id.in_(to_enable))
+                .values(status=1)
+            )
+        if to_add:
+            db.execute(insert(RolePermission), [
+                {"role_id": role_id, "permission_id": pid, "status": 1} for pid in to_add
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_roles()
+
+    return {
+        "message": "Permissions updated",
+        "added": sorted(catalog.code(pid) for pid in to_add | to_enable),
+        "removed": sorted(catalog.code(pid) or str(pid) for pid in to_remove),
+        "permissions": sorted(set(permission_codes)),
+    }
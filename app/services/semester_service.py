@@ -1,8 +1,13 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from app.core.database import unit_of_work
+from app.core.tracing import traced
+from app.models.course import Course
 from app.models.semester import Semester
+from app.services.curriculum_service import invalidate_curriculum
 
 
+@traced
 def get_semesters(db: Session, course_id: int):
     q = db.query(Semester).filter(Semester.course_id == course_id, Semester.status == 1).all()
     result = []
@@ -19,9 +24,14 @@ def get_semesters(db: Session, course_id: int):
     return result
 
 
+@traced
 def create_semester(db: Session, data):
-    # prevent duplicate semester_number per course
-    exists = db.query(Semester).filter(Semester.course_id == data.course_id, Semester.semester_number == data.semester_number, Semester.status == 1).first()
+    # course name for the response and the duplicate semester_number check in one query
+    duplicate = db.query(Semester.semester_id).filter(Semester.course_id == data.course_id, Semester.semester_number == data.semester_number, Semester.status == 1).exists()
+    parent = db.query(Course.course_name, duplicate).filter(Course.course_id == data.course_id).first()
+    if not parent:
+        return {"error": "Course not found"}
+    course_name, exists = parent
     if exists:
         return {"error": "Semester number already exists for this course"}
 
@@ -31,9 +41,9 @@ def create_semester(db: Session, data):
         semester_name=data.semester_name,
         status=1 if data.status == "active" else 0,
     )
-    db.add(s)
-    db.commit()
-    db.refresh(s)
+    with unit_of_work(db):
+        db.add(s)
+    invalidate_curriculum()
 
     return {
         "semester_id": s.semester_id,
@@ -41,11 +51,12 @@ def create_semester(db: Session, data):
         "semester_name": s.semester_name,
         "status": "active" if s.status == 1 else "inactive",
         "course_id": s.course_id,
-        "course_name": s.course.course_name if getattr(s, "course", None) else None,
+        "course_name": course_name,
         "created_at": s.created_at.isoformat() if s.created_at else None,
     }
 
 
+@traced
 def update_semester(db: Session, semester_id: int, data):
     s = db.query(Semester).filter(Semester.semester_id == semester_id).first()
     if not s:
@@ -59,6 +70,7 @@ def update_semester(db: Session, semester_id: int, data):
     s.semester_name = data.semester_name
     s.status = 1 if data.status == "active" else 0
     db.commit()
+    invalidate_curriculum()
 
     return {
         "semester_id": s.semester_id,
@@ -71,19 +83,23 @@ def update_semester(db: Session, semester_id: int, data):
     }
 
 
+@traced
 def toggle_semester_status(db: Session, semester_id: int):
     s = db.query(Semester).filter(Semester.semester_id == semester_id).first()
     if not s:
         return None
     s.status = 0 if s.status == 1 else 1
     db.commit()
+    invalidate_curriculum()
     return {"message": "Status updated", "status": "active" if s.status == 1 else "inactive"}
 
 
+@traced
 def delete_semester(db: Session, semester_id: int):
     s = db.query(Semester).filter(Semester.semester_id == semester_id).first()
     if not s:
         return False
     s.status = 0
     db.commit()
+    invalidate_curriculum()
     return True
@@ -0,0 +1,473 @@
+import codecs
+import csv
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from fastapi.concurrency import run_in_threadpool
+from app.core.database import unit_of_work
+from app.core.jobs import job_handler
+from app.core.login_index import add_logins, enabled as logins_indexed, taken_logins, update_login
+from app.core.tenant import in_tenant
+from app.core.tracing import traced
+from app.models.student import Student
+from app.models.user import User
+from app.models.user_role import UserRole
+from app.models.role import Role
+from app.models.college import College
+from app.schemas.student_schema import StudentCreate, StudentUpdate
+from app.services.role_service import invalidate_roles
+
+ADMISSION_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+ADMISSION_FIELDS = ("name", "email", "phone", "admission_number", "admission_year", "status")
+
+
+def _to_dict(student: Student, user: User, college_name: str = None):
+    return {
+        "student_id": student.student_id,
+        "user_id": user.user_id,
+        "name": user.username,
+        "email": user.email,
+        "phone": user.phone,
+        "college_id": student.college_id,
+        "college_name": college_name,
+        "admission_number": student.admission_number,
+        "admission_year": int(student.admission_year),
+        "status": "active" if student.status == 1 else "inactive",
+        "created_at": student.created_at.isoformat() if student.created_at else None,
+    }
+
+
+# ======================
+# GET STUDENTS
+# ======================
+@traced
+def get_students(db: Session, college_id: int, admission_year: int = None):
+    q = (
+        db.query(Student, User, College.college_name)
+        .join(User, User.user_id == Student.user_id)
+        .outerjoin(College, College.college_id == Student.college_id)
+        .filter(Student.college_id == college_id)
+    )
+    if admission_year is not None:
+        q = q.filter(Student.admission_year == admission_year)
+    return [_to_dict(s, u, college_name) for s, u, college_name in q.order_by(Student.student_id).all()]
+
+
+# ======================
+# CREATE STUDENT
+# ======================
+@traced
+def create_student(db: Session, data: StudentCreate):
+    name = data.name or data.admission_number
+    # a college's token admits students to its own college only
+    if not in_tenant(data.college_id):
+        return {"error": "College not found or inactive"}
+
+    # validation and duplicate checks in one query; admission numbers,
+    # emails and usernames are unique over all colleges, not per tenant
+    college_name, role_ok, number_taken, email_taken, name_taken = db.query(
+        db.query(College.college_name).filter(College.college_id == data.college_id, College.status == 1).scalar_subquery(),
+        db.query(Role.role_id).filter(Role.role_id == data.role_id, Role.status == 1).exists(),
+        db.query(Student.student_id).filter(Student.admission_number == data.admission_number).exists(),
+        db.query(User.user_id).filter(User.email == data.email).exists(),
+        db.query(User.user_id).filter(User.username == name).exists(),
+    ).execution_options(all_tenants=True).one()
+    if college_name is None:
+        return {"error": "College not found or inactive"}
+    if data.role_id is not None and not role_ok:
+        return {"error": "Role not found or inactive"}
+    if number_taken:
+        return {"error": "Admission number already exists"}
+    # users of other shards, when colleges are sharded
+    index_emails, index_names = taken_logins(db, [data.email], [name])
+    if email_taken or index_emails:
+        return {"error": "Email already exists"}
+    if name_taken or index_names:
+        return {"error": "Username already exists"}
+
+    status = 1 if data.status == "active" else 0
+    user = User(
+        username=name,
+        email=data.email,
+        phone=data.phone,
+        college_id=data.college_id,
+        status=status,
+        password_hash="TEMP_PASSWORD",  # later bcrypt
+    )
+    if data.role_id is not None:
+        user.user_roles.append(UserRole(role_id=data.role_id, status=1))
+    student = Student(
+        user=user,
+        college_id=data.college_id,
+        admission_number=data.admission_number,
+        admission_year=data.admission_year,
+        status=status,
+    )
+    with unit_of_work(db):
+        db.add(student)
+        if logins_indexed():
+            db.flush()
+            add_logins(db, [{"user_id": user.user_id, "college_id": user.college_id, "email": user.email, "username": user.username}])
+    invalidate_roles()
+
+    return _to_dict(student, user, college_name)
+
+
+# ======================
+# UPDATE STUDENT
+# ======================
+@traced
+def update_student(db: Session, student_id: int, data: StudentUpdate):
+    row = (
+        db.query(Student, User)
+        .join(User, User.user_id == Student.user_id)
+        .filter(Student.student_id == student_id)
+        .first()
+    )
+    if not row:
+        return {"error": "Student not found"}
+    student, user = row
+
+    # unique over all colleges, not per tenant
+    number_taken, email_taken, name_taken = db.query(
+        db.query(Student.student_id).filter(Student.admission_number == data.admission_number, Student.student_id != student_id).exists(),
+        db.query(User.user_id).filter(User.email == data.email, User.user_id != user.user_id).exists(),
+        db.query(User.user_id).filter(User.username == data.name, User.user_id != user.user_id).exists(),
+    ).execution_options(all_tenants=True).one()
+    if number_taken:
+        return {"error": "Admission number already exists"}
+    index_emails, index_names = taken_logins(db, [data.email], [data.name], exclude=(user.college_id, user.user_id))
+    if email_taken or index_emails:
+        return {"error": "Email already exists"}
+    if name_taken or index_names:
+        return {"error": "Username already exists"}
+
+    with unit_of_work(db):
+        update_login(db, user.college_id, user.user_id, email=data.email, username=data.name)
+        user.username = data.name
+        user.email = data.email
+        user.phone = data.phone
+        student.admission_number = data.admission_number
+        student.admission_year = data.admission_year
+        student.status = 1 if data.status == "active" else 0
+
+    return _to_dict(student, user, db.query(College.college_name).filter(College.college_id == student.college_id).scalar())
+
+
+# ======================
+# TOGGLE STATUS / DELETE
+# ======================
+@traced
+def toggle_student_status(db: Session, student_id: int):
+    s = db.query(Student).filter(Student.student_id == student_id).first()
+    if not s:
+        return None
+    s.status = 0 if s.status == 1 else 1
+    db.commit()
+    return {"message": "Status updated", "status": "active" if s.status == 1 else "inactive"}
+
+
+@traced
+def delete_student(db: Session, student_id: int):
+    s = db.query(Student).filter(Student.student_id == student_id).first()
+    if not s:
+        return False
+    # soft delete
+    s.status = 0
+    db.commit()
+    return True
+
+
+# ======================
+# BULK ADMISSION
+# ======================
+class CsvRecordParser:
+    """
+    Incremental CSV parser for uploads that arrive in chunks.
+    Chunks are decoded and split into lines; a record is complete once its
+    quotes are balanced, so quoted fields may contain newlines.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._record = ""
+
+    def _records(self, lines):
+        records = []
+        for line in lines:
+            self._record += line
+            if self._record.count('"') % 2 == 0:
+                record, self._record = self._record, ""
+                if record.strip():
+                    records.append(next(csv.reader([record])))
+            else:
+                self._record += "\n"
+        return records
+
+    def feed(self, chunk: bytes):
+        self._buffer += self._decoder.decode(chunk)
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        return self._records(line.rstrip("\r") for line in lines)
+
+    def close(self):
+        self._buffer += self._decoder.decode(b"", final=True)
+        lines = [self._buffer.rstrip("\r")] if self._buffer else []
+        self._buffer = ""
+        records = self._records(lines)
+        if self._record.strip():
+            raise ValueError("Unterminated quoted field at end of upload")
+        return records
+
+
+_progress = OrderedDict()
+_progress_lock = threading.Lock()
+MAX_TRACKED_UPLOADS = 100
+
+
+def start_admission_progress(upload_id: str):
+    progress = {
+        "upload_id": upload_id,
+        "status": "running",
+        "processed": 0,
+        "inserted": 0,
+        "failed": 0,
+        "errors": [],
+        "rows_per_second": None,
+        "started_at": datetime.utcnow().isoformat(),
+        "finished_at": None,
+    }
+    with _progress_lock:
+        _progress[upload_id] = progress
+        while len(_progress) > MAX_TRACKED_UPLOADS:
+            _progress.popitem(last=False)
+    return progress
+
+
+def get_admission_progress(upload_id: str):
+    return _progress.get(upload_id)
+
+
+@traced
+def validate_admission_target(db: Session, college_id: int, role_id: int = None):
+    if not in_tenant(college_id):
+        return {"error": "College not found or inactive"}
+    college_ok, role_ok = db.query(
+        db.query(College.college_id).filter(College.college_id == college_id, College.status == 1).exists(),
+        db.query(Role.role_id).filter(Role.role_id == role_id, Role.status == 1).exists(),
+    ).one()
+    if not college_ok:
+        return {"error": "College not found or inactive"}
+    if role_id is not None and not role_ok:
+        return {"error": "Role not found or inactive"}
+    return None
+
+
+@traced
+def admit_students_batch(db: Session, college_id: int, role_id, rows: list, first_row: int):
+    """
+    Validate and insert one batch of admission rows in its own transaction.
+    Uniqueness of admission numbers, emails and usernames is checked with one
+    IN query each against the database plus the rows already seen in the batch.
+    Returns (inserted_count, errors).
+    """
+    errors = []
+    valid = []
+    if not in_tenant(college_id):
+        return 0, [
+            {"row": i, "admission_number": row.get("admission_number"), "error": "College not found or inactive"}
+            for i, row in enumerate(rows, start=first_row)
+        ]
+    for i, row in enumerate(rows, start=first_row):
+        try:
+            values = {k: row.get(k) for k in ADMISSION_FIELDS if row.get(k) not in (None, "")}
+            data = StudentCreate(college_id=college_id, role_id=role_id, **values)
+        except ValidationError as e:
+            err = e.errors()[0]
+            field = ".".join(str(p) for p in err["loc"])
+            errors.append({"row": i, "admission_number": row.get("admission_number"), "error": f"{field}: {err['msg']}"})
+            continue
+        valid.append((i, data, data.name or data.admission_number))
+
+    if not valid:
+        return 0, errors
+
+    # unique over all colleges, not per tenant
+    taken_numbers = {
+        n for (n,) in db.query(Student.admission_number)
+        .filter(Student.admission_number.in_({d.admission_number for _, d, _ in valid}))
+        .execution_options(all_tenants=True)
+    }
+    taken_emails = {
+        e.lower() for (e,) in db.query(User.email)
+        .filter(User.email.in_({d.email.lower() for _, d, _ in valid}))
+        .execution_options(all_tenants=True)
+    }
+    taken_names = {
+        n.lower() for (n,) in db.query(User.username)
+        .filter(User.username.in_({name.lower() for _, _, name in valid}))
+        .execution_options(all_tenants=True)
+    }
+    # users of other shards, when colleges are sharded
+    index_emails, index_names = taken_logins(db, (d.email for _, d, _ in valid), (name for _, _, name in valid))
+    taken_emails |= index_emails
+    taken_names |= index_names
+
+    to_insert = []
+    for i, d, name in valid:
+        error = None
+        if d.admission_number in taken_numbers:
+            error = "Admission number already exists"
+        elif d.email.lower() in taken_emails:
+            error = "Email already exists"
+        elif name.lower() in taken_names:
+            error = "Username already exists"
+        if error:
+            errors.append({"row": i, "admission_number": d.admission_number, "error": error})
+            continue
+        taken_numbers.add(d.admission_number)
+        taken_emails.add(d.email.lower())
+        taken_names.add(name.lower())
+        to_insert.append((d, name))
+
+    if not to_insert:
+        errors.sort(key=lambda e: e["row"])
+        return 0, errors
+
+    try:
+        db.execute(insert(User), [
+            {
+                "username": name,
+                "email": d.email,
+                "phone": d.phone,
+                "college_id": college_id,
+                "status": 1 if d.status == "active" else 0,
+                "password_hash": "TEMP_PASSWORD",  # later bcrypt
+            }
+            for d, name in to_insert
+        ])
+        # college_id is checked against the tenant, the read-back is not scoped
+        ids_by_email = dict(
+            db.query(User.email, User.user_id).filter(User.email.in_([d.email for d, _ in to_insert]))
+            .execution_options(all_tenants=True).all()
+        )
+        db.execute(insert(Student), [
+            {
+                "user_id": ids_by_email[d.email],
+                "college_id": college_id,
+                "admission_number": d.admission_number,
+                "admission_year": d.admission_year,
+                "status": 1 if d.status == "active" else 0,
+            }
+            for d, _ in to_insert
+        ])
+        if role_id is not None:
+            db.execute(insert(UserRole), [
+                {"user_id": ids_by_email[d.email], "role_id": role_id, "status": 1}
+                for d, _ in to_insert
+            ])
+        add_logins(db, [
+            {"user_id": ids_by_email[d.email], "college_id": college_id, "email": d.email, "username": name}
+            for d, name in to_insert
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if role_id is not None:
+        invalidate_roles()
+
+    errors.sort(key=lambda e: e["row"])
+    return len(to_insert), errors
+
+
+async def import_admissions(db: Session, chunks, college_id: int, role_id, progress: dict):
+    """
+    Stream a CSV upload into the database. Rows are parsed as the body
+    arrives and committed every ADMISSION_BATCH_SIZE rows, updating
+    `progress` after each batch so it can be polled while the upload runs.
+    """
+    parser = CsvRecordParser()
+    header = None
+    batch = []
+    next_row = 1
+    start = time.perf_counter()
+
+    async def flush():
+        nonlocal batch, next_row
+        rows, batch = batch, []
+        inserted, errors = await run_in_threadpool(admit_students_batch, db, college_id, role_id, rows, next_row)
+        next_row += len(rows)
+        progress["processed"] += len(rows)
+        progress["inserted"] += inserted
+        progress["failed"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(progress["errors"])
+        if room > 0:
+            progress["errors"].extend(errors[:room])
+        elapsed = time.perf_counter() - start
+        progress["rows_per_second"] = round(progress["processed"] / elapsed, 1) if elapsed > 0 else None
+
+    async def consume(records):
+        nonlocal header
+        for record in records:
+            if header is None:
+                header = [h.strip() for h in record]
+                continue
+            batch.append({k: v.strip() for k, v in zip(header, record)})
+            if len(batch) >= ADMISSION_BATCH_SIZE:
+                await flush()
+
+    try:
+        async for chunk in chunks:
+            await consume(parser.feed(chunk))
+        await consume(parser.close())
+        if batch:
+            await flush()
+    except Exception as e:
+        progress["status"] = "failed"
+        progress["error"] = str(e)
+        raise
+    finally:
+        progress["finished_at"] = datetime.utcnow().isoformat()
+
+    progress["status"] = "completed"
+    return progress
+
+
+@job_handler("students.bulk_admission")
+def run_bulk_admission(ctx, params):
+    """Background variant of the admission upload; the CSV text is stored in the job params"""
+    college_id = params["college_id"]
+    role_id = params.get("role_id")
+    parser = CsvRecordParser()
+    records = parser.feed(params.get("csv", "").encode("utf-8")) + parser.close()
+    if not records:
+        return {"processed": 0, "inserted": 0, "failed": 0, "errors": []}
+
+    header = [h.strip() for h in records[0]]
+    rows = [{k: v.strip() for k, v in zip(header, r)} for r in records[1:]]
+    result = {"processed": 0, "inserted": 0, "failed": 0, "errors": []}
+
+    db = ctx.session()
+    try:
+        err = validate_admission_target(db, college_id, role_id)
+        if err:
+            raise ValueError(err["error"])
+        for i in range(0, len(rows), ADMISSION_BATCH_SIZE):
+            batch = rows[i:i + ADMISSION_BATCH_SIZE]
+            inserted, errors = admit_students_batch(db, college_id, role_id, batch, i + 1)
+            result["processed"] += len(batch)
+            result["inserted"] += inserted
+            result["failed"] += len(errors)
+            result["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(result["errors"])])
+            # batches are committed one by one, a cancel keeps what is already admitted
+            ctx.progress(result["processed"], len(rows), force=True)
+    finally:
+        db.close()
+    return result
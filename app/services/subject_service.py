@@ -1,8 +1,16 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from app.core.cache import coalesce
+from app.core.database import unit_of_work
+from app.core.tracing import traced
+from app.models.course import Course
+from app.models.semester import Semester
 from app.models.subject import Subject
+from app.services.curriculum_service import CURRICULUM_NAMESPACE, invalidate_curriculum
 
 
+@traced
+@coalesce(CURRICULUM_NAMESPACE)
 def get_subjects(db: Session, college_id: int = None, course_id: int = None, semester_id: int = None):
     q = db.query(Subject)
     if college_id is not None:
@@ -31,15 +39,25 @@ def get_subjects(db: Session, college_id: int = None, course_id: int = None, sem
     return result
 
 
+@traced
 def create_subject(db: Session, data):
-    # prevent duplicate subject_code per (college, course, semester)
-    exists = db.query(Subject).filter(
+    # parent names for the response and the duplicate check in one query
+    duplicate = db.query(Subject.subject_id).filter(
         Subject.college_id == data.college_id,
         Subject.course_id == data.course_id,
         Subject.semester_id == data.semester_id,
         func.lower(Subject.subject_code) == data.subject_code.lower(),
         Subject.status == 1,
-    ).first()
+    ).exists()
+    course_name, semester_name, exists = db.query(
+        db.query(Course.course_name).filter(Course.course_id == data.course_id).scalar_subquery(),
+        db.query(Semester.semester_name).filter(Semester.semester_id == data.semester_id).scalar_subquery(),
+        duplicate,
+    ).one()
+    if course_name is None:
+        return {"error": "Course not found"}
+    if semester_name is None:
+        return {"error": "Semester not found"}
     if exists:
         return {"error": "Subject code already exists for this course/semester"}
 
@@ -53,9 +71,9 @@ def create_subject(db: Session, data):
         credits=data.credits,
         status=1 if data.status == "active" else 0,
     )
-    db.add(s)
-    db.commit()
-    db.refresh(s)
+    with unit_of_work(db):
+        db.add(s)
+    invalidate_curriculum()
 
     return {
         "subject_id": s.subject_id,
@@ -65,13 +83,14 @@ def create_subject(db: Session, data):
         "credits": float(s.credits) if s.credits is not None else None,
         "status": "active" if s.status == 1 else "inactive",
         "course_id": s.course_id,
-        "course_name": s.course.course_name if getattr(s, "course", None) else None,
+        "course_name": course_name,
         "semester_id": s.semester_id,
-        "semester_name": s.semester.semester_name if getattr(s, "semester", None) else None,
+        "semester_name": semester_name,
         "created_at": s.created_at.isoformat() if s.created_at else None,
     }
 
 
+@traced
 def update_subject(db: Session, subject_id: int, data):
     s = db.query(Subject).filter(Subject.subject_id == subject_id).first()
     if not s:
@@ -94,6 +113,7 @@ def update_subject(db: Session, subject_id: int, data):
     s.credits = data.credits
     s.status = 1 if data.status == "active" else 0
     db.commit()
+    invalidate_curriculum()
 
     return {
         "subject_id": s.subject_id,
@@ -110,19 +130,23 @@ def update_subject(db: Session, subject_id: int, data):
     }
 
 
+@traced
 def toggle_subject_status(db: Session, subject_id: int):
     s = db.query(Subject).filter(Subject.subject_id == subject_id).first()
     if not s:
         return None
     s.status = 0 if s.status == 1 else 1
     db.commit()
+    invalidate_curriculum()
     return {"message": "Status updated", "status": "active" if s.status == 1 else "inactive"}
 
 
+@traced
 def delete_subject(db: Session, subject_id: int):
     s = db.query(Subject).filter(Subject.subject_id == subject_id).first()
     if not s:
         return False
     s.status = 0
     db.commit()
+    invalidate_curriculum()
     return True
@@ -1,15 +1,30 @@
+import csv
+import io
+import json
+import time
+from contextlib import nullcontext
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert
+from app.core.database import unit_of_work
+from app.core.jobs import job_handler
+from app.core.login_index import add_logins, enabled as logins_indexed, remove_login, taken_logins, update_login
+from app.core.sharding import college_route
+from app.core.tenant import in_tenant
+from app.core.tracing import traced
 from app.models.user import User
 from app.models.role import Role
 from app.models.college import College
 from app.models.user_role import UserRole
 from app.schemas.user_schema import UserCreate, UserUpdate
+from app.services.faculty_service import invalidate_faculty
+from app.services.role_service import invalidate_roles
 from datetime import datetime
 
 # ======================
 # GET USERS
 # ======================
+@traced
 def get_users(db: Session, role_name: str = None):
     # pick a single active role per user (if a user has multiple roles, choose the one with the smallest role_id)
     role_subq = (
@@ -69,15 +84,31 @@ def get_users(db: Session, role_name: str = None):
 # ======================
 # CREATE USER
 # ======================
+@traced
 def create_user(db: Session, data: UserCreate):
-    # validate role exists
-    role = db.query(Role).filter(Role.role_id == data.role_id, Role.status == 1).first()
-    if not role:
+    # a college's token writes users of its own college only
+    if not in_tenant(data.college_id):
+        return {"error": "College not found or inactive"}
+    # validate role and college exist and check for duplicates in one query, the
+    # first two also give the names for the response. Emails and usernames are
+    # unique over all colleges, so the query is not scoped to the tenant; the
+    # role is looked up in the user's college instead
+    role_name, college_name, email_taken, name_taken = db.query(
+        db.query(Role.role_name).filter(Role.role_id == data.role_id, Role.college_id == data.college_id, Role.status == 1).scalar_subquery(),
+        db.query(College.college_name).filter(College.college_id == data.college_id, College.status == 1).scalar_subquery(),
+        db.query(User.user_id).filter(User.email == data.email).exists(),
+        db.query(User.user_id).filter(User.username == data.name).exists(),
+    ).execution_options(all_tenants=True).one()
+    if role_name is None:
         return {"error": "Role not found or inactive"}
-    # validate college exists
-    college = db.query(College).filter(College.college_id == data.college_id, College.status == 1).first()
-    if not college:
+    if college_name is None:
         return {"error": "College not found or inactive"}
+    # users of other shards, when colleges are sharded
+    taken_emails, taken_names = taken_logins(db, [data.email], [data.name])
+    if email_taken or taken_emails:
+        return {"error": "Email already exists"}
+    if name_taken or taken_names:
+        return {"error": "Username already exists"}
 
     user = User(
         username=data.name,
@@ -87,24 +118,24 @@ def create_user(db: Session, data: UserCreate):
         status=1 if data.status == "active" else 0,
         password_hash="TEMP_PASSWORD",  # later bcrypt
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-
-    # create user_role entry
-    user_role = UserRole(user_id=user.user_id, role_id=data.role_id, status=1)
-    db.add(user_role)
-    db.commit()
+    # user and user_role entry are inserted in the same flush
+    user.user_roles.append(UserRole(role_id=data.role_id, status=1))
+    with unit_of_work(db):
+        db.add(user)
+        if logins_indexed():
+            db.flush()
+            add_logins(db, [{"user_id": user.user_id, "college_id": user.college_id, "email": user.email, "username": user.username}])
+    invalidate_roles()
 
     return {
         "user_id": user.user_id,
         "name": user.username,
         "email": user.email,
         "phone": user.phone,
-        "role_id": role.role_id,
-        "role_name": role.role_name,
+        "role_id": data.role_id,
+        "role_name": role_name,
         "college_id": user.college_id,
-        "college_name": db.query(College.college_name).filter(College.college_id == user.college_id).scalar(),
+        "college_name": college_name,
         "status": "active" if user.status == 1 else "inactive",
         "created_at": user.created_at.isoformat() if user.created_at else None,
     }
@@ -113,6 +144,7 @@ def create_user(db: Session, data: UserCreate):
 # ======================
 # UPDATE USER
 # ======================
+@traced
 def update_user(db: Session, user_id: int, data: UserUpdate):
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
@@ -122,9 +154,22 @@ def update_user(db: Session, user_id: int, data: UserUpdate):
     if not role:
         return {"error": "Role not found or inactive"}
     # validate college exists
+    if not in_tenant(data.college_id):
+        return {"error": "College not found or inactive"}
     college = db.query(College).filter(College.college_id == data.college_id, College.status == 1).first()
     if not college:
         return {"error": "College not found or inactive"}
+    # emails and usernames are unique over all colleges, not per tenant
+    email_taken, name_taken = db.query(
+        db.query(User.user_id).filter(User.email == data.email, User.user_id != user_id).exists(),
+        db.query(User.user_id).filter(User.username == data.name, User.user_id != user_id).exists(),
+    ).execution_options(all_tenants=True).one()
+    taken_emails, taken_names = taken_logins(db, [data.email], [data.name], exclude=(user.college_id, user_id))
+    if email_taken or taken_emails:
+        return {"error": "Email already exists"}
+    if name_taken or taken_names:
+        return {"error": "Username already exists"}
+    update_login(db, user.college_id, user_id, email=data.email, username=data.name, college_id=data.college_id)
 
     # update user basic fields
     user.username = data.name
@@ -147,6 +192,8 @@ def update_user(db: Session, user_id: int, data: UserUpdate):
         db.add(UserRole(user_id=user_id, role_id=data.role_id, status=1))
 
     db.commit()
+    invalidate_roles()
+    invalidate_faculty()
 
     return {
         "user_id": user.user_id,
@@ -165,12 +212,14 @@ def update_user(db: Session, user_id: int, data: UserUpdate):
 # ======================
 # TOGGLE STATUS
 # ======================
+@traced
 def toggle_user_status(db: Session, user_id: int):
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
         return {"error": "User not found"}
     user.status = 0 if user.status == 1 else 1
     db.commit()
+    invalidate_faculty()
 
     return {
         "message": "User status updated",
@@ -178,6 +227,7 @@ def toggle_user_status(db: Session, user_id: int):
     }
 
 
+@traced
 def delete_user(db: Session, user_id: int):
     user = db.query(User).filter(User.user_id == user_id).first()
     if not user:
@@ -185,6 +235,183 @@ def delete_user(db: Session, user_id: int):
 
     # delete user roles first
     db.query(UserRole).filter(UserRole.user_id == user_id).delete()
+    remove_login(db, user.college_id, user_id)
     db.delete(user)
     db.commit()
+    invalidate_roles()
+    invalidate_faculty()
     return True
+
+
+# ======================
+# BULK CREATE USERS
+# ======================
+BULK_BATCH_SIZE = 1000
+BULK_FIELDS = ("name", "email", "phone", "role_id", "college_id", "status")
+
+
+def _chunks(items, size=BULK_BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def parse_bulk_user_payload(raw: bytes, content_type: str):
+    """Parse a CSV (header row required) or JSON array upload into a list of row dicts"""
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+        return [{k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k} for row in reader]
+
+    data = json.loads(raw or b"[]")
+    if isinstance(data, dict):
+        data = data.get("users", [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of users")
+    return data
+
+
+def _insert_users(db: Session, to_insert: list, done: int, total: int, on_progress=None) -> int:
+    """Insert validated users and their roles with executemany in batches; returns the new done count"""
+    for batch in _chunks(to_insert):
+        db.execute(insert(User), [
+            {
+                "username": d.name,
+                "email": d.email,
+                "phone": d.phone,
+                "college_id": d.college_id,
+                "status": 1 if d.status == "active" else 0,
+                "password_hash": "TEMP_PASSWORD",  # later bcrypt
+            }
+            for d in batch
+        ])
+        # the rows are checked against the tenant, the read-back is not scoped
+        ids_by_email = dict(
+            db.query(User.email, User.user_id).filter(User.email.in_([d.email for d in batch]))
+            .execution_options(all_tenants=True).all()
+        )
+        db.execute(insert(UserRole), [
+            {"user_id": ids_by_email[d.email], "role_id": d.role_id, "status": 1}
+            for d in batch
+        ])
+        add_logins(db, [
+            {"user_id": ids_by_email[d.email], "college_id": d.college_id, "email": d.email, "username": d.name}
+            for d in batch
+        ])
+        done += len(batch)
+        if on_progress:
+            on_progress(done, total)
+    return done
+
+
+@traced
+def bulk_create_users(db: Session, rows: list, on_progress=None):
+    """
+    Validate and insert many users in one transaction.
+
+    Role, college and duplicate email/username checks are done with a few
+    IN queries over the whole upload instead of per row. Valid rows are
+    inserted with executemany in batches; invalid rows are reported back
+    with their 1-based row number and nothing is written for them.
+    `on_progress(done, total)` is called after every inserted batch.
+    With SHARDS each college's users are written to its shard and indexed
+    in tbl_user_logins.
+    """
+    start = time.perf_counter()
+    errors = []
+    valid = []
+
+    for i, row in enumerate(rows, start=1):
+        try:
+            values = {k: row.get(k) for k in BULK_FIELDS if row.get(k) not in (None, "")}
+            values.setdefault("phone", None)
+            data = UserCreate(**values)
+        except ValidationError as e:
+            err = e.errors()[0]
+            field = ".".join(str(p) for p in err["loc"])
+            errors.append({"row": i, "email": row.get("email"), "error": f"{field}: {err['msg']}"})
+            continue
+        except (TypeError, AttributeError):
+            errors.append({"row": i, "email": None, "error": "Row must be an object"})
+            continue
+        valid.append((i, data))
+
+    role_ids = {d.role_id for _, d in valid}
+    college_ids = {d.college_id for _, d in valid}
+    emails = {d.email.lower() for _, d in valid}
+    names = {d.name.lower() for _, d in valid}
+
+    active_roles = set()
+    for chunk in _chunks(role_ids):
+        active_roles.update(r for (r,) in db.query(Role.role_id).filter(Role.role_id.in_(chunk), Role.status == 1))
+    active_colleges = set()
+    for chunk in _chunks(college_ids):
+        active_colleges.update(c for (c,) in db.query(College.college_id).filter(College.college_id.in_(chunk), College.status == 1))
+    # emails and usernames are unique over all colleges, not per tenant
+    taken_emails = set()
+    for chunk in _chunks(emails):
+        taken_emails.update(e.lower() for (e,) in db.query(User.email).filter(User.email.in_(chunk)).execution_options(all_tenants=True))
+    taken_names = set()
+    for chunk in _chunks(names):
+        taken_names.update(n.lower() for (n,) in db.query(User.username).filter(User.username.in_(chunk)).execution_options(all_tenants=True))
+    # users of other shards, when colleges are sharded
+    index_emails, index_names = taken_logins(db, emails, names)
+    taken_emails |= index_emails
+    taken_names |= index_names
+
+    to_insert = []
+    for i, d in valid:
+        error = None
+        if d.role_id not in active_roles:
+            error = "Role not found or inactive"
+        elif d.college_id not in active_colleges or not in_tenant(d.college_id):
+            error = "College not found or inactive"
+        elif d.email.lower() in taken_emails:
+            error = "Email already exists"
+        elif d.name.lower() in taken_names:
+            error = "Username already exists"
+        if error:
+            errors.append({"row": i, "email": d.email, "error": error})
+            continue
+        # later rows of the same upload must not reuse these either
+        taken_emails.add(d.email.lower())
+        taken_names.add(d.name.lower())
+        to_insert.append(d)
+
+    # with shards, each college's users are written to its shard
+    sharded = logins_indexed()
+    groups = {}
+    for d in to_insert:
+        groups.setdefault(d.college_id if sharded else None, []).append(d)
+
+    done = 0
+    try:
+        for college_id, group in groups.items():
+            with college_route(college_id) if college_id is not None else nullcontext():
+                done = _insert_users(db, group, done, len(to_insert), on_progress)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_roles()
+
+    errors.sort(key=lambda e: e["row"])
+    elapsed = time.perf_counter() - start
+    return {
+        "total": len(rows),
+        "inserted": len(to_insert),
+        "failed": len(errors),
+        "errors": errors,
+        "duration_ms": round(elapsed * 1000, 3),
+        # every row, as admissions report it, and the rows actually written
+        "rows_per_second": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+        "inserted_per_second": round(len(to_insert) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+@job_handler("users.bulk_import")
+def run_bulk_user_import(ctx, params):
+    db = ctx.session()
+    try:
+        return bulk_create_users(db, params.get("rows", []), on_progress=ctx.progress)
+    finally:
+        db.close()
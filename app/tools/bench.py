@@ -0,0 +1,356 @@
+"""
+Endpoint benchmarks against a freshly seeded SQLite database.
+
+    python -m app.tools.bench --output bench.json
+    python -m app.tools.bench --baseline bench.json --threshold 0.25
+
+Requests are driven through the ASGI app in-process, so the numbers
+cover routing, dependencies, services, SQL and response validation but
+no network or server. Every scenario reports p50/p99 latency, throughput,
+SQL statements per request and peak traced memory per request. With
+--baseline the run exits non-zero if any scenario regressed beyond the
+threshold, or ran more queries than before.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+# no app settings are read by it, so it can be imported before the environment is set
+from app.core.asgi import asgi_call
+
+# higher is worse for all of these; rps is checked the other way round
+LATENCY_METRICS = ("p50_ms", "p99_ms", "peak_memory_kb")
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # (iteration, context) -> path / JSON body
+    path: Callable
+    body: Optional[Callable] = None
+    auth: bool = True
+    # bcrypt bound scenarios are capped so a run stays short
+    max_iterations: Optional[int] = None
+    expected: tuple = (200, 201)
+
+
+@dataclass
+class BenchContext:
+    college_id: int = 0
+    education_type_id: int = 0
+    course_id: int = 0
+    semester_id: int = 0
+    student_role_id: int = 0
+    teacher_role_id: int = 0
+    admin_email: str = ""
+    password: str = ""
+    access_token: str = ""
+    refresh_token: str = ""
+    # Teacher users without a faculty row, consumed by the faculty create scenario
+    free_user_ids: list = field(default_factory=list)
+    run_id: str = ""
+
+
+SCENARIOS = [
+    Scenario("auth.login", "POST", lambda i, c: "/auth/login",
+             lambda i, c: {"email": c.admin_email, "password": c.password}, auth=False, max_iterations=20),
+    Scenario("auth.refresh", "POST", lambda i, c: "/auth/refresh",
+             lambda i, c: {"refresh_token": c.refresh_token}, auth=False),
+    Scenario("faculty.list", "GET", lambda i, c: f"/admin/faculty/?college_id={c.college_id}"),
+    Scenario("users.list", "GET", lambda i, c: "/admin/users/"),
+    Scenario("subjects.list", "GET", lambda i, c: f"/admin/subjects/?college_id={c.college_id}"),
+    Scenario("courses.list", "GET", lambda i, c: f"/admin/courses/?college_id={c.college_id}"),
+    Scenario("roles.list", "GET", lambda i, c: f"/admin/roles/?college_id={c.college_id}"),
+    Scenario("colleges.create", "POST", lambda i, c: "/admin/colleges/", lambda i, c: {
+        "college_code": f"B{c.run_id}{i}", "college_name": f"Bench College {i}", "college_type": "private",
+    }),
+    Scenario("academic_years.create", "POST", lambda i, c: "/admin/academic-years/", lambda i, c: {
+        "college_id": c.college_id, "year_code": f"B{c.run_id}-{i}",
+        "start_date": f"{3000 + i}-06-01", "end_date": f"{3001 + i}-05-31",
+    }),
+    Scenario("education_types.create", "POST", lambda i, c: "/admin/education-types/", lambda i, c: {
+        "college_id": c.college_id, "type_code": f"B{c.run_id}{i}", "type_name": f"Bench Type {i}", "duration_years": 3,
+    }),
+    Scenario("courses.create", "POST", lambda i, c: "/admin/courses/", lambda i, c: {
+        "college_id": c.college_id, "education_type_id": c.education_type_id, "course_code": f"B{c.run_id}{i}",
+        "course_name": f"Bench Course {i}", "duration_years": 3, "total_semesters": 6,
+    }),
+    Scenario("semesters.create", "POST", lambda i, c: "/admin/semesters/", lambda i, c: {
+        "course_id": c.course_id, "semester_number": 1000 + i, "semester_name": f"Bench Semester {c.run_id}{i}",
+    }),
+    Scenario("subjects.create", "POST", lambda i, c: "/admin/subjects/", lambda i, c: {
+        "college_id": c.college_id, "course_id": c.course_id, "semester_id": c.semester_id,
+        "subject_code": f"B{c.run_id}{i}", "subject_name": f"Bench Subject {i}", "subject_type": "theory", "credits": 3,
+    }),
+    Scenario("roles.create", "POST", lambda i, c: "/admin/roles/", lambda i, c: {
+        "college_id": c.college_id, "name": f"Bench Role {c.run_id}{i}", "description": None,
+    }),
+    Scenario("users.create", "POST", lambda i, c: "/admin/users/", lambda i, c: {
+        "name": f"bench{c.run_id}u{i}", "email": f"bench{c.run_id}u{i}@bench.seed", "phone": None,
+        "role_id": c.student_role_id, "college_id": c.college_id,
+    }),
+    Scenario("students.create", "POST", lambda i, c: "/admin/students/", lambda i, c: {
+        "college_id": c.college_id, "admission_number": f"B{c.run_id}{i}", "admission_year": 2024,
+        "email": f"bench{c.run_id}s{i}@bench.seed", "role_id": c.student_role_id,
+    }),
+    Scenario("faculty.create", "POST", lambda i, c: "/admin/faculty/", lambda i, c: {
+        "user_id": c.free_user_ids.pop(), "college_id": c.college_id,
+        "employee_code": f"B{c.run_id}{i}", "designation": "Lecturer",
+    }),
+]
+
+# ============================================================================
+# IN-PROCESS ASGI CLIENT
+# ============================================================================
+
+
+async def asgi_request(app, method: str, path: str, body=None, headers: Optional[dict] = None):
+    """Send one request through the ASGI app and return (status, parsed body)"""
+    status_code, _, raw = await asgi_call(app, method, path, body, headers, server=("bench", 80))
+    try:
+        return status_code, json.loads(raw) if raw else None
+    except ValueError:
+        return status_code, raw.decode("utf-8", errors="replace")
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def run_scenario(app, scenario: Scenario, ctx: BenchContext, iterations: int, warmup: int, query_counter: list) -> dict:
+    n = min(iterations, scenario.max_iterations or iterations)
+    headers = {"Authorization": f"Bearer {ctx.access_token}"} if scenario.auth else {}
+    i = 0
+
+    async def call():
+        nonlocal i
+        i += 1
+        body = scenario.body(i, ctx) if scenario.body else None
+        return await asgi_request(app, scenario.method, scenario.path(i, ctx), body, headers)
+
+    errors = []
+    for _ in range(min(warmup, n)):
+        await call()
+
+    latencies = []
+    queries = []
+    started = time.perf_counter()
+    for _ in range(n):
+        before = query_counter[0]
+        t0 = time.perf_counter()
+        status_code, body = await call()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        queries.append(query_counter[0] - before)
+        if status_code not in scenario.expected and len(errors) < 3:
+            errors.append({"status": status_code, "body": body})
+    elapsed = time.perf_counter() - started
+
+    # memory is traced in a separate pass, tracemalloc slows every allocation
+    peak_kb = 0.0
+    for _ in range(min(5, n)):
+        tracemalloc.start()
+        await call()
+        peak_kb = max(peak_kb, tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "iterations": n,
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "rps": round(n / elapsed, 1) if elapsed else 0.0,
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "peak_memory_kb": round(peak_kb, 1),
+        "errors": errors,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Regressions of results against baseline, as human readable lines"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for metric in LATENCY_METRICS:
+            if before.get(metric) and current[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {before[metric]} -> {current[metric]}")
+        if before.get("rps") and current["rps"] < before["rps"] / (1 + threshold):
+            regressions.append(f"{name}: rps {before['rps']} -> {current['rps']}")
+        if current["queries_per_request"] > before.get("queries_per_request", current["queries_per_request"]):
+            regressions.append(f"{name}: queries_per_request {before['queries_per_request']} -> {current['queries_per_request']}")
+    return regressions
+
+
+def _prepare_context(seed_password: str, free_teachers: int) -> BenchContext:
+    from sqlalchemy import func, insert
+    from app.core.database import SessionLocal
+    from app.models.course import Course
+    from app.models.education_type import EducationType
+    from app.models.role import Role
+    from app.models.semester import Semester
+    from app.models.user import User
+    from app.models.user_role import UserRole
+    from app.api.auth import create_access_token, create_refresh_token, load_permissions_for_user
+
+    db = SessionLocal()
+    try:
+        admin = (
+            db.query(User.user_id, User.email, User.college_id, Role.role_id)
+            .join(UserRole, UserRole.user_id == User.user_id)
+            .join(Role, Role.role_id == UserRole.role_id)
+            .filter(Role.role_name == "Super Admin")
+            .first()
+        )
+        semester = (
+            db.query(Semester.semester_id, Course.course_id, EducationType.education_type_id)
+            .join(Course, Course.course_id == Semester.course_id)
+            .join(EducationType, EducationType.education_type_id == Course.education_type_id)
+            .filter(Course.college_id == admin.college_id)
+            .first()
+        )
+        role_ids = dict(
+            db.query(Role.role_name, Role.role_id)
+            .filter(Role.college_id == admin.college_id, Role.role_name.in_(["Student", "Teacher"]))
+            .all()
+        )
+
+        # seeded teachers all have a faculty row already; add some that do not
+        first_id = (db.query(func.max(User.user_id)).scalar() or 0) + 1
+        free_user_ids = list(range(first_id, first_id + free_teachers))
+        password_hash = db.query(User.password_hash).filter(User.user_id == admin.user_id).scalar()
+        db.execute(insert(User), [
+            {"user_id": u, "college_id": admin.college_id, "username": f"benchteacher{u}",
+             "email": f"benchteacher{u}@bench.seed", "password_hash": password_hash, "status": 1}
+            for u in free_user_ids
+        ])
+        db.execute(insert(UserRole), [{"user_id": u, "role_id": role_ids["Teacher"], "status": 1} for u in free_user_ids])
+        db.commit()
+        payload = {
+            "user_id": admin.user_id,
+            "role_id": admin.role_id,
+            "college_id": admin.college_id,
+            "permissions": load_permissions_for_user(db, admin.user_id),
+        }
+    finally:
+        db.close()
+
+    return BenchContext(
+        college_id=admin.college_id,
+        education_type_id=semester.education_type_id,
+        course_id=semester.course_id,
+        semester_id=semester.semester_id,
+        student_role_id=role_ids["Student"],
+        teacher_role_id=role_ids["Teacher"],
+        admin_email=admin.email,
+        password=seed_password,
+        access_token=create_access_token(payload),
+        refresh_token=create_refresh_token(payload),
+        free_user_ids=free_user_ids,
+        run_id=f"{int(time.time()) % 100000}",
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark API endpoints in-process against seeded SQLite")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--users", type=int, default=2000, help="seeded users")
+    parser.add_argument("--colleges", type=int, default=2, help="seeded colleges")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario", action="append", help="only run these scenarios (repeatable)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression, default 25%%")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="cms-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    # the login scenario repeats one account far past the per-email limit
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "0")
+
+    # imported only now so the app binds to the benchmark database
+    from app.core.database import get_engine
+    from app.tools.seed import SeedConfig, seed_dataset
+
+    engine = get_engine()
+
+    config = SeedConfig(colleges=args.colleges, users=args.users, seed=args.seed)
+    seed_dataset(engine, config, log=lambda msg: None)
+
+    from sqlalchemy import event
+    from app.main import app
+
+    query_counter = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        query_counter[0] += 1
+
+    ctx = _prepare_context(config.password, args.iterations + args.warmup + 10)
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+
+    async def run_all():
+        out = {}
+        for scenario in scenarios:
+            out[scenario.name] = await run_scenario(app, scenario, ctx, args.iterations, args.warmup, query_counter)
+            r = out[scenario.name]
+            print(f"{scenario.name:<24} p50 {r['p50_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+                  f"{r['rps']:>8.1f} req/s  {r['queries_per_request']:>6.2f} q/req  {r['peak_memory_kb']:>9.1f} KiB"
+                  + ("  ERRORS" if r["errors"] else ""))
+        return out
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "users": args.users,
+            "colleges": args.colleges,
+            "seed": args.seed,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "scenarios": asyncio.run(run_all()),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [name for name, r in results["scenarios"].items() if r["errors"]]
+    for name in failed:
+        print(f"{name}: unexpected responses {results['scenarios'][name]['errors']}", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
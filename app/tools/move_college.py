@@ -0,0 +1,209 @@
+"""
+Move a college to another shard (see app/core/sharding.py).
+
+    SHARDS="s1=sqlite:///s1.db,s2=sqlite:///s2.db" python -m app.tools.move_college --college 3 --to s2
+
+Runs against the configured DATABASE_URL (the directory) and SHARDS, next
+to the live app:
+
+1. the college is marked "moving": once the workers have seen it (--settle
+   seconds, a few CACHE_SYNC_INTERVALs), its writes answer 503 + Retry-After
+   while reads continue from the source shard;
+2. its entries in the login index (tbl_user_logins) are reconciled with its
+   users; an email or username the index holds for another college's user
+   would collide on the destination, so the move stops there;
+3. its rows are copied table by table, parents first, in batches, and the
+   row counts are compared;
+4. the map points to the destination and the college is "active" again;
+5. after another settle, the source rows are deleted (unless --keep-source).
+
+Any failure before step 4 deletes what was copied and leaves the college
+active on its source shard. Ids must not already exist in the destination;
+MySQL shards allocate ids from disjoint blocks, SQLite shards are checked
+and the move is refused on a collision.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Engine
+
+from app.core.cache import cache
+from app.core.cache_sync import cache_sync
+from app.core.config import get_settings
+from app.core.database import Base, init_engine
+from app.core.login_index import sync_login_index
+from app.core.sharding import SHARDS_NAMESPACE, init_shards, shard_tables
+from app.models.cache_version import CacheVersion  # noqa: F401
+from app.models.college import College
+from app.models.college_shard import CollegeShard
+# every table must be registered for shard_tables() and create_all
+import app.models.academic_year  # noqa: F401
+import app.models.course  # noqa: F401
+import app.models.education_type  # noqa: F401
+import app.models.faculty  # noqa: F401
+import app.models.job  # noqa: F401
+import app.models.permission  # noqa: F401
+import app.models.role  # noqa: F401
+import app.models.role_permission  # noqa: F401
+import app.models.semester  # noqa: F401
+import app.models.student  # noqa: F401
+import app.models.subject  # noqa: F401
+import app.models.user  # noqa: F401
+import app.models.user_login  # noqa: F401
+import app.models.user_role  # noqa: F401
+
+BATCH_SIZE = 1000
+
+shards_table = CollegeShard.__table__
+
+
+def _college_filter(table, college_id: int):
+    """WHERE clause selecting a shard table's rows that belong to the college"""
+    if "college_id" in table.c:
+        return table.c.college_id == college_id
+    # e.g. semesters -> courses, user_roles -> users: through the owning parent
+    for fk in table.foreign_keys:
+        parent = fk.column.table
+        if "college_id" in parent.c:
+            return fk.parent.in_(select(fk.column).where(parent.c.college_id == college_id))
+    raise RuntimeError(f"Cannot tell which college owns the rows of {table.name}")
+
+
+def _set_placement(directory: Engine, college_id: int, shard: str, status: str):
+    values = {"shard": shard, "status": status, "updated_at": datetime.utcnow()}
+    with directory.begin() as conn:
+        updated = conn.execute(
+            update(shards_table).where(shards_table.c.college_id == college_id).values(**values)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(shards_table).values(college_id=college_id, **values))
+    # published through tbl_cache_versions: every worker reloads the map
+    cache.bump(SHARDS_NAMESPACE)
+
+
+def _collisions(source: Engine, destination: Engine, college_id: int) -> dict:
+    """Primary keys of the college's rows that the destination already uses, by table"""
+    found = {}
+    for table in shard_tables():
+        pks = list(table.primary_key.columns)
+        if len(pks) != 1:
+            # association rows: unique as long as their parents' ids are
+            continue
+        pk = pks[0]
+        with source.connect() as conn:
+            ids = list(conn.execute(select(pk).where(_college_filter(table, college_id))).scalars())
+        taken = []
+        with destination.connect() as conn:
+            for i in range(0, len(ids), BATCH_SIZE):
+                taken += conn.execute(select(pk).where(pk.in_(ids[i:i + BATCH_SIZE]))).scalars().all()
+        if taken:
+            found[table.name] = taken
+    return found
+
+
+def _count(engine: Engine, table, college_id: int) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table).where(_college_filter(table, college_id))).scalar_one()
+
+
+def _copy(source: Engine, destination: Engine, college_id: int, log) -> dict:
+    counts = {}
+    for table in shard_tables():
+        copied = 0
+        with source.connect() as src, destination.begin() as dst:
+            result = src.execute(select(table).where(_college_filter(table, college_id)))
+            while True:
+                rows = result.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                dst.execute(insert(table), [dict(r._mapping) for r in rows])
+                copied += len(rows)
+        counts[table.name] = copied
+        log(f"  {table.name}: {copied} rows")
+    return counts
+
+
+def _delete(engine: Engine, college_id: int):
+    # children first, while the parents the filters go through still exist
+    with engine.begin() as conn:
+        for table in reversed(shard_tables()):
+            conn.execute(delete(table).where(_college_filter(table, college_id)))
+
+
+def move_college(college_id: int, to: str, settle: float, keep_source: bool = False, log=print) -> dict:
+    settings = get_settings()
+    directory = init_engine(settings)
+    Base.metadata.create_all(bind=directory)
+    cache_sync.start(settings)
+    router = init_shards(settings)
+    if router is None:
+        raise SystemExit("SHARDS is not configured")
+    if to not in router.engines:
+        raise SystemExit(f"Unknown shard {to!r}; configured: {', '.join(router.engines)}")
+    with directory.connect() as conn:
+        if conn.execute(select(College.college_id).where(College.college_id == college_id)).first() is None:
+            raise SystemExit(f"College {college_id} does not exist")
+
+    source_name, status = router.placement(college_id)
+    if status != "active":
+        raise SystemExit(f"College {college_id} is {status!r}; finish or revert that move first")
+    if source_name == to:
+        log(f"College {college_id} is already on {to}")
+        return {"college_id": college_id, "shard": to, "moved": False}
+    source, destination = router.engines[source_name], router.engines[to]
+
+    log(f"Moving college {college_id}: {source_name} -> {to}")
+    _set_placement(directory, college_id, source_name, "moving")
+    time.sleep(settle)
+
+    try:
+        conflicts = sync_login_index(college_id)
+        if conflicts:
+            detail = ", ".join(c["email"] for c in conflicts[:5])
+            raise RuntimeError(f"{len(conflicts)} users' emails or usernames belong to other colleges' users, e.g. {detail}")
+        collisions = _collisions(source, destination, college_id)
+        if collisions:
+            detail = ", ".join(f"{name} ({len(ids)} ids, e.g. {ids[0]})" for name, ids in collisions.items())
+            raise RuntimeError(f"Ids already used on {to}: {detail}")
+        counts = _copy(source, destination, college_id, log)
+        mismatched = [t.name for t in shard_tables() if _count(destination, t, college_id) != counts[t.name]]
+        if mismatched:
+            raise RuntimeError(f"Row counts differ after the copy: {', '.join(mismatched)}")
+    except BaseException:
+        _delete(destination, college_id)
+        _set_placement(directory, college_id, source_name, "active")
+        raise
+
+    _set_placement(directory, college_id, to, "active")
+    log(f"College {college_id} is served from {to}")
+    if not keep_source:
+        # requests that resolved the old placement finish on the source first
+        time.sleep(settle)
+        _delete(source, college_id)
+        log(f"Deleted its rows from {source_name}")
+    cache_sync.stop()
+    return {"college_id": college_id, "shard": to, "moved": True, "rows": counts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move a college's rows to another shard database")
+    parser.add_argument("--college", type=int, required=True, help="college_id to move")
+    parser.add_argument("--to", required=True, help="destination shard name from SHARDS, or 'default'")
+    parser.add_argument("--settle", type=float, help="seconds for the workers to see a map change; default 3 cache sync intervals")
+    parser.add_argument("--keep-source", action="store_true", help="leave the source rows in place")
+    args = parser.parse_args(argv)
+
+    settle = args.settle if args.settle is not None else 3 * get_settings().cache_sync_interval
+    try:
+        move_college(args.college, args.to, settle, keep_source=args.keep_source)
+    except RuntimeError as e:
+        print(f"Move aborted, college left on its source shard: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
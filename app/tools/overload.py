@@ -0,0 +1,154 @@
+"""
+Overload test for admission control.
+
+    python -m app.tools.overload --clients 200 --seconds 10
+    python -m app.tools.overload --clients 200 --seconds 10 --no-admission
+
+The app runs in-process against a seeded SQLite database with a small
+connection pool (--pool-size, no overflow) and a simulated slow database
+(--query-delay-ms slept per statement while the connection is held).
+--clients concurrent clients then send a mix of logins, reads, single
+writes and bulk imports for --seconds, backing off about --backoff-ms
+after a 503. The report gives latency percentiles and status counts per priority.
+
+With admission control, served requests keep a bounded p99 and the excess
+is turned away quickly with 503 + Retry-After, bulk imports first. Without
+it, every request queues for the pool until DB_POOL_TIMEOUT. With
+--max-p99-ms the run exits 1 if served reads exceed that p99.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from app.tools.bench import BenchContext, _percentile, _prepare_context, asgi_request
+
+# (weight, priority, method, path, body)
+def _workload(ctx: BenchContext):
+    def bulk_users(i):
+        return [
+            {"name": f"load{ctx.run_id}b{i}r{n}", "email": f"load{ctx.run_id}b{i}r{n}@load.seed",
+             "role_id": ctx.student_role_id, "college_id": ctx.college_id}
+            for n in range(20)
+        ]
+
+    return [
+        (2, "critical", "POST", lambda i: "/auth/login", lambda i: {"email": ctx.admin_email, "password": ctx.password}),
+        (25, "read", "GET", lambda i: f"/admin/courses/?college_id={ctx.college_id}", None),
+        (20, "read", "GET", lambda i: f"/admin/roles/?college_id={ctx.college_id}", None),
+        (15, "read", "GET", lambda i: f"/admin/faculty/?college_id={ctx.college_id}", None),
+        (15, "write", "POST", lambda i: "/admin/users/", lambda i: {
+            "name": f"load{ctx.run_id}u{i}", "email": f"load{ctx.run_id}u{i}@load.seed", "phone": None,
+            "role_id": ctx.student_role_id, "college_id": ctx.college_id,
+        }),
+        (20, "bulk", "POST", lambda i: "/admin/users/bulk", bulk_users),
+    ]
+
+
+async def run_load(app, ctx: BenchContext, clients: int, seconds: float, backoff: float, seed: int) -> dict:
+    workload = _workload(ctx)
+    weights = [w[0] for w in workload]
+    headers = {"Authorization": f"Bearer {ctx.access_token}"}
+    samples = defaultdict(list)
+    statuses = defaultdict(Counter)
+    counter = iter(range(10 ** 9))
+    deadline = time.perf_counter() + seconds
+
+    async def client(n):
+        rng = random.Random(seed + n)
+        while time.perf_counter() < deadline:
+            _, priority, method, path, body = rng.choices(workload, weights)[0]
+            i = next(counter)
+            start = time.perf_counter()
+            status, _ = await asgi_request(app, method, path(i), body(i) if body else None, headers)
+            elapsed = (time.perf_counter() - start) * 1000
+            statuses[priority][status] += 1
+            samples[(priority, "served" if status < 500 else "rejected")].append(elapsed)
+            if status == 503:
+                # jittered, or the rejected clients come back as one wave
+                await asyncio.sleep(backoff * rng.uniform(0.5, 1.5))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    report = {"seconds": round(elapsed, 3), "priorities": {}}
+    for priority in ("critical", "read", "write", "bulk"):
+        row = {"statuses": {str(k): v for k, v in sorted(statuses[priority].items())}}
+        for outcome in ("served", "rejected"):
+            values = sorted(samples[(priority, outcome)])
+            row[outcome] = {
+                "count": len(values),
+                "p50_ms": round(_percentile(values, 0.50), 3),
+                "p99_ms": round(_percentile(values, 0.99), 3),
+                "max_ms": round(values[-1], 3) if values else 0.0,
+            }
+        report["priorities"][priority] = row
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Overload the app in-process and report how admission control holds up")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--pool-timeout", type=float, default=5)
+    parser.add_argument("--query-delay-ms", type=float, default=5, help="simulated database time per statement")
+    parser.add_argument("--backoff-ms", type=float, default=1000, help="client pause after a 503, as Retry-After asks")
+    parser.add_argument("--users", type=int, default=500, help="seeded users")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-admission", action="store_true", help="turn admission control off for comparison")
+    parser.add_argument("--max-p99-ms", type=float, help="fail if served reads have a higher p99")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="cms-overload-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'overload.db')}"
+    os.environ["DB_POOL_SIZE"] = str(args.pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+    os.environ["DB_POOL_TIMEOUT"] = str(args.pool_timeout)
+    os.environ["ADMISSION_ENABLED"] = "0" if args.no_admission else "1"
+    os.environ.setdefault("SECRET_KEY", "overload-secret")
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "0")
+
+    # imported only now so the app binds to the test database and settings
+    from sqlalchemy import event
+    from app.core.database import get_engine
+    from app.tools.seed import SeedConfig, _tune_sqlite, seed_dataset
+
+    engine = get_engine()
+    # WAL, so readers do not queue behind writers for the SQLite file lock
+    _tune_sqlite(engine)
+    config = SeedConfig(colleges=1, users=args.users, seed=args.seed)
+    seed_dataset(engine, config, log=lambda msg: None)
+    ctx = _prepare_context(config.password, 1)
+
+    from app.main import app
+
+    delay = args.query_delay_ms / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _slow(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(delay)
+
+    report = asyncio.run(run_load(app, ctx, args.clients, args.seconds, args.backoff_ms / 1000, args.seed))
+
+    mode = "off" if args.no_admission else "on"
+    print(f"{args.clients} clients for {report['seconds']} s, pool {args.pool_size}, admission {mode}")
+    for priority, row in report["priorities"].items():
+        served, rejected = row["served"], row["rejected"]
+        statuses = " ".join(f"{k}:{v}" for k, v in row["statuses"].items())
+        print(f"{priority:<9} served {served['count']:>6}  p50 {served['p50_ms']:>8.1f}  p99 {served['p99_ms']:>8.1f}  max {served['max_ms']:>8.1f} ms"
+              f"   rejected {rejected['count']:>6}  p99 {rejected['p99_ms']:>8.1f} ms   [{statuses}]")
+
+    if args.max_p99_ms is not None and report["priorities"]["read"]["served"]["p99_ms"] > args.max_p99_ms:
+        print(f"OVER BUDGET: served reads p99 {report['priorities']['read']['served']['p99_ms']} ms > {args.max_p99_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Replay captured traffic against a running instance.
+
+    TRAFFIC_CAPTURE_FILE=traffic.jsonl uvicorn app.main:app     # capture
+    python -m app.tools.replay traffic.jsonl --speed 5 --token "$TOKEN"
+
+Requests are sent at their original relative arrival times divided by
+--speed, so 5 replays an hour of traffic in 12 minutes with five times the
+arrival rate. Paths are rebuilt from the route template and the captured
+ids; bodies are synthesized from the captured shapes with fresh unique
+values, so creates do not collide with each other or with the original
+rows. Reports per-route latency percentiles and status counts.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+_counter = itertools.count(1)
+
+
+def synthesize(shape, run_id: str):
+    """Build a JSON value matching a shape recorded by TrafficCaptureMiddleware"""
+    if not isinstance(shape, dict) or "type" not in shape:
+        return shape  # a kept id
+    kind = shape["type"]
+    if kind == "object":
+        return {k: synthesize(v, run_id) for k, v in shape["fields"].items()}
+    if kind == "array":
+        return [synthesize(shape["items"], run_id) for _ in range(shape["len"])] if shape["items"] is not None else []
+    if kind == "int":
+        return next(_counter)
+    if kind == "float":
+        return float(next(_counter) % 10)
+    if kind == "bool":
+        return True
+    if kind == "secret":
+        return "replay-secret"
+    if kind == "str":
+        n = next(_counter)
+        fmt = shape.get("format")
+        if fmt == "email":
+            return f"replay{run_id}n{n}@replay.example.com"
+        if fmt == "digits":
+            return str(n).rjust(shape["len"], "0")[-max(shape["len"], 1):]
+        if fmt == "date":
+            return "2030-01-01"
+        text = f"replay{run_id}n{n}"
+        # keep the unique tail when the captured value was shorter
+        return text[-shape["len"]:] if 0 < shape["len"] < len(text) else text
+    return None
+
+
+def build_request(entry: dict, run_id: str):
+    """(method, path with query, JSON body or None) for a captured entry, or None if it cannot be replayed"""
+    route = entry["route"]
+    if route == "unmatched":
+        return None
+    path = route
+    for name, value in entry.get("path_params", {}).items():
+        path = path.replace("{" + name + "}", str(synthesize(value, run_id)))
+    query = {k: synthesize(v, run_id) for k, v in entry.get("query", {}).items()}
+    if query:
+        path += "?" + urlencode(query)
+    body = entry.get("body")
+    if body is not None:
+        if body.get("type") in ("bytes", "truncated"):
+            return None
+        body = synthesize(body, run_id)
+    return entry["method"], path, body
+
+
+class _Client:
+    """One keep-alive connection per worker thread"""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.conn = cls(parts.hostname, parts.port, timeout=60)
+        self.prefix = parts.path.rstrip("/")
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round((len(sorted_values) - 1) * pct)))]
+
+
+def replay(entries: list, base_url: str, speed: float, token: str = None, concurrency: int = 64) -> dict:
+    run_id = f"{int(time.time()) % 100000}"
+    local = threading.local()
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lock = threading.Lock()
+
+    def send(key, method, path, body):
+        if not hasattr(local, "client"):
+            local.client = _Client(base_url)
+        client = local.client
+        payload = json.dumps(body).encode() if body is not None else None
+        start = time.perf_counter()
+        try:
+            client.conn.request(method, client.prefix + path, body=payload, headers=headers)
+            response = client.conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            client.conn.close()
+            status = "error"
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies[key].append(elapsed)
+            statuses[key][status] += 1
+
+    skipped = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        first_ts = entries[0]["ts"] if entries else 0
+        for entry in entries:
+            request = build_request(entry, run_id)
+            if request is None:
+                skipped += 1
+                continue
+            due = (entry["ts"] - first_ts) / speed
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            method, path, body = request
+            pool.submit(send, f"{method} {entry['route']}", method, path, body)
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for key, values in sorted(latencies.items()):
+        values.sort()
+        routes[key] = {
+            "requests": len(values),
+            "p50_ms": round(_percentile(values, 0.50), 3),
+            "p90_ms": round(_percentile(values, 0.90), 3),
+            "p99_ms": round(_percentile(values, 0.99), 3),
+            "max_ms": round(values[-1], 3),
+            "statuses": {str(k): v for k, v in statuses[key].items()},
+        }
+    sent = sum(r["requests"] for r in routes.values())
+    return {
+        "speed": speed,
+        "requests": sent,
+        "skipped": skipped,
+        "seconds": round(elapsed, 3),
+        "rps": round(sent / elapsed, 1) if elapsed else 0.0,
+        "routes": routes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a running instance")
+    parser.add_argument("capture", help="JSONL file written by TrafficCaptureMiddleware")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression, e.g. 1, 5 or 10")
+    parser.add_argument("--token", help="bearer token sent with every request")
+    parser.add_argument("--concurrency", type=int, default=64, help="max requests in flight")
+    parser.add_argument("--limit", type=int, help="only replay the first N entries")
+    parser.add_argument("--output", help="write the report JSON here")
+    args = parser.parse_args(argv)
+
+    with open(args.capture) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda e: e["ts"])
+    if args.limit:
+        entries = entries[:args.limit]
+
+    report = replay(entries, args.base_url, args.speed, args.token, args.concurrency)
+
+    print(f"{report['requests']} requests in {report['seconds']} s ({report['rps']} req/s) at {args.speed}x, {report['skipped']} skipped")
+    for key, r in report["routes"].items():
+        statuses = " ".join(f"{k}:{v}" for k, v in sorted(r["statuses"].items()))
+        print(f"{key:<48} n={r['requests']:<6} p50 {r['p50_ms']:>8.2f}  p90 {r['p90_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f}  max {r['max_ms']:>8.2f} ms  [{statuses}]")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
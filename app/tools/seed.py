@@ -0,0 +1,346 @@
+"""
+Seed a synthetic dataset for scale testing.
+
+    python -m app.tools.seed --colleges 20 --users 1000000 --seed 42
+    python -m app.tools.seed --database-url sqlite:///scale.db --users 100000
+
+Rows are generated deterministically from --seed and written with
+executemany INSERTs in batches, with primary keys assigned up front so no
+generated ids have to be read back. Ids continue after the current maximum
+of each table, so a dataset can be seeded on top of existing data.
+"""
+import argparse
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.engine import Engine
+
+from app.core.database import Base
+from app.models.academic_year import AcademicYear
+from app.models.college import College
+from app.models.course import Course
+from app.models.education_type import EducationType
+from app.models.faculty import Faculty
+from app.models.permission import Permission
+from app.models.role import Role
+from app.models.role_permission import RolePermission
+from app.models.semester import Semester
+from app.models.student import Student
+from app.models.subject import Subject
+from app.models.user import User
+from app.models.user_role import UserRole
+import app.models.job  # noqa: F401  (registers tbl_jobs for create_all)
+import app.models.cache_version  # noqa: F401  (registers tbl_cache_versions for create_all)
+import app.models.college_shard  # noqa: F401  (registers tbl_college_shards for create_all)
+import app.models.user_login  # noqa: F401  (registers tbl_user_logins for create_all)
+
+# Fixed so that two runs with the same seed produce identical rows
+SEED_TIMESTAMP = datetime(2024, 6, 1, 9, 0, 0)
+SEED_YEAR = 2024
+
+PERMISSION_MODULES = [
+    "users", "roles", "permissions", "colleges", "academic_years", "education_types",
+    "courses", "semesters", "subjects", "faculty", "students", "jobs",
+]
+PERMISSION_ACTIONS = ["view", "create", "edit", "delete"]
+
+# role name -> permission actions granted on every module
+# (faculty profiles can only be created for Teacher or HOD users)
+COLLEGE_ROLES = {
+    "College Admin": PERMISSION_ACTIONS,
+    "Teacher": ["view"],
+    "Student": [],
+}
+
+EDUCATION_TYPES = [("UG", "Undergraduate", 4), ("PG", "Postgraduate", 2), ("DIP", "Diploma", 3), ("PHD", "Doctorate", 5)]
+SUBJECT_TYPES = ["theory", "practical", "elective", "project"]
+DESIGNATIONS = ["Professor", "Associate Professor", "Assistant Professor", "Lecturer"]
+CITIES = ["Pune", "Mumbai", "Nagpur", "Nashik", "Delhi", "Bengaluru", "Chennai", "Hyderabad", "Kolkata", "Jaipur"]
+WORDS = [
+    "applied", "advanced", "computer", "data", "digital", "systems", "mechanical", "civil", "electrical",
+    "science", "engineering", "management", "design", "analysis", "networks", "mathematics", "physics",
+    "chemistry", "economics", "commerce", "biology", "statistics", "software", "structures",
+]
+
+
+@dataclass
+class SeedConfig:
+    colleges: int = 5
+    education_types: int = 2
+    courses: int = 4
+    semesters: int = 8
+    subjects: int = 6
+    users: int = 10_000
+    faculty_ratio: float = 0.05
+    password: str = "password"
+    seed: int = 42
+    batch_size: int = 10_000
+
+
+def _next_id(conn, column) -> int:
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _insert(conn, model, rows: list, batch_size: int):
+    for i in range(0, len(rows), batch_size):
+        conn.execute(insert(model), rows[i:i + batch_size])
+
+
+def _name(rng: random.Random, words: int = 2) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+def _tune_sqlite(engine: Engine):
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.close()
+
+
+def seed_dataset(engine: Engine, config: SeedConfig, log=print) -> dict:
+    """Create the tables if needed and insert the dataset described by config; returns row counts"""
+    rng = random.Random(config.seed)
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    counts = {}
+
+    # ------------------------------------------------------------------
+    # Catalogue: colleges, curriculum, permissions and roles
+    # ------------------------------------------------------------------
+    with engine.begin() as conn:
+        existing = dict(conn.execute(select(Permission.permission_code, Permission.permission_id)).all())
+        permission_id = _next_id(conn, Permission.permission_id)
+        permissions = []
+        for module in PERMISSION_MODULES:
+            for action in PERMISSION_ACTIONS:
+                code = f"{module}.{action}"
+                if code not in existing:
+                    existing[code] = permission_id
+                    permissions.append({"permission_id": permission_id, "permission_code": code, "module": module,
+                                        "status": 1, "created_at": SEED_TIMESTAMP})
+                    permission_id += 1
+        _insert(conn, Permission, permissions, config.batch_size)
+        counts["permissions"] = len(permissions)
+
+        ids = {
+            "college": _next_id(conn, College.college_id),
+            "academic_year": _next_id(conn, AcademicYear.academic_year_id),
+            "education_type": _next_id(conn, EducationType.education_type_id),
+            "course": _next_id(conn, Course.course_id),
+            "semester": _next_id(conn, Semester.semester_id),
+            "subject": _next_id(conn, Subject.subject_id),
+            "role": _next_id(conn, Role.role_id),
+        }
+        rows = {key: [] for key in ("colleges", "academic_years", "education_types", "courses", "semesters", "subjects", "roles", "role_permissions")}
+        college_roles = {}
+
+        for _ in range(config.colleges):
+            college_id = ids["college"]
+            ids["college"] += 1
+            rows["colleges"].append({
+                "college_id": college_id,
+                "college_code": f"SEED{college_id:05d}",
+                "college_name": f"{_name(rng)} College {college_id}",
+                "college_type": rng.choice(["government", "private", "autonomous"]),
+                "city": rng.choice(CITIES),
+                "email": f"office@college{college_id}.seed",
+                "established_year": rng.randint(1950, 2015),
+                "status": 1,
+                "created_at": SEED_TIMESTAMP,
+            })
+            rows["academic_years"].append({
+                "academic_year_id": ids["academic_year"],
+                "college_id": college_id,
+                "year_code": f"{SEED_YEAR}-{SEED_YEAR + 1}",
+                "start_date": date(SEED_YEAR, 6, 1),
+                "end_date": date(SEED_YEAR + 1, 5, 31),
+                "is_current": 1,
+                "status": 1,
+                "created_at": SEED_TIMESTAMP,
+            })
+            ids["academic_year"] += 1
+
+            for type_code, type_name, years in EDUCATION_TYPES[:config.education_types]:
+                education_type_id = ids["education_type"]
+                ids["education_type"] += 1
+                rows["education_types"].append({
+                    "education_type_id": education_type_id, "college_id": college_id, "type_code": type_code,
+                    "type_name": type_name, "duration_years": years, "status": 1, "created_at": SEED_TIMESTAMP,
+                })
+                for c in range(config.courses):
+                    course_id = ids["course"]
+                    ids["course"] += 1
+                    rows["courses"].append({
+                        "course_id": course_id, "college_id": college_id, "education_type_id": education_type_id,
+                        "course_code": f"{type_code}{c + 1:02d}", "course_name": f"{type_name} in {_name(rng)}",
+                        "duration_years": years, "total_semesters": config.semesters,
+                        "intake_capacity": rng.choice([30, 60, 120, 180]), "status": 1, "created_at": SEED_TIMESTAMP,
+                    })
+                    for number in range(1, config.semesters + 1):
+                        semester_id = ids["semester"]
+                        ids["semester"] += 1
+                        rows["semesters"].append({
+                            "semester_id": semester_id, "course_id": course_id, "semester_number": number,
+                            "semester_name": f"Semester {number}", "status": 1, "created_at": SEED_TIMESTAMP,
+                        })
+                        for s in range(config.subjects):
+                            rows["subjects"].append({
+                                "subject_id": ids["subject"], "college_id": college_id, "course_id": course_id,
+                                "semester_id": semester_id, "subject_code": f"{type_code}{c + 1:02d}-{number}{s + 1:02d}",
+                                "subject_name": _name(rng, 3), "subject_type": rng.choice(SUBJECT_TYPES),
+                                "credits": rng.choice([2, 3, 4]), "status": 1, "created_at": SEED_TIMESTAMP,
+                            })
+                            ids["subject"] += 1
+
+            college_roles[college_id] = {}
+            for role_name, actions in COLLEGE_ROLES.items():
+                role_id = ids["role"]
+                ids["role"] += 1
+                college_roles[college_id][role_name] = role_id
+                rows["roles"].append({
+                    "role_id": role_id, "college_id": college_id, "role_code": role_name.upper().replace(" ", "_"),
+                    "role_name": role_name, "status": 1, "created_at": SEED_TIMESTAMP,
+                })
+                for module in PERMISSION_MODULES:
+                    for action in actions:
+                        rows["role_permissions"].append({"role_id": role_id, "permission_id": existing[f"{module}.{action}"], "status": 1})
+
+        # one Super Admin, attached to the first seeded college
+        first_college = rows["colleges"][0]["college_id"] if rows["colleges"] else None
+        if first_college is not None:
+            super_admin_role = ids["role"]
+            rows["roles"].append({
+                "role_id": super_admin_role, "college_id": first_college, "role_code": "SUPER_ADMIN",
+                "role_name": "Super Admin", "status": 1, "created_at": SEED_TIMESTAMP,
+            })
+            college_roles[first_college]["Super Admin"] = super_admin_role
+
+        for key, model in (
+            ("colleges", College), ("academic_years", AcademicYear), ("education_types", EducationType),
+            ("courses", Course), ("semesters", Semester), ("subjects", Subject),
+            ("roles", Role), ("role_permissions", RolePermission),
+        ):
+            _insert(conn, model, rows[key], config.batch_size)
+            counts[key] = len(rows[key])
+        log(f"catalogue: {', '.join(f'{k}={v}' for k, v in counts.items())}")
+
+    # ------------------------------------------------------------------
+    # People: users with roles, faculty and students, streamed in batches
+    # ------------------------------------------------------------------
+    password_hash = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(config.password)
+    college_ids = sorted(college_roles)
+    counts.update(users=0, user_roles=0, faculty=0, students=0)
+    if not college_ids or config.users <= 0:
+        counts["seconds"] = round(time.perf_counter() - started, 3)
+        return counts
+
+    with engine.connect() as conn:
+        user_id = _next_id(conn, User.user_id)
+        faculty_id = _next_id(conn, Faculty.faculty_id)
+        student_id = _next_id(conn, Student.student_id)
+
+    # first users are the admins: the Super Admin, then one College Admin per college
+    admins = [(college_ids[0], "Super Admin")] + [(cid, "College Admin") for cid in college_ids]
+    remaining = config.users
+    produced = 0
+    while remaining > 0:
+        n = min(config.batch_size, remaining)
+        users, user_roles, faculty, students = [], [], [], []
+        for _ in range(n):
+            if produced < len(admins):
+                college_id, role_name = admins[produced]
+            else:
+                college_id = college_ids[produced % len(college_ids)]
+                role_name = "Teacher" if rng.random() < config.faculty_ratio else "Student"
+            prefix = role_name.lower().replace(" ", "")
+            users.append({
+                "user_id": user_id, "college_id": college_id, "username": f"{prefix}{user_id}",
+                "email": f"{prefix}{user_id}@college{college_id}.seed", "phone": f"9{rng.randrange(10**9):09d}",
+                "password_hash": password_hash, "status": 1, "created_at": SEED_TIMESTAMP,
+            })
+            user_roles.append({"user_id": user_id, "role_id": college_roles[college_id][role_name], "status": 1})
+            if role_name == "Teacher":
+                faculty.append({
+                    "faculty_id": faculty_id, "user_id": user_id, "college_id": college_id,
+                    "employee_code": f"EMP{faculty_id:07d}", "designation": rng.choice(DESIGNATIONS),
+                    "status": 1, "created_at": SEED_TIMESTAMP,
+                })
+                faculty_id += 1
+            elif role_name == "Student":
+                students.append({
+                    "student_id": student_id, "user_id": user_id, "college_id": college_id,
+                    "admission_number": f"ADM{student_id:08d}", "admission_year": SEED_YEAR - rng.randrange(4),
+                    "status": 1, "created_at": SEED_TIMESTAMP,
+                })
+                student_id += 1
+            user_id += 1
+            produced += 1
+
+        with engine.begin() as conn:
+            conn.execute(insert(User), users)
+            conn.execute(insert(UserRole), user_roles)
+            if faculty:
+                conn.execute(insert(Faculty), faculty)
+            if students:
+                conn.execute(insert(Student), students)
+        counts["users"] += len(users)
+        counts["user_roles"] += len(user_roles)
+        counts["faculty"] += len(faculty)
+        counts["students"] += len(students)
+        remaining -= n
+
+        elapsed = time.perf_counter() - started
+        log(f"users: {counts['users']}/{config.users} ({counts['users'] / elapsed:,.0f} rows/s)")
+
+    counts["seconds"] = round(time.perf_counter() - started, 3)
+    return counts
+
+
+def main(argv=None):
+    defaults = SeedConfig()
+    parser = argparse.ArgumentParser(description="Seed a synthetic dataset for scale testing")
+    parser.add_argument("--database-url", help="SQLAlchemy URL; defaults to the app's configured database")
+    parser.add_argument("--colleges", type=int, default=defaults.colleges)
+    parser.add_argument("--education-types", type=int, default=defaults.education_types, help=f"per college, max {len(EDUCATION_TYPES)}")
+    parser.add_argument("--courses", type=int, default=defaults.courses, help="per education type")
+    parser.add_argument("--semesters", type=int, default=defaults.semesters, help="per course")
+    parser.add_argument("--subjects", type=int, default=defaults.subjects, help="per semester")
+    parser.add_argument("--users", type=int, default=defaults.users, help="total across all colleges")
+    parser.add_argument("--faculty-ratio", type=float, default=defaults.faculty_ratio)
+    parser.add_argument("--password", default=defaults.password, help="password of every seeded user")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from app.core.database import get_engine
+        engine = get_engine()
+    if engine.dialect.name == "sqlite":
+        _tune_sqlite(engine)
+
+    config = SeedConfig(
+        colleges=args.colleges,
+        education_types=min(args.education_types, len(EDUCATION_TYPES)),
+        courses=args.courses,
+        semesters=args.semesters,
+        subjects=args.subjects,
+        users=args.users,
+        faculty_ratio=args.faculty_ratio,
+        password=args.password,
+        seed=args.seed,
+        batch_size=args.batch_size,
+    )
+    counts = seed_dataset(engine, config)
+    print(", ".join(f"{k}={v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
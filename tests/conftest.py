@@ -0,0 +1,49 @@
+import os
+
+# settings are read at import: point the app at an in-memory database first
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import pytest
+from sqlalchemy import event
+
+from app.core.database import SessionLocal, get_engine
+from app.tools.seed import SeedConfig, seed_dataset
+import app.main  # noqa: F401  (registers every model)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    engine = get_engine()
+    seed_dataset(engine, SeedConfig(colleges=1, users=10, seed=1), log=lambda msg: None)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(engine):
+    """Counts the SQL statements sent to the database while the test runs"""
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
@@ -0,0 +1,86 @@
+"""
+Admission control sheds by priority as load rises, bulk writes first and
+logins last, rejects any priority once a class's queue is full, and
+answers a rejected request with 503 and a Retry-After that grows with the
+load.
+"""
+import anyio
+import pytest
+
+from app.core.admission import AdmissionController, admission
+from app.core.concurrency import ConcurrencyClass, _LimitedRoute
+from app.core.config import Settings, get_settings
+
+
+def _settings(**overrides):
+    return Settings(database_url=get_settings().database_url, secret_key="test-secret", **overrides)
+
+
+def _controller(**overrides):
+    controller = AdmissionController()
+    controller.configure(_settings(admission_max_in_flight=100, admission_max_pool_wait_ms=0, **overrides))
+    return controller
+
+
+@pytest.mark.parametrize("in_flight, admitted", [
+    (70, {"bulk", "write", "read", "critical"}),
+    (75, {"write", "read", "critical"}),
+    (90, {"read", "critical"}),
+    (100, {"critical"}),
+    (125, set()),
+])
+def test_priorities_are_shed_in_order(in_flight, admitted):
+    controller = _controller()
+    controller.in_flight = in_flight
+    for priority in ("bulk", "write", "read", "critical"):
+        expected = None if priority in admitted else "overloaded"
+        assert controller.check(priority, waiting=0) == expected, priority
+
+
+def test_full_queue_rejects_every_priority():
+    controller = _controller(admission_max_queue=5)
+    assert controller.check("critical", waiting=4) is None
+    assert controller.check("critical", waiting=5) == "queue_full"
+
+    assert _controller(admission_enabled=False, admission_max_queue=5).check("bulk", waiting=50) is None
+
+
+def test_retry_after_grows_with_the_load():
+    controller = _controller(admission_retry_after=2)
+    assert controller.retry_after_seconds() == 2
+    controller.in_flight = 250
+    assert controller.retry_after_seconds() == 5
+
+
+@pytest.fixture
+def overloaded():
+    saved = dict(vars(admission))
+    admission.configure(_settings(admission_max_in_flight=10, admission_max_pool_wait_ms=0, admission_retry_after=1))
+    admission.in_flight = 10
+    yield admission
+    vars(admission).update(saved)
+
+
+def test_rejected_requests_never_reach_the_route(overloaded):
+    calls, sent = [], []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope["path"])
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/admin/users/bulk", "headers": []}
+    bulk = _LimitedRoute(endpoint, ConcurrencyClass("tests.heavy", 1), "bulk")
+    anyio.run(bulk, scope, None, send)
+
+    assert calls == []
+    start = sent[0]
+    assert start["status"] == 503
+    assert (b"retry-after", b"1") in start["headers"]
+    assert overloaded.in_flight == 10
+
+    critical = _LimitedRoute(endpoint, ConcurrencyClass("tests.auth", 1), "critical")
+    anyio.run(critical, {**scope, "path": "/auth/login"}, None, send)
+    assert calls == ["/auth/login"]
+    assert overloaded.in_flight == 10
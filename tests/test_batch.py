@@ -0,0 +1,59 @@
+"""
+POST /batch runs sub-requests in-process with the caller's token: each
+gets the response a direct call would, keyed by its id, writes run in the
+order sent, and the batch endpoint cannot be reached from inside a batch.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.auth import create_access_token
+from app.main import app
+from app.models.education_type import EducationType
+from app.models.user import User
+
+COLLEGE_ID = 1
+
+
+@pytest.fixture
+def client(db):
+    user_id = db.query(User.user_id).filter(User.college_id == COLLEGE_ID).order_by(User.user_id).limit(1).scalar()
+    token = create_access_token({"user_id": user_id, "role_id": None, "college_id": COLLEGE_ID, "super_admin": False, "permissions": []})
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client, user_id
+
+
+def _education_type(code):
+    return {"college_id": COLLEGE_ID, "type_code": code, "type_name": code, "duration_years": 2}
+
+
+def test_sub_requests_share_the_callers_token(client, db):
+    client, user_id = client
+    res = client.post("/batch", json={"requests": [
+        {"id": "me", "path": "/auth/me"},
+        {"id": "types", "path": "/admin/education-types/?college_id=1"},
+        {"id": "first", "method": "POST", "path": "/admin/education-types/", "body": _education_type("BATCH1")},
+        {"id": "second", "method": "POST", "path": "/admin/education-types/", "body": _education_type("BATCH2")},
+        {"id": "missing", "method": "PATCH", "path": "/admin/education-types/999999999/toggle-status"},
+    ]})
+    assert res.status_code == 200, res.text
+    results = res.json()["results"]
+
+    assert list(results) == ["me", "types", "first", "second", "missing"]
+    assert results["me"]["status"] == 200 and results["me"]["body"]["user_id"] == user_id
+    assert results["types"]["status"] == 200 and isinstance(results["types"]["body"], list)
+    assert results["first"]["status"] == 201 and results["second"]["status"] == 201
+    assert results["first"]["body"]["education_type_id"] < results["second"]["body"]["education_type_id"]
+    # a failed sub-request does not fail the batch
+    assert results["missing"] == {**results["missing"], "status": 404, "body": {"detail": "Education type not found"}}
+    assert db.query(EducationType).filter(EducationType.type_code.in_(["BATCH1", "BATCH2"])).count() == 2
+
+
+def test_batch_cannot_be_nested_or_called_anonymously(client):
+    client, _ = client
+    for path in ("/batch", "/batch/", "/batch/?x=1", "batch"):
+        res = client.post("/batch", json={"requests": [{"id": "inner", "method": "POST", "path": path}]})
+        assert res.status_code == 400, path
+
+    anonymous = TestClient(app)
+    assert anonymous.post("/batch", json={"requests": [{"id": "me", "path": "/auth/me"}]}).status_code == 401
@@ -0,0 +1,55 @@
+"""
+Concurrent identical calls are coalesced: one computes while the others
+wait for its result, and waiters give up on a computation that takes
+longer than the timeout and compute the result themselves.
+"""
+import threading
+import time
+
+from app.core.cache import SingleFlight, VersionedCache
+
+
+def _call_concurrently(n, fn):
+    results = [None] * n
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, fn())) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_misses_compute_once():
+    cache = VersionedCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"value": 42}
+
+    results = _call_concurrently(8, lambda: cache.get_or_compute("test", "key", compute))
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    # a bump makes the next call compute again
+    cache.bump("test", publish=False)
+    cache.get_or_compute("test", "key", compute)
+    assert len(calls) == 2
+
+
+def test_waiters_compute_themselves_after_the_timeout():
+    flights = SingleFlight(timeout=0.05)
+    release = threading.Event()
+
+    def stuck():
+        release.wait(5)
+        return "leader"
+
+    leader = threading.Thread(target=lambda: flights.do("key", stuck))
+    leader.start()
+    time.sleep(0.02)
+    started = time.perf_counter()
+    assert flights.do("key", lambda: "direct") == "direct"
+    assert time.perf_counter() - started < 1
+    release.set()
+    leader.join()
@@ -0,0 +1,53 @@
+"""
+A bump published by one worker reaches the others through
+tbl_cache_versions: their next poll invalidates the namespace locally,
+once, while the publishing worker does not invalidate its own bump again.
+"""
+import pytest
+
+from app.core.cache import cache
+from app.core.cache_sync import CacheVersionSync
+from app.core.config import Settings, get_settings
+
+NAMESPACE = "tests.sync"
+
+
+@pytest.fixture
+def publisher(engine):
+    """A started worker whose thread only wakes to write what it is given"""
+    sync = CacheVersionSync()
+    sync.start(Settings(database_url=get_settings().database_url, secret_key="test-secret", cache_sync_interval=3600))
+    try:
+        yield sync
+    finally:
+        sync.stop()
+        cache._publishers.remove(sync.publish)
+
+
+def test_a_published_bump_invalidates_other_workers(publisher):
+    other = CacheVersionSync()
+    other.poll(baseline=True)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert cache.get_or_compute(NAMESPACE, "key", compute) == {"value": 1}
+
+    publisher.publish(NAMESPACE)
+    publisher.publish(NAMESPACE)
+    # joins the thread, so both have been written
+    publisher.stop()
+    # the other worker has not polled yet
+    assert cache.get_or_compute(NAMESPACE, "key", compute) == {"value": 1}
+
+    other.poll()
+    assert cache.get_or_compute(NAMESPACE, "key", compute) == {"value": 2}
+    other.poll()
+    assert cache.get_or_compute(NAMESPACE, "key", compute) == {"value": 2}
+
+    # the publisher's own bump is already accounted for
+    version = cache.version(NAMESPACE)
+    publisher.poll()
+    assert cache.version(NAMESPACE) == version
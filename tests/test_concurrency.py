@@ -0,0 +1,60 @@
+"""
+Each API route runs inside the capacity limiter of its concurrency class:
+logins and heavy routes have their own, other sync routes share "light"
+(what the threadpool has left), and async routes such as /batch are not
+limited so they never hold a slot their sub-requests need.
+"""
+import anyio
+from fastapi.routing import APIRoute
+
+from app.core.concurrency import DEFAULT_ROUTE_CLASSES, ConcurrencyClass, build_classes, route_class
+from app.core.config import Settings, get_settings
+from app.main import app
+
+
+def _settings(**overrides):
+    return Settings(database_url=get_settings().database_url, secret_key="test-secret", **overrides)
+
+
+def _route(method, path):
+    return next(r for r in app.routes if isinstance(r, APIRoute) and r.path == path and method in r.methods)
+
+
+def test_routes_are_assigned_to_their_class():
+    assert route_class(_route("POST", "/auth/login"), DEFAULT_ROUTE_CLASSES) == "auth"
+    assert route_class(_route("POST", "/admin/users/bulk"), DEFAULT_ROUTE_CLASSES) == "heavy"
+    assert route_class(_route("GET", "/admin/education-types/"), DEFAULT_ROUTE_CLASSES) == "light"
+    assert route_class(_route("POST", "/batch"), DEFAULT_ROUTE_CLASSES) is None
+    # an override by method and path, or a route taken out of any class
+    overrides = {**DEFAULT_ROUTE_CLASSES, "GET /admin/education-types/": "heavy", "POST /auth/login": "none"}
+    assert route_class(_route("GET", "/admin/education-types/"), overrides) == "heavy"
+    assert route_class(_route("POST", "/auth/login"), overrides) is None
+
+
+def test_light_gets_what_the_threadpool_has_left():
+    classes = build_classes(_settings(threadpool_tokens=20, concurrency_limits="heavy=4"))
+    assert {name: c.capacity for name, c in classes.items()} == {"auth": 8, "heavy": 4, "light": 8}
+
+    classes = build_classes(_settings(threadpool_tokens=10))
+    assert classes["light"].capacity == 1
+    assert build_classes(_settings(concurrency_limits="light=3"))["light"].capacity == 3
+
+
+def test_a_class_runs_no_more_requests_than_its_capacity():
+    cls = ConcurrencyClass("tests.single", 1)
+    running, peak = 0, 0
+
+    async def endpoint(scope, receive, send):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await anyio.sleep(0.01)
+        running -= 1
+
+    async def main():
+        async with anyio.create_task_group() as tg:
+            for _ in range(3):
+                tg.start_soon(cls.run, endpoint, {}, None, None)
+
+    anyio.run(main)
+    assert peak == 1 and cls.waiting == 0
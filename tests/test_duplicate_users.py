@@ -0,0 +1,64 @@
+"""
+Emails and usernames are unique regardless of case on every path that
+creates or renames a user, single or bulk, on SQLite as on MySQL.
+"""
+from app.models.role import Role
+from app.schemas.student_schema import StudentCreate, StudentUpdate
+from app.schemas.user_schema import UserCreate
+from app.services.student_service import admit_students_batch, create_student, update_student
+from app.services.user_service import bulk_create_users, create_user
+
+COLLEGE_ID = 1
+
+
+def _role_id(db, name):
+    return db.query(Role.role_id).filter(Role.college_id == COLLEGE_ID, Role.role_name == name).scalar()
+
+
+def _student(admission_number, email, name):
+    return StudentCreate(college_id=COLLEGE_ID, admission_number=admission_number, admission_year=2024, email=email, name=name)
+
+
+def test_create_student_rejects_case_variants(db):
+    assert "error" not in create_student(db, _student("DUP-1", "dup.one@test.example", "DupOne"))
+
+    assert create_student(db, _student("DUP-2", "Dup.One@Test.Example", "DupTwo")) == {"error": "Email already exists"}
+    assert create_student(db, _student("DUP-3", "dup.three@test.example", "DUPONE")) == {"error": "Username already exists"}
+
+
+def test_update_student_rejects_case_variants(db):
+    create_student(db, _student("DUP-4", "dup.four@test.example", "DupFour"))
+    other = create_student(db, _student("DUP-5", "dup.five@test.example", "DupFive"))
+
+    res = update_student(db, other["student_id"], StudentUpdate(
+        admission_number="DUP-5", admission_year=2024, email="DUP.FOUR@test.example", name="DupFive", status="active",
+    ))
+    assert res == {"error": "Email already exists"}
+
+
+def test_admission_batch_rejects_case_variants(db):
+    create_student(db, _student("DUP-6", "dup.six@test.example", "DupSix"))
+
+    inserted, errors = admit_students_batch(db, COLLEGE_ID, None, [
+        {"admission_number": "DUP-7", "admission_year": 2024, "email": "Dup.Six@test.example", "name": "DupSeven"},
+        {"admission_number": "DUP-8", "admission_year": 2024, "email": "dup.eight@test.example", "name": "dupsix"},
+        {"admission_number": "DUP-9", "admission_year": 2024, "email": "dup.nine@test.example", "name": "DupNine"},
+    ], first_row=1)
+    assert inserted == 1
+    assert [(e["row"], e["error"]) for e in errors] == [(1, "Email already exists"), (2, "Username already exists")]
+
+
+def test_bulk_import_rejects_case_variants(db):
+    role_id = _role_id(db, "Teacher")
+    create_user(db, UserCreate(name="DupTen", email="dup.ten@test.example", phone=None, role_id=role_id, college_id=COLLEGE_ID))
+
+    res = bulk_create_users(db, [
+        {"name": "DupEleven", "email": "DUP.TEN@test.example", "role_id": role_id, "college_id": COLLEGE_ID},
+        {"name": "dupten", "email": "dup.twelve@test.example", "role_id": role_id, "college_id": COLLEGE_ID},
+        {"name": "DupThirteen", "email": "dup.thirteen@test.example", "role_id": role_id, "college_id": COLLEGE_ID},
+        {"name": "DUPTHIRTEEN", "email": "dup.fourteen@test.example", "role_id": role_id, "college_id": COLLEGE_ID},
+    ])
+    assert res["inserted"] == 1
+    assert [(e["row"], e["error"]) for e in res["errors"]] == [
+        (1, "Email already exists"), (2, "Username already exists"), (4, "Username already exists"),
+    ]
@@ -0,0 +1,92 @@
+"""
+tbl_jobs as a queue: a job is claimed by one worker only, cancelled at
+once while queued or at its next progress update while running, and a
+job whose worker stopped beating is requeued for another worker, whose
+result is then the one kept.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.jobs import JobWorkerPool, job_handler
+from app.models.job import Job
+from app.services.job_service import cancel_job, get_job, submit_job
+
+
+@job_handler("tests.echo")
+def _echo(ctx, params):
+    return params
+
+
+@job_handler("tests.progress")
+def _progress(ctx, params):
+    ctx.progress(1, 2, force=True)
+    return {"done": True}
+
+
+def _worker(name):
+    pool = JobWorkerPool(workers=0)
+    pool.worker_id = name
+    pool.stale_seconds = 60
+    return pool
+
+
+def _job(db, job_id):
+    db.expire_all()
+    return get_job(db, job_id)
+
+
+@pytest.fixture
+def queue(db):
+    """Nothing else queued, so the workers below claim the test's jobs"""
+    db.query(Job).filter(Job.status == "queued").update({"status": "cancelled"})
+    db.commit()
+    return db
+
+
+def test_a_job_is_claimed_once_and_run(queue):
+    db = queue
+    job_id = submit_job(db, "tests.echo", {"value": 1})["job_id"]
+    first, second = _worker("w1"), _worker("w2")
+
+    assert first._claim_next() == job_id
+    assert second._claim_next() is None
+    first._execute(job_id)
+
+    job = _job(db, job_id)
+    assert job["status"] == "completed" and job["result"] == {"value": 1}
+
+
+def test_cancel_queued_and_running_jobs(queue):
+    db = queue
+    queued = submit_job(db, "tests.echo", {})["job_id"]
+    assert cancel_job(db, queued)["status"] == "cancelled"
+    assert _worker("w1")._claim_next() is None
+    assert cancel_job(db, queued) == {"error": "Job already cancelled"}
+
+    running = submit_job(db, "tests.progress", {})["job_id"]
+    worker = _worker("w1")
+    assert worker._claim_next() == running
+    res = cancel_job(db, running)
+    assert res["status"] == "running" and res["cancel_requested"]
+    # the handler stops at its progress update
+    worker._execute(running)
+    assert _job(db, running)["status"] == "cancelled"
+
+
+def test_stale_jobs_are_requeued_for_another_worker(queue):
+    db = queue
+    job_id = submit_job(db, "tests.echo", {"value": 2})["job_id"]
+    dead, alive = _worker("dead"), _worker("alive")
+    assert dead._claim_next() == job_id
+
+    db.query(Job).filter(Job.job_id == job_id).update({"heartbeat_at": datetime.utcnow() - timedelta(seconds=120)})
+    db.commit()
+    alive._requeue_stale()
+    assert alive._claim_next() == job_id
+
+    # the first worker coming back late does not overwrite the new owner's run
+    dead._finish(job_id, status="failed", error="late")
+    assert _job(db, job_id)["status"] == "running"
+    alive._execute(job_id)
+    assert _job(db, job_id)["status"] == "completed"
@@ -0,0 +1,57 @@
+"""
+/metrics reports requests by route template with the SQL they ran, and
+the connection pool of each engine once: an engine created again replaces
+the pool collector of the one before, which is not kept alive by it.
+"""
+import gc
+import re
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from app.core.metrics import instrument_engine, registry
+from app.main import app
+
+
+def _sample(text, name, **labels):
+    """Value of the series `name` with exactly these labels, or None"""
+    rendered = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    series = f"{name}{{{rendered}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_requests_are_counted_by_route(engine):
+    client = TestClient(app)
+    route = "/admin/education-types/"
+    text = client.get("/metrics").text
+    requests = _sample(text, "http_requests_total", method="GET", route=route, status="200") or 0
+    queries = _sample(text, "db_queries_per_request_sum", route=route) or 0
+
+    assert client.get(route, params={"college_id": 1}).status_code == 200
+    text = client.get("/metrics").text
+
+    assert _sample(text, "http_requests_total", method="GET", route=route, status="200") == requests + 1
+    assert _sample(text, "db_queries_per_request_sum", route=route) > queries
+
+
+def test_pool_collector_follows_the_latest_engine():
+    collectors = len(registry._collectors)
+    first = create_engine("sqlite://")
+    first.shard_name = "metrics-test"
+    instrument_engine(first)
+    assert len(registry._collectors) == collectors + 1
+
+    second = create_engine("sqlite://")
+    second.shard_name = "metrics-test"
+    instrument_engine(second)
+    assert len(registry._collectors) == collectors + 1
+
+    first.dispose()
+    del first
+    gc.collect()
+    second.dispose()
+    del second
+    gc.collect()
+    # the collector does not hold the engine, and skips it once it is gone
+    assert "db_shard_pool_size" in registry.render()
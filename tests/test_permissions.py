@@ -0,0 +1,76 @@
+"""
+Role permissions are set from the permission catalog: only active codes
+can be granted, and a write to tbl_permissions is seen once the
+namespace is bumped.
+"""
+import pytest
+
+from app.models.permission import Permission
+from app.models.role import Role
+from app.services.permission_service import get_permission_catalog, invalidate_permissions
+from app.services.role_service import get_roles_with_permissions, set_role_permissions
+
+COLLEGE_ID = 1
+
+
+@pytest.fixture
+def permissions(db):
+    """An active and an inactive permission"""
+    for code, status in (("perm.active", 1), ("perm.inactive", 0)):
+        if db.query(Permission).filter(Permission.permission_code == code).first() is None:
+            db.add(Permission(permission_code=code, module="test", status=status))
+    db.commit()
+    invalidate_permissions()
+    return "perm.active", "perm.inactive"
+
+
+def _role_id(db):
+    return db.query(Role.role_id).filter(Role.college_id == COLLEGE_ID, Role.role_name == "Teacher").scalar()
+
+
+def test_inactive_permissions_cannot_be_granted(db, permissions):
+    active, inactive = permissions
+    role_id = _role_id(db)
+
+    assert set_role_permissions(db, role_id, [active, inactive]) == {"error": f"Unknown permission codes: {inactive}"}
+    res = set_role_permissions(db, role_id, [active])
+    assert res["permissions"] == [active] and active in res["added"]
+
+
+def test_roles_are_listed_in_a_fixed_number_of_queries(db, count_queries, permissions):
+    active, _ = permissions
+    role_id = _role_id(db)
+    set_role_permissions(db, role_id, [active])
+    get_permission_catalog(db)
+    count_queries.statements.clear()
+
+    roles = get_roles_with_permissions(db, COLLEGE_ID)
+    assert len(roles) > 1
+    assert next(r for r in roles if r["id"] == role_id)["permissions"] == [active]
+    # the roles, then their permissions and their user counts for all of them
+    assert count_queries.count <= 3, count_queries.statements
+
+
+def test_catalog_is_reused_until_the_namespace_is_bumped(db, count_queries):
+    permission = db.query(Permission).filter(Permission.permission_code == "perm.toggled").first()
+    if permission is None:
+        permission = Permission(permission_code="perm.toggled", module="test")
+        db.add(permission)
+    permission.status = 0
+    db.commit()
+    invalidate_permissions()
+
+    catalog = get_permission_catalog(db)
+    assert "perm.toggled" not in {p.permission_code for p in catalog.active}
+    count_queries.statements.clear()
+    assert get_permission_catalog(db) is catalog
+    assert count_queries.count == 0, count_queries.statements
+
+    permission.status = 1
+    db.commit()
+    # a write nobody announced is not seen
+    assert get_permission_catalog(db) is catalog
+    invalidate_permissions()
+    refreshed = get_permission_catalog(db)
+    assert refreshed is not catalog
+    assert "perm.toggled" in {p.permission_code for p in refreshed.active}
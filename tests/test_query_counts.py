@@ -0,0 +1,128 @@
+"""
+Creates validate in one query and insert in one flush, with server
+defaults returned by the INSERT and response names taken from the
+validation query: at most two round trips (see app/core/database.py
+unit_of_work). A user is a parent and a child row, so it takes three.
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.models.course import Course
+from app.models.education_type import EducationType
+from app.models.role import Role
+from app.models.semester import Semester
+from app.schemas.academic_year_schema import AcademicYearCreate
+from app.schemas.course_schema import CourseCreate
+from app.schemas.faculty_schema import FacultyCreate
+from app.schemas.semester_schema import SemesterCreate
+from app.schemas.subject_schema import SubjectCreate
+from app.schemas.user_schema import UserCreate
+from app.services.academic_year_service import create_academic_year
+from app.services.course_service import create_course
+from app.services.faculty_service import FacultyService
+from app.services.semester_service import create_semester
+from app.services.subject_service import create_subject
+from app.services.user_service import create_user
+
+COLLEGE_ID = 1
+
+
+def _role_id(db, name):
+    return db.query(Role.role_id).filter(Role.college_id == COLLEGE_ID, Role.role_name == name).scalar()
+
+
+def _new_user(db, name, role="Teacher"):
+    return create_user(db, UserCreate(
+        name=name, email=f"{name}@test.example", phone=None,
+        role_id=_role_id(db, role), college_id=COLLEGE_ID,
+    ))
+
+
+def test_create_course(db, count_queries):
+    education_type_id = db.query(EducationType.education_type_id).filter(EducationType.college_id == COLLEGE_ID).limit(1).scalar()
+    count_queries.statements.clear()
+    res = create_course(db, CourseCreate(
+        college_id=COLLEGE_ID, education_type_id=education_type_id,
+        course_code="QC1", course_name="Query Count", duration_years=3, total_semesters=6,
+    ))
+    assert "error" not in res
+    assert res["college_name"] and res["education_type_name"] and res["created_at"]
+    assert count_queries.count <= 2, count_queries.statements
+
+
+def test_create_semester(db, count_queries):
+    course_id = db.query(Course.course_id).filter(Course.college_id == COLLEGE_ID).limit(1).scalar()
+    count_queries.statements.clear()
+    res = create_semester(db, SemesterCreate(course_id=course_id, semester_number=99, semester_name="Extra"))
+    assert "error" not in res
+    assert count_queries.count <= 2, count_queries.statements
+
+
+def test_create_subject(db, count_queries):
+    course_id, semester_id = db.query(Semester.course_id, Semester.semester_id).join(Course).filter(Course.college_id == COLLEGE_ID).first()
+    count_queries.statements.clear()
+    res = create_subject(db, SubjectCreate(
+        college_id=COLLEGE_ID, course_id=course_id, semester_id=semester_id,
+        subject_code="QS1", subject_name="Query Count", subject_type="theory", credits=3,
+    ))
+    assert "error" not in res
+    assert res["course_name"] and res["semester_name"] and res["created_at"]
+    assert count_queries.count <= 2, count_queries.statements
+
+
+def test_create_academic_year(db, count_queries):
+    count_queries.statements.clear()
+    res = create_academic_year(db, AcademicYearCreate(
+        college_id=COLLEGE_ID, year_code="2090-91", start_date="2090-06-01", end_date="2091-05-31",
+    ))
+    assert "error" not in res
+    assert res["created_at"]
+    assert count_queries.count <= 2, count_queries.statements
+
+
+def test_create_user(db, count_queries):
+    role_id = _role_id(db, "Teacher")
+    count_queries.statements.clear()
+    res = create_user(db, UserCreate(name="qcuser", email="qcuser@test.example", phone=None, role_id=role_id, college_id=COLLEGE_ID))
+    assert "error" not in res
+    assert res["role_name"] == "Teacher" and res["college_name"] and res["created_at"]
+    # validation, then the user and its role assignment
+    assert count_queries.count <= 3, count_queries.statements
+
+
+def test_create_faculty(db, count_queries):
+    user_id = _new_user(db, "qcteacher")["user_id"]
+    count_queries.statements.clear()
+    res = FacultyService.create_faculty(db, FacultyCreate(
+        user_id=user_id, college_id=COLLEGE_ID, employee_code="QCEMP1", designation="Lecturer",
+    ))
+    assert res["full_name"] == "qcteacher" and res["college_name"] and res["created_at"]
+    assert count_queries.count <= 2, count_queries.statements
+
+
+def test_create_faculty_rejects_unknown_user(db, count_queries):
+    count_queries.statements.clear()
+    with pytest.raises(HTTPException) as exc:
+        FacultyService.create_faculty(db, FacultyCreate(user_id=10 ** 9, college_id=COLLEGE_ID, employee_code="QCEMP2", designation="Lecturer"))
+    assert exc.value.detail == "Invalid user"
+    assert count_queries.count == 1, count_queries.statements
+
+
+def test_create_faculty_rejects_taken_employee_code(db, count_queries):
+    first = _new_user(db, "qcteacher2")["user_id"]
+    FacultyService.create_faculty(db, FacultyCreate(user_id=first, college_id=COLLEGE_ID, employee_code="QCEMP3", designation="Lecturer"))
+    second = _new_user(db, "qcteacher3")["user_id"]
+    count_queries.statements.clear()
+    with pytest.raises(HTTPException) as exc:
+        FacultyService.create_faculty(db, FacultyCreate(user_id=second, college_id=COLLEGE_ID, employee_code="QCEMP3", designation="Lecturer"))
+    assert exc.value.detail == "Employee code already exists"
+    assert count_queries.count == 1, count_queries.statements
+
+
+def test_create_faculty_rejects_student(db, count_queries):
+    user_id = _new_user(db, "qcstudent", role="Student")["user_id"]
+    count_queries.statements.clear()
+    with pytest.raises(HTTPException) as exc:
+        FacultyService.create_faculty(db, FacultyCreate(user_id=user_id, college_id=COLLEGE_ID, employee_code="QCEMP4", designation="Lecturer"))
+    assert exc.value.detail == "User must have role Teacher or HOD"
+    assert count_queries.count == 1, count_queries.statements
@@ -0,0 +1,49 @@
+"""
+Login attempts are limited per email and per client IP before the route
+runs: once a bucket is empty the attempt gets 429 with a Retry-After and
+costs no query or password hash, while other emails are not affected.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import Settings, get_settings
+from app.core.ratelimit import LoginRateLimiter, MemoryBackend
+from app.main import app
+
+
+@pytest.fixture
+def limiter():
+    route = next(r for r in app.routes if getattr(r, "path", None) == "/auth/login" and "POST" in r.methods)
+    limiter = route.app.limiter
+    limiter.backend.clear()
+    yield limiter
+    limiter.backend.clear()
+
+
+def _login(client, email):
+    return client.post("/auth/login", json={"email": email, "password": "wrong-password"})
+
+
+def test_repeated_attempts_on_an_email_are_rejected_before_the_db(engine, limiter, count_queries):
+    client = TestClient(app)
+    for _ in range(limiter.email_burst):
+        assert _login(client, "nobody@example.com").status_code == 401
+
+    count_queries.statements.clear()
+    res = _login(client, " Nobody@Example.com ")
+    assert res.status_code == 429
+    assert int(res.headers["Retry-After"]) >= 1
+    assert count_queries.count == 0, count_queries.statements
+
+    assert _login(client, "someone-else@example.com").status_code == 401
+
+
+def test_client_ip_bucket_covers_every_email():
+    settings = Settings(database_url=get_settings().database_url, secret_key="test-secret", login_ip_burst=3)
+    limiter = LoginRateLimiter(settings, MemoryBackend())
+    for n in range(3):
+        assert limiter.check("10.0.0.1", f"user{n}@example.com") == (None, 0.0)
+
+    kind, retry_after = limiter.check("10.0.0.1", "user9@example.com")
+    assert kind == "ip" and retry_after > 0
+    assert limiter.check("10.0.0.2", "user9@example.com") == (None, 0.0)
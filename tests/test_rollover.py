@@ -0,0 +1,76 @@
+"""
+An academic year rollover clones each active course, semester and subject
+of the college exactly once, even when two courses share a code, and a
+dry run of the current year stops before counting anything.
+"""
+from datetime import date
+from itertools import count
+
+import pytest
+
+from app.models.academic_year import AcademicYear
+from app.models.college import College
+from app.models.course import Course
+from app.models.education_type import EducationType
+from app.models.semester import Semester
+from app.models.subject import Subject
+from app.services.academic_year_service import rollover_academic_year
+
+_codes = count(1)
+
+
+@pytest.fixture
+def curriculum(db):
+    """A college of its own with two active courses sharing a code, two semesters each and a subject per semester"""
+    college = College(college_code=f"ROLL{next(_codes)}", college_name="Rollover College", college_type="private", status=1)
+    db.add(college)
+    db.flush()
+    education_type = EducationType(college_id=college.college_id, type_code="UG", type_name="UG", duration_years=3)
+    db.add(education_type)
+    db.flush()
+    for name in ("Physics", "Chemistry"):
+        course = Course(
+            college_id=college.college_id, education_type_id=education_type.education_type_id,
+            course_code="BSC", course_name=name, duration_years=3, total_semesters=2,
+        )
+        db.add(course)
+        db.flush()
+        for number in (1, 2):
+            semester = Semester(course_id=course.course_id, semester_number=number, semester_name=f"{name} {number}")
+            db.add(semester)
+            db.flush()
+            db.add(Subject(
+                college_id=college.college_id, course_id=course.course_id, semester_id=semester.semester_id,
+                subject_code=f"{name[:3].upper()}{number}", subject_name=f"{name} {number}", subject_type="theory",
+            ))
+    years = [
+        AcademicYear(college_id=college.college_id, year_code=code, start_date=date(y, 6, 1), end_date=date(y + 1, 5, 31), is_current=current)
+        for code, y, current in (("2024-25", 2024, 1), ("2025-26", 2025, 0))
+    ]
+    db.add_all(years)
+    db.commit()
+    return college.college_id, years[0].academic_year_id, years[1].academic_year_id
+
+
+def test_courses_sharing_a_code_are_cloned_once_each(db, curriculum):
+    college_id, _, next_year = curriculum
+
+    res = rollover_academic_year(db, next_year)
+    assert (res["courses"], res["semesters"], res["subjects"]) == (2, 4, 4)
+
+    courses = db.query(Course).filter(Course.college_id == college_id, Course.status == 1).all()
+    assert sorted(c.course_name for c in courses) == ["Chemistry", "Physics"]
+    for course in courses:
+        semesters = db.query(Semester).filter(Semester.course_id == course.course_id, Semester.status == 1).all()
+        assert sorted(s.semester_name for s in semesters) == [f"{course.course_name} 1", f"{course.course_name} 2"]
+        subjects = db.query(Subject.subject_name, Subject.semester_id).filter(Subject.course_id == course.course_id, Subject.status == 1).all()
+        assert sorted(subjects) == sorted((s.semester_name, s.semester_id) for s in semesters)
+
+
+def test_dry_run_of_the_current_year_does_not_count(db, curriculum, count_queries):
+    _, current_year, _ = curriculum
+    count_queries.statements.clear()
+
+    assert rollover_academic_year(db, current_year, dry_run=True) == {"error": "Academic year is already current"}
+    # the year and the college's current year
+    assert count_queries.count <= 2, count_queries.statements
@@ -0,0 +1,203 @@
+"""
+Colleges sharded over two SQLite files next to the in-memory directory
+(the conftest database, also the "default" shard): writes and reads are
+routed to the college's shard, emails are unique over all shards through
+tbl_user_logins, writes of a college being moved answer 503, and
+app.tools.move_college moves a college's rows end to end.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select, update
+
+from app.api.auth import hash_password, init_auth
+from app.core import sharding
+from app.core.cache import cache
+from app.core.config import Settings, configure, get_settings
+from app.core.login_index import reconcile_login_index
+from app.core.sharding import SHARDS_NAMESPACE, close_shards, init_shards
+from app.main import create_app
+from app.models.college import College
+from app.models.college_shard import CollegeShard
+from app.models.education_type import EducationType
+from app.models.role import Role
+from app.models.user import User
+from app.models.user_login import UserLogin
+from app.tools.move_college import move_college
+
+ID_BLOCK = 1_000_000
+
+
+@pytest.fixture(scope="module")
+def sharded(engine, tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("shards")
+    previous = get_settings()
+    settings = Settings(
+        database_url=previous.database_url,
+        secret_key="test-secret",
+        shards=f"s1=sqlite:///{tmp / 's1.db'},s2=sqlite:///{tmp / 's2.db'}",
+        cache_sync_interval=0,
+        login_rate_limit_enabled=False,
+        admission_enabled=False,
+    )
+    app = create_app(settings)
+    # what the lifespan does, against the conftest directory engine
+    init_auth(settings)
+    router = init_shards(settings)
+    reconcile_login_index()
+    try:
+        yield TestClient(app), router
+    finally:
+        close_shards()
+        configure(previous)
+        cache.bump(SHARDS_NAMESPACE)
+
+
+class StatementCounter:
+    """Counts the statements sent to each shard while the block runs"""
+
+    def __init__(self, engines):
+        self.engines = engines
+        self.counts = {name: 0 for name in engines}
+        self._listeners = {name: self._listener(name) for name in engines}
+
+    def _listener(self, name):
+        def count(conn, cursor, statement, parameters, context, executemany):
+            self.counts[name] += 1
+        return count
+
+    def __enter__(self):
+        for name, engine in self.engines.items():
+            event.listen(engine, "before_cursor_execute", self._listeners[name])
+        return self
+
+    def __exit__(self, *exc):
+        for name, engine in self.engines.items():
+            event.remove(engine, "before_cursor_execute", self._listeners[name])
+
+
+def _rows(engine, query):
+    with engine.connect() as conn:
+        return conn.execute(query).all()
+
+
+def _new_college(client, router, code, shard) -> int:
+    res = client.post("/admin/colleges/", json={"college_code": code, "college_name": code, "college_type": "private"})
+    assert res.status_code == 200, res.text
+    college_id = _rows(router.directory, select(College.college_id).where(College.college_code == code))[0][0]
+    with router.directory.begin() as conn:
+        conn.execute(CollegeShard.__table__.insert().values(college_id=college_id, shard=shard, status="active"))
+    cache.bump(SHARDS_NAMESPACE)
+    return college_id
+
+
+def _new_role(router, college_id) -> int:
+    with router.engines[router.shard_of(college_id)].begin() as conn:
+        return conn.execute(Role.__table__.insert().values(college_id=college_id, role_code="TEACHER", role_name="Teacher", status=1)).inserted_primary_key[0]
+
+
+def _education_type(college_id, code):
+    return {"college_id": college_id, "type_code": code, "type_name": code, "duration_years": 3}
+
+
+def test_writes_and_reads_are_routed_to_the_college_shard(sharded):
+    client, router = sharded
+    college_id = _new_college(client, router, "SHA", "s1")
+    # SQLite shards count ids from the largest present; start above the
+    # default shard's, as MySQL shards' id blocks do, so the id is unambiguous
+    with router.engines["s1"].begin() as conn:
+        conn.execute(EducationType.__table__.insert().values(
+            education_type_id=ID_BLOCK, college_id=college_id, type_code="OLD", type_name="Old", duration_years=1, status=0,
+        ))
+
+    res = client.post("/admin/education-types/", json=_education_type(college_id, "UG"))
+    assert res.status_code == 201, res.text
+    type_id = res.json()["education_type_id"]
+    where = select(EducationType.education_type_id).where(EducationType.college_id == college_id)
+    assert [r[0] for r in _rows(router.engines["s1"], where)] == [ID_BLOCK, type_id]
+    assert _rows(router.engines["s2"], where) == [] and _rows(router.directory, where) == []
+
+    listed = client.get("/admin/education-types/", params={"college_id": college_id})
+    assert type_id in [t["education_type_id"] for t in listed.json()]
+
+    # addressed by id only: found on s1 once, then the cached college routes it
+    update_body = {"type_code": "UG", "type_name": "Undergraduate", "duration_years": 3, "status": "active"}
+    assert client.put(f"/admin/education-types/{type_id}", json=update_body).status_code == 200
+    with StatementCounter(router.engines) as counter:
+        assert client.put(f"/admin/education-types/{type_id}", json=update_body).status_code == 200
+    assert counter.counts["s1"] > 0
+    assert counter.counts["s2"] == 0
+
+
+def test_emails_are_unique_over_shards_and_login_asks_one_shard(sharded):
+    client, router = sharded
+    first = _new_college(client, router, "SHB", "s2")
+    second = _new_college(client, router, "SHC", "s1")
+
+    user = {"name": "sharded.user", "email": "sharded.user@test.example", "phone": None, "role_id": _new_role(router, first), "college_id": first}
+    res = client.post("/admin/users/", json=user)
+    assert res.status_code == 200, res.text
+    user_id = res.json()["user_id"]
+    entry = _rows(router.directory, select(UserLogin.college_id, UserLogin.user_id).where(UserLogin.email == "sharded.user@test.example"))
+    assert entry == [(first, user_id)]
+
+    other = {**user, "name": "other.user", "email": "Sharded.User@Test.Example", "role_id": _new_role(router, second), "college_id": second}
+    res = client.post("/admin/users/", json=other)
+    assert res.status_code == 400 and res.json()["detail"] == "Email already exists"
+    res = client.post("/admin/users/bulk", json=[{**other, "email": "other.user@test.example", "name": "SHARDED.USER"}])
+    assert res.json()["errors"][0]["error"] == "Username already exists"
+
+    with router.engines["s2"].begin() as conn:
+        conn.execute(update(User).where(User.user_id == user_id).values(password_hash=hash_password("secret-pass")))
+    # the index names s2: s1, which comes first in SHARDS, is not asked
+    with StatementCounter(router.engines) as counter:
+        res = client.post("/auth/login", json={"email": "sharded.user@test.example", "password": "secret-pass"})
+    assert res.status_code == 200, res.text
+    assert counter.counts["s1"] == 0 and counter.counts["s2"] > 0
+    assert client.post("/auth/login", json={"email": "nobody@test.example", "password": "secret-pass"}).status_code == 401
+
+
+def test_writes_of_a_moving_college_answer_503(sharded):
+    client, router = sharded
+    college_id = _new_college(client, router, "SHD", "s1")
+    with router.directory.begin() as conn:
+        conn.execute(update(CollegeShard).where(CollegeShard.college_id == college_id).values(status="moving"))
+    cache.bump(SHARDS_NAMESPACE)
+
+    res = client.post("/admin/education-types/", json=_education_type(college_id, "PG"))
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == str(sharding.MOVING_RETRY_AFTER)
+    assert client.get("/admin/education-types/", params={"college_id": college_id}).status_code == 200
+
+
+def test_move_college(sharded):
+    client, router = sharded
+    # SQLite shards reuse ids, and the move refuses a collision: this
+    # module's rows on s2 have ids s1 does not use
+    college_id = _new_college(client, router, "SHE", "s2")
+    type_id = client.post("/admin/education-types/", json=_education_type(college_id, "DIP")).json()["education_type_id"]
+    user = {"name": "moved.user", "email": "moved.user@test.example", "phone": None, "role_id": _new_role(router, college_id), "college_id": college_id}
+    user_id = client.post("/admin/users/", json=user).json()["user_id"]
+    with router.engines["s2"].begin() as conn:
+        conn.execute(update(User).where(User.user_id == user_id).values(password_hash=hash_password("secret-pass")))
+
+    result = move_college(college_id, "s1", settle=0, log=lambda msg: None)
+
+    assert result["moved"] and result["rows"]["tbl_education_types"] == 1 and result["rows"]["tbl_users"] == 1
+    assert router.placement(college_id) == ("s1", "active")
+    users = select(User.user_id).where(User.college_id == college_id)
+    assert _rows(router.engines["s1"], users) == [(user_id,)] and _rows(router.engines["s2"], users) == []
+
+    # reads and writes of the college now go to s1
+    listed = client.get("/admin/education-types/", params={"college_id": college_id})
+    assert [t["education_type_id"] for t in listed.json()] == [type_id]
+    update_body = {"type_code": "DIP", "type_name": "Diploma", "duration_years": 2, "status": "active"}
+    res = client.put(f"/admin/education-types/{type_id}", params={"college_id": college_id}, json=update_body)
+    assert res.status_code == 200, res.text
+    name = select(EducationType.type_name).where(EducationType.education_type_id == type_id)
+    assert _rows(router.engines["s1"], name) == [("Diploma",)]
+
+    # the login index names the college, so login follows it to s1
+    with StatementCounter(router.engines) as counter:
+        res = client.post("/auth/login", json={"email": "moved.user@test.example", "password": "secret-pass"})
+    assert res.status_code == 200, res.text
+    assert counter.counts["s2"] == 0
@@ -0,0 +1,87 @@
+"""
+The application stays cheap to import and start. Each measurement runs in
+a fresh interpreter: it times `import app.main` (which must not open
+database connections, load bcrypt or a JWT library), then the lifespan
+startup and shutdown against a throwaway SQLite database. The budgets can
+be tightened per machine with BOOT_MAX_IMPORT_SECONDS, BOOT_MAX_SECONDS and
+BOOT_MAX_RSS_MB.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.core import config
+from app.core.config import Settings
+from app.core.database import init_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 3
+MAX_IMPORT_SECONDS = float(os.getenv("BOOT_MAX_IMPORT_SECONDS", "2.0"))
+MAX_BOOT_SECONDS = float(os.getenv("BOOT_MAX_SECONDS", "5.0"))
+MAX_RSS_MB = float(os.getenv("BOOT_MAX_RSS_MB", "300"))
+
+_PROBE = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter() - start
+heavy = sorted(m for m in ("passlib.context", "bcrypt", "jose", "jwt", "pymysql") if m in sys.modules)
+result = {"import_seconds": imported, "heavy_modules": heavy}
+
+import asyncio
+from app.main import app
+
+async def boot():
+    async with app.router.lifespan_context(app):
+        result["boot_seconds"] = time.perf_counter() - start - imported
+
+asyncio.run(boot())
+result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+
+def _measure(tmp_path) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = "sqlite:///" + str(tmp_path / "boot.db")
+    env.setdefault("SECRET_KEY", "boot-budget")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def boot_runs(tmp_path_factory):
+    return [_measure(tmp_path_factory.mktemp("boot")) for _ in range(RUNS)]
+
+
+def test_import_does_not_load_heavy_modules(boot_runs):
+    assert boot_runs[0]["heavy_modules"] == []
+
+
+def test_import_time(boot_runs):
+    assert max(r["import_seconds"] for r in boot_runs) <= MAX_IMPORT_SECONDS
+
+
+def test_boot_time(boot_runs):
+    assert max(r["boot_seconds"] for r in boot_runs) <= MAX_BOOT_SECONDS
+
+
+def test_peak_rss(boot_runs):
+    assert max(r["max_rss_mb"] for r in boot_runs) <= MAX_RSS_MB
+
+
+def test_unconfigured_database_is_reported(monkeypatch):
+    monkeypatch.setattr(config, "load_dotenv", lambda: None)
+    for name in ("DATABASE_URL", "DB_HOST", "DB_PORT", "DB_USER", "DB_PASSWORD", "DB_NAME"):
+        monkeypatch.delenv(name, raising=False)
+
+    settings = Settings.from_env()
+    assert settings.database_url == ""
+    with pytest.raises(RuntimeError, match="Database is not configured"):
+        init_engine(settings)
@@ -0,0 +1,100 @@
+"""
+A request scoped to one college (its tenant) reads and writes only that
+college's rows, while emails, usernames and admission numbers stay unique
+over all colleges: rows of another college are rejected, and a login
+taken by another college's user is reported, not left to the unique index.
+"""
+import pytest
+
+from app.core.tenant import tenant_scope
+from app.models.college import College
+from app.models.role import Role
+from app.schemas.student_schema import StudentCreate
+from app.schemas.user_schema import UserCreate
+from app.services.student_service import admit_students_batch, create_student
+from app.services.user_service import bulk_create_users, create_user
+
+COLLEGE_ID = 1
+
+
+def _role_id(db, college_id, name="Teacher"):
+    return db.query(Role.role_id).filter(Role.college_id == college_id, Role.role_name == name).scalar()
+
+
+@pytest.fixture
+def other_college(db):
+    """A second college with a Teacher role; the seed has one college"""
+    college = db.query(College).filter(College.college_code == "TENANT2").first()
+    if college is None:
+        college = College(college_code="TENANT2", college_name="Second College", college_type="private", status=1)
+        db.add(college)
+        db.flush()
+        db.add(Role(college_id=college.college_id, role_code="TEACHER", role_name="Teacher", status=1))
+        db.commit()
+    return college.college_id
+
+
+def test_bulk_import_rejects_rows_of_another_college(db, other_college):
+    teacher, other_teacher = _role_id(db, COLLEGE_ID), _role_id(db, other_college)
+    with tenant_scope(COLLEGE_ID):
+        res = bulk_create_users(db, [
+            {"name": "tenant.one", "email": "tenant.one@test.example", "role_id": teacher, "college_id": COLLEGE_ID},
+            {"name": "tenant.two", "email": "tenant.two@test.example", "role_id": teacher, "college_id": other_college},
+        ])
+    assert res["inserted"] == 1
+    assert [(e["row"], e["error"]) for e in res["errors"]] == [(2, "College not found or inactive")]
+
+    with tenant_scope(COLLEGE_ID):
+        res = create_user(db, UserCreate(
+            name="tenant.three", email="tenant.three@test.example", phone=None,
+            role_id=other_teacher, college_id=other_college,
+        ))
+    assert res == {"error": "College not found or inactive"}
+
+
+def test_admission_batch_rejects_another_college(db, other_college):
+    with tenant_scope(COLLEGE_ID):
+        inserted, errors = admit_students_batch(db, other_college, None, [
+            {"admission_number": "TEN-1", "admission_year": 2024, "email": "tenant.four@test.example"},
+        ], first_row=1)
+        assert (inserted, errors[0]["error"]) == (0, "College not found or inactive")
+
+        inserted, errors = admit_students_batch(db, COLLEGE_ID, None, [
+            {"admission_number": "TEN-2", "admission_year": 2024, "email": "tenant.five@test.example"},
+        ], first_row=1)
+        assert (inserted, errors) == (1, [])
+
+
+def test_logins_of_another_college_are_taken(db, other_college):
+    res = create_user(db, UserCreate(
+        name="tenant.owner", email="tenant.owner@test.example", phone=None,
+        role_id=_role_id(db, other_college), college_id=other_college,
+    ))
+    assert "error" not in res
+
+    teacher = _role_id(db, COLLEGE_ID)
+    with tenant_scope(COLLEGE_ID):
+        res = create_user(db, UserCreate(name="tenant.six", email="Tenant.Owner@test.example", phone=None, role_id=teacher, college_id=COLLEGE_ID))
+        assert res == {"error": "Email already exists"}
+        res = bulk_create_users(db, [
+            {"name": "tenant.seven", "email": "tenant.owner@test.example", "role_id": teacher, "college_id": COLLEGE_ID},
+            {"name": "TENANT.OWNER", "email": "tenant.eight@test.example", "role_id": teacher, "college_id": COLLEGE_ID},
+        ])
+        assert [(e["row"], e["error"]) for e in res["errors"]] == [(1, "Email already exists"), (2, "Username already exists")]
+        res = create_student(db, StudentCreate(
+            college_id=COLLEGE_ID, admission_number="TEN-3", admission_year=2024, email="tenant.owner@test.example", name="tenant.nine",
+        ))
+        assert res == {"error": "Email already exists"}
+
+
+def test_reads_see_only_the_tenants_rows(db, other_college):
+    teacher = _role_id(db, other_college)
+    db.expunge_all()
+    with tenant_scope(COLLEGE_ID):
+        assert db.query(Role).filter(Role.role_id == teacher).first() is None
+        assert db.get(Role, teacher) is None
+        assert {r.college_id for r in db.query(Role).all()} == {COLLEGE_ID}
+        # an explicit opt-out, as the uniqueness probes use
+        assert db.query(Role).filter(Role.role_id == teacher).execution_options(all_tenants=True).one().college_id == other_college
+    db.expunge_all()
+    assert db.get(Role, teacher).college_id == other_college